@@ -8,6 +8,10 @@ from views import sidebar
 from views import dashboard  # File View (Vẽ biểu đồ)
 from src import loader       # File Model (Load dữ liệu/AI)
 from src import preprocessor # File Xử lý dữ liệu đầu vào
+from src import predictor    # Các bước dự báo dùng chung (App + Batch CLI)
+from src import spatial_index # Tìm BĐS thật gần nhất (BallTree)
+from src import metrics      # Đo thời gian từng bước dự báo (p50/p95/p99)
+from src import prediction_cache # Cache kết quả dự báo (LRU + TTL) theo input đã chuẩn hóa
 
 # ==============================================================================
 # 1. CẤU HÌNH TRANG
@@ -25,6 +29,10 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 local_css("assets/style.css")
+# Warm-up model XGBoost ở thread nền (chỉ khi bật REAL_ESTATE_WARMUP, 1 lần / process)
+loader.warm_up_models()
+# Endpoint/file metrics cho scraper cục bộ (chỉ khi bật REAL_ESTATE_METRICS_PORT / _FILE)
+metrics.start_exporters_from_env()
 # ==============================================================================
 # 2. HÀM LOGIC DỰ BÁO (AI PREDICTION FLOW)
 # ==============================================================================
@@ -34,87 +42,88 @@ def execute_prediction_flow(user_inputs, city_mode, property_type):
     1. Xác định key xử lý
     2. Load Model XGBoost
     3. Gọi Preprocessor xử lý dữ liệu
-    4. Khớp cột & Debug lỗi thiếu cột
+    4. Khớp cột theo Feature Plan của model
     5. Trả về kết quả dự báo (đã chuyển từ Log -> Giá thực)
+    Mỗi bước được bấm giờ vào src/metrics.py theo model (hcm, hanoi, apartment, ...).
+    Input trùng (sau khi chuẩn hóa) với lần dự báo trước trả ngay từ src/prediction_cache.py.
     """
-    
-    # --- BƯỚC 1: TẠO KEY CHO PREPROCESSOR ---
-    # Key này phải khớp chính xác với các if/elif trong preprocessor.transform_input
-    if property_type == "Nhà phố":
-        process_key = f"Nhà phố {city_mode}"  # VD: "Nhà phố Hồ Chí Minh"
-    elif property_type == "Căn hộ Chung cư": # Lưu ý: Sidebar trả về "Căn hộ Chung cư" chứ không phải "Chung cư"
-        process_key = "Căn hộ Chung cư"
-    elif property_type == "Đất nền":
-        process_key = "Đất nền"
-    else:
-        process_key = "Biệt thự / Villa"
+    model_id = loader.dataset_key_for(city_mode, property_type)
+    timer = metrics.StageTimer(model_id)
+    try:
+        # --- BƯỚC 1: TẠO KEY CHO PREPROCESSOR ---
+        # Key này phải khớp chính xác với các if/elif trong preprocessor.transform_input
+        process_key = predictor.resolve_process_key(city_mode, property_type)
+        timer.lap('resolve_key')
 
-    # --- BƯỚC 2: LOAD MODEL DỰ BÁO ---
-    system_resources = loader.load_models(city_mode, property_type)
-    
-    if not system_resources or 'model' not in system_resources:
-        st.error("❌ Không tìm thấy Model. Hãy kiểm tra folder models/.")
-        return None
+        # Dự báo trên input đã chuẩn hóa để kết quả cache khớp với kết quả tính lại
+        user_inputs = prediction_cache.canonicalize_inputs(user_inputs)
+        cache_key = prediction_cache.make_key(model_id, user_inputs)
+        hit, cached_price = prediction_cache.prediction_cache.get(cache_key)
+        timer.lap('cache_lookup')
+        if hit:
+            return cached_price
 
-    model = system_resources['model']
+        # --- BƯỚC 2: LOAD MODEL DỰ BÁO ---
+        system_resources = loader.load_models(city_mode, property_type)
+        timer.lap('load_model')
 
-    # --- BƯỚC 3: XỬ LÝ INPUT (PREPROCESSING) ---
-    try:
-        processed_df = preprocessor.transform_input(user_inputs, process_key)
-    except Exception as e:
-        st.error(f"Lỗi xử lý dữ liệu: {e}")
-        return None
-    
-    # --- BƯỚC 4: KHỚP CỘT & DEBUG (QUAN TRỌNG) ---
-    try:
-        if hasattr(model, 'feature_names_in_'):
-            required_cols = list(model.feature_names_in_)
-            current_cols = list(processed_df.columns)
-            
-            # 1. Tìm & Fill cột thiếu bằng 0
-            missing_cols = []
-            for col in required_cols:
-                if col not in current_cols:
-                    processed_df[col] = 0
-                    missing_cols.append(col)
-            
-            # 2. In Debug ra Terminal (Để bạn kiểm tra xem có thiếu cột quan trọng không)
-            if missing_cols:
-                print("\n" + "="*40)
-                print(f"⚠️ CẢNH BÁO: Model {process_key} thiếu các cột sau (đã fill 0):")
-                print(missing_cols)
-                
-                # Kiểm tra giá trị các cột quan trọng
-                if property_type == "Căn hộ Chung cư":
-                    pj_val = processed_df.get('project_name', pd.Series([0])).iloc[0]
-                    floor_val = processed_df.get('floors', pd.Series([0])).iloc[0]
-                    print(f"🧐 Project Name Value: {pj_val}")
-                    print(f"🧐 Floors Value: {floor_val}")
-                print("="*40 + "\n")
-
-            # 3. Sắp xếp đúng thứ tự cột của Model
-            processed_df = processed_df[required_cols]
-    except Exception as e:
-        print(f"Lỗi khớp cột: {e}")
-        pass
-
-    # --- BƯỚC 5: DỰ BÁO & CHUYỂN ĐỔI ---
-    try:
-        # Dự báo (Kết quả là Logarit)
-        pred_log = model.predict(processed_df)[0]
-        
-        # Chuyển về giá thực (Anti-Log)
-        pred_real = np.expm1(pred_log) 
-    
-        return max(0, pred_real)
-    except Exception as e:
-        st.error(f"Lỗi khi model dự báo: {e}")
-        return None
+        if not system_resources or 'model' not in system_resources:
+            st.error("❌ Không tìm thấy Model. Hãy kiểm tra folder models/.")
+            return None
+
+        model = system_resources['model']
+
+        # --- BƯỚC 3: XỬ LÝ INPUT (PREPROCESSING) ---
+        try:
+            processed_df = preprocessor.transform_input(user_inputs, process_key)
+        except Exception as e:
+            st.error(f"Lỗi xử lý dữ liệu: {e}")
+            return None
+        timer.lap('preprocess')
+
+        # --- BƯỚC 4: KHỚP CỘT (THEO FEATURE PLAN BIÊN DỊCH SẴN LÚC LOAD MODEL) ---
+        try:
+            features = predictor.build_features(system_resources['plan'], processed_df)
+        except Exception as e:
+            st.error(f"Lỗi khớp cột: {e}")
+            return None
+        timer.lap('align')
+
+        # --- BƯỚC 5: DỰ BÁO & CHUYỂN ĐỔI ---
+        try:
+            # Dự báo (Log -> Giá thực, đã chặn dưới 0)
+            price = predictor.predict_prices(model, features)[0]
+        except Exception as e:
+            st.error(f"Lỗi khi model dự báo: {e}")
+            return None
+        timer.lap('predict')
+        prediction_cache.prediction_cache.put(cache_key, price)
+        return price
+    finally:
+        timer.finish()
 
 def format_currency(amount):
     if amount >= 1: return f"{amount:,.2f} Tỷ"
     return f"{amount*1000:,.0f} Triệu"
 
+# Số BĐS tương đồng hiển thị dưới kết quả dự báo
+N_COMPARABLES = 5
+
+def show_comparables(user_inputs, city_mode, property_type):
+    """Bảng các tin đăng thật cùng danh mục gần vị trí đã nhập nhất (tra BallTree, không quét cả bảng)"""
+    key = loader.dataset_key_for(city_mode, property_type)
+    comps = spatial_index.find_comparables(key, user_inputs['lat'], user_inputs['lon'], k=N_COMPARABLES)
+    if comps.empty:
+        return
+
+    st.markdown("#### 🏘️ BĐS tương đồng gần nhất")
+    comps = comps.drop(columns=['lat', 'lon']).rename(columns={
+        'project_name_raw': 'Dự án', 'price': 'Giá (Tỷ)', 'area': 'Diện tích (m²)',
+        'bedrooms': 'Số PN', 'floors': 'Số tầng', 'legal': 'Pháp lý',
+        'price_per_m2': 'Đơn giá (Tr/m²)', 'distance_km': 'Khoảng cách (km)',
+    })
+    st.dataframe(comps, hide_index=True, width="stretch")
+
 # ==============================================================================
 # 3. CHƯƠNG TRÌNH CHÍNH (MAIN)
 # ==============================================================================
@@ -128,10 +137,7 @@ def main():
     if nav_mode == "📊 Dashboard Phân tích":
         st.title(f"📊 Phân tích: {dashboard_category}")
         
-        # 1. LOAD DỮ LIỆU TỪ LOADER (Đã có KMeans và chuẩn hóa cột)
-        all_data = loader.load_raw_data()
-        
-        # 2. MAPPING: Chọn đúng DataFrame dựa trên lựa chọn ở Sidebar
+        # 1. MAPPING: Chọn đúng dataset dựa trên lựa chọn ở Sidebar
         map_key = {
             "Nhà phố Hồ Chí Minh": "hcm",
             "Nhà phố Hà Nội": "hanoi",
@@ -139,18 +145,25 @@ def main():
             "Đất nền": "land",
             "Biệt thự / Villa": "villa"
         }
-        
         selected_key = map_key.get(dashboard_category)
-        df_selected = all_data.get(selected_key)
+        
+        # 2. LOAD DỮ LIỆU TỪ LOADER (Chỉ đọc đúng danh mục đang xem, đã có KMeans và chuẩn hóa cột)
+        df_selected = loader.load_dataset(selected_key)
 
         # 3. HIỂN THỊ GIAO DIỆN (DELEGATE TO VIEW)
         # Thay vì viết code vẽ loằng ngoằng ở đây, ta gọi hàm chuyên dụng bên dashboard.py
         if df_selected is not None and not df_selected.empty:
-            dashboard.show_dashboard_ui(df_selected, dashboard_category)
+            filters = sidebar.show_dashboard_filters(df_selected, dashboard_category)
+            dashboard.show_dashboard_ui(df_selected, dashboard_category, filters)
         else:
+            if loader.dataset_error(selected_key):
+                st.error(loader.dataset_error(selected_key))
             st.warning(f"⚠️ Không tìm thấy dữ liệu cho **{dashboard_category}**.")
             st.info("Gợi ý: Kiểm tra file CSV trong thư mục 'data/' hoặc logic trong 'src/loader.py'")
 
+        # 4. Đọc trước các danh mục còn lại ở thread nền (sau khi danh mục đầu tiên đã hiển thị)
+        loader.prefetch_datasets(exclude=selected_key)
+
     # ==========================================================================
     # B. CHẾ ĐỘ DỰ BÁO GIÁ (AI PREDICTION)
     # ==========================================================================
@@ -184,5 +197,7 @@ def main():
                     
                     st.caption("*Kết quả chỉ mang tính chất tham khảo dựa trên dữ liệu quá khứ.*")
 
+                    show_comparables(user_inputs, dashboard_category, property_type)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
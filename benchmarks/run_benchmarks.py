@@ -0,0 +1,401 @@
+"""
+Bộ benchmark hiệu năng cho luồng dự báo và dashboard.
+
+Đo (median / min / p95, mili giây):
+  - preprocessor.transform_input  : 1 dòng và batch, từng loại hình BĐS
+  - loader.load_raw_data          : cold (xóa cache dataset của process) và warm
+  - loader.load_models            : cold (registry mới) và warm
+  - app.execute_prediction_flow   : đầu-cuối cho 1 dòng (không cache và trúng cache kết quả)
+  - views/dashboard.py            : dựng cube tổng hợp + từng hàm vẽ biểu đồ
+  - import                        : thời gian import các module lõi trong process mới
+                                    (kèm danh sách thư viện nặng bị kéo theo)
+
+Quy mô dữ liệu chỉnh bằng --scales: batch = BATCH_ROWS x scale dòng, dashboard chạy trên
+dataset nhân bản x scale. Kết quả ghi ra JSON; nếu có baseline thì so sánh và trả về
+exit code 1 khi có case chậm hơn baseline quá ngưỡng.
+
+Ví dụ:
+    python benchmarks/run_benchmarks.py --scales 1,10 --repeat 5
+    python benchmarks/run_benchmarks.py --save-baseline           # lưu benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --only dashboard --tolerance 0.3
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+os.chdir(ROOT_DIR)
+
+from src import aggregates
+from src import loader
+from src import model_registry
+from src import preprocessor
+
+BENCH_DIR = os.path.join(ROOT_DIR, 'benchmarks')
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+# Số dòng của 1 batch ở scale = 1
+BATCH_ROWS = 1000
+
+# Key dataset -> (city_mode, property_type) như Sidebar gửi lên
+SIDEBAR_CHOICES = {
+    'hcm':       ("Hồ Chí Minh", "Nhà phố"),
+    'hanoi':     ("Hà Nội", "Nhà phố"),
+    'apartment': ("All", "Căn hộ Chung cư"),
+    'land':      ("All", "Đất nền"),
+    'villa':     ("All", "Biệt thự / Villa"),
+}
+
+# Giá trị mặc định cho các ô Sidebar mà dataset không có cột tương ứng
+INPUT_DEFAULTS = {
+    'area': 50.0, 'front_width': 0.0, 'access_road': 0.0, 'bedrooms': 0, 'floors': 0, 'toilet': 0,
+    'legal': "Sổ hồng/Sổ đỏ", 'direction': "Chưa xác định", 'interior': "Chưa xác định",
+    'project_name': "Others", 'lat': 10.7769, 'lon': 106.7009,
+}
+
+# Module đo thời gian import (mỗi lần đo là 1 process Python mới, chưa nạp gì)
+IMPORT_TARGETS = ['src.preprocessor', 'src.predictor', 'src.batch_predict', 'src.service',
+                  'src.loader', 'views.sidebar']
+# Thư viện nặng cần biết có bị kéo theo lúc import hay không
+HEAVY_MODULES = ['streamlit', 'sklearn', 'scipy', 'category_encoders', 'geopy', 'plotly',
+                 'joblib', 'xgboost', 'pyarrow']
+
+IMPORT_PROBE = (
+    "import json, sys, time\n"
+    "start = time.perf_counter()\n"
+    "import {module}\n"
+    "elapsed = time.perf_counter() - start\n"
+    "print(json.dumps({{'ms': elapsed * 1000, 'loaded': [m for m in {heavy!r} if m in sys.modules]}}))\n"
+)
+
+# ==============================================================================
+# 1. DỮ LIỆU ĐẦU VÀO
+# ==============================================================================
+
+def make_inputs(key, n_rows, seed=0):
+    """n_rows input dạng Sidebar, lấy mẫu (có lặp) từ dataset thật của danh mục"""
+    df = loader.load_dataset(key)
+    sample = df.sample(n_rows, replace=True, random_state=seed).reset_index(drop=True)
+    if 'project_name_raw' in sample.columns:
+        # Sidebar gửi tên dự án dạng chữ (cột project_name trong data là bản đã encode)
+        sample = sample.drop(columns=['project_name'], errors='ignore')
+    sample = sample.rename(columns={'bathrooms': 'toilet', 'project_name_raw': 'project_name'})
+    inputs = pd.DataFrame(index=sample.index)
+    for col, default in INPUT_DEFAULTS.items():
+        inputs[col] = sample[col].astype(object if isinstance(default, str) else float) if col in sample.columns else default
+    return inputs
+
+
+def scale_frame(df, scale):
+    """Nhân bản dataset x scale (scale < 1: lấy mẫu)"""
+    if scale == 1:
+        return df
+    if scale < 1:
+        return df.sample(frac=scale, random_state=0)
+    whole = int(scale)
+    parts = [df] * whole
+    if scale > whole:
+        parts.append(df.sample(frac=scale - whole, random_state=0))
+    return pd.concat(parts, ignore_index=True)
+
+# ==============================================================================
+# 2. ĐO THỜI GIAN
+# ==============================================================================
+
+def measure(fn, repeat, setup=None, warmup=0):
+    """Chạy fn `repeat` lần (setup chạy trước mỗi lần, không tính giờ). Trả về thống kê ms."""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return summarize(times)
+
+
+def checked(fn, ok, message):
+    """Bọc fn: kết quả không đạt ok(kết quả) thì raise -> case ghi lỗi thay vì thời gian vô nghĩa"""
+    def run():
+        result = fn()
+        if not ok(result):
+            raise RuntimeError(message)
+        return result
+    return run
+
+
+def has_model(resources):
+    return bool(resources) and 'model' in resources
+
+
+def summarize(times):
+    """Thống kê median / min / p95 của danh sách thời gian (ms)"""
+    times = np.array(times)
+    return {
+        'median_ms': float(np.median(times)),
+        'min_ms': float(times.min()),
+        'p95_ms': float(np.percentile(times, 95)),
+        'repeat': len(times),
+    }
+
+
+class Suite:
+    def __init__(self, repeat, only=None):
+        self.repeat = repeat
+        self.only = only
+        self.results = {}
+
+    def run(self, name, fn, setup=None, warmup=1, rows=None):
+        if self.only and self.only not in name:
+            return
+        try:
+            # Các hàm app/loader in log + gọi st.* -> nuốt stdout cho bảng kết quả gọn
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = measure(fn, self.repeat, setup=setup, warmup=warmup)
+            result['error'] = None
+        except Exception as e:
+            result = self._error(e)
+        self._record(name, result, rows)
+
+    def run_probe(self, name, probe):
+        """
+        Như run() nhưng probe() tự đo (VD trong process con) và trả về (ms, thông tin thêm).
+        Thông tin thêm của lần đo cuối được lưu vào kết quả dưới key 'info'.
+        """
+        if self.only and self.only not in name:
+            return
+        try:
+            samples = [probe() for _ in range(self.repeat)]
+            result = summarize([ms for ms, _ in samples])
+            result['error'] = None
+            result['info'] = samples[-1][1]
+        except Exception as e:
+            result = self._error(e)
+        self._record(name, result, None)
+        if result.get('info'):
+            print(f"      -> {result['info']}")
+
+    @staticmethod
+    def _error(e):
+        return {'median_ms': None, 'min_ms': None, 'p95_ms': None, 'repeat': 0,
+                'error': f"{type(e).__name__}: {e}"}
+
+    def _record(self, name, result, rows):
+        result['rows'] = rows
+        self.results[name] = result
+        if result['error']:
+            print(f"  ⚠️ {name:<60} lỗi: {result['error']}")
+        else:
+            print(f"  {name:<62} {result['median_ms']:>10.2f} ms  (min {result['min_ms']:.2f}, p95 {result['p95_ms']:.2f})")
+
+# ==============================================================================
+# 3. CÁC NHÓM BENCHMARK
+# ==============================================================================
+
+def bench_transform(suite, scales):
+    for key, spec in model_registry.MODEL_SPECS.items():
+        process_key = spec['process_key']
+        single = make_inputs(key, 1).iloc[0].to_dict()
+        suite.run(f"transform_input/single/{key}", lambda: preprocessor.transform_input(single, process_key), rows=1)
+        for scale in scales:
+            n_rows = max(1, int(BATCH_ROWS * scale))
+            batch = make_inputs(key, n_rows)
+            suite.run(f"transform_input/batch/{key}@x{scale:g}",
+                      lambda: preprocessor.transform_input(batch, process_key), rows=n_rows)
+
+
+def bench_loader(suite):
+    suite.run("load_raw_data/cold", loader.load_raw_data, setup=loader.clear_dataset_cache, warmup=0)
+    suite.run("load_raw_data/warm", loader.load_raw_data)
+
+    original = model_registry.registry
+
+    def fresh_registry():
+        model_registry.registry = model_registry.ModelRegistry()
+
+    try:
+        for key, (city_mode, property_type) in SIDEBAR_CHOICES.items():
+            # Thiếu file model: load_models trả về None -> ghi lỗi, không ghi thời gian
+            load = checked(lambda: loader.load_models(city_mode, property_type), has_model,
+                           f"không load được model {key}")
+            suite.run(f"load_models/cold/{key}", load, setup=fresh_registry, warmup=0)
+            suite.run(f"load_models/warm/{key}", load)
+    finally:
+        model_registry.registry = original
+
+
+def bench_prediction_flow(suite):
+    import app  # chỉ cấu hình trang + định nghĩa hàm, main() không chạy khi import
+    for key, (city_mode, property_type) in SIDEBAR_CHOICES.items():
+        inputs = make_inputs(key, 1).iloc[0].to_dict()
+        # Luồng lỗi (thiếu model, lỗi preprocess...) báo st.error rồi trả về None -> ghi lỗi
+        flow = checked(lambda: app.execute_prediction_flow(inputs, city_mode, property_type),
+                       lambda price: price is not None, f"execute_prediction_flow trả về None ({key})")
+        # Xóa cache kết quả trước mỗi lần đo để đo đủ cả luồng; case /cached đo lần lặp lại
+        suite.run(f"execute_prediction_flow/{key}", flow,
+                  setup=app.prediction_cache.prediction_cache.clear, rows=1)
+        suite.run(f"execute_prediction_flow/cached/{key}", flow, rows=1)
+
+
+def bench_dashboard(suite, scales):
+    from views import dashboard
+    charts = [
+        dashboard.render_kpi_metrics,
+        dashboard.chart_heatmap_location,
+        dashboard.chart_top_expensive_projects,
+        dashboard.chart_donut_legal,
+        dashboard.chart_scatter_area_price,
+        dashboard.chart_box_alley_impact,
+        dashboard.chart_histogram_shape_ratio,
+    ]
+    for key in loader.DATASET_CONFIG:
+        base = loader.load_dataset(key)
+        for scale in scales:
+            df = scale_frame(base, scale)
+            tag = f"{key}@x{scale:g}"
+            # Cube: tính lại từ đầu mỗi lần (đây là chi phí khi dataset/bộ lọc đổi)
+            suite.run(f"dashboard/build_cube/{tag}", lambda: dashboard.build_cube(df), rows=len(df))
+            # Biểu đồ: đọc cube đã có (chi phí của 1 lần rerun)
+            for chart in charts:
+                suite.run(f"dashboard/{chart.__name__}/{tag}", lambda: chart(df, cache_key=('bench', tag)), rows=len(df))
+    aggregates.clear_cache()
+
+def probe_import(module):
+    """Import `module` trong 1 process Python mới. Trả về (ms, thư viện nặng bị kéo theo)."""
+    code = IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT_DIR,
+                         capture_output=True, text=True, check=True)
+    data = json.loads(out.stdout.strip().splitlines()[-1])
+    return data['ms'], ', '.join(data['loaded']) or '(không thư viện nặng nào)'
+
+
+def bench_imports(suite):
+    for module in IMPORT_TARGETS:
+        suite.run_probe(f"import/{module}", lambda: probe_import(module))
+
+# ==============================================================================
+# 4. SO SÁNH VỚI BASELINE
+# ==============================================================================
+
+def compare(current, baseline, tolerance, noise_ms):
+    """
+    Case bị coi là chậm đi khi median > baseline * (1 + tolerance) VÀ chênh lệch > noise_ms
+    (bỏ qua dao động của các case chỉ vài phần mười ms). Case trước chạy được mà nay lỗi
+    cũng tính là chậm đi (mới = None). Trả về danh sách (tên, cũ, mới).
+    """
+    regressions = []
+    for name, base in baseline.get('results', {}).items():
+        cur = current['results'].get(name)
+        if not cur or base.get('median_ms') is None:
+            continue
+        if cur['median_ms'] is None:
+            regressions.append((name, base['median_ms'], None))
+            continue
+        old_ms, new_ms = base['median_ms'], cur['median_ms']
+        if new_ms > old_ms * (1 + tolerance) and new_ms - old_ms > noise_ms:
+            regressions.append((name, old_ms, new_ms))
+    return regressions
+
+
+def environment_info():
+    import sklearn, xgboost
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__, 'pandas': pd.__version__,
+        'sklearn': sklearn.__version__, 'xgboost': xgboost.__version__,
+    }
+
+
+def quiet_streamlit_logs():
+    """Chạy ngoài `streamlit run` thì mỗi lệnh st.* đều cảnh báo thiếu ScriptRunContext -> tắt bớt"""
+    import logging
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith('streamlit'):
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark luồng dự báo + dashboard")
+    parser.add_argument('--scales', default='1', help="Các hệ số quy mô dữ liệu, VD: 1,10,100")
+    parser.add_argument('--repeat', type=int, default=5, help="Số lần đo mỗi case")
+    parser.add_argument('--only', default=None, help="Chỉ chạy các case có tên chứa chuỗi này")
+    parser.add_argument('-o', '--output', default=None, help="File JSON kết quả (mặc định benchmarks/results/<thời gian>.json)")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="File baseline để so sánh")
+    parser.add_argument('--save-baseline', action='store_true', help="Ghi kết quả lần này làm baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Ngưỡng chậm đi cho phép (0.25 = 25%%)")
+    parser.add_argument('--noise-ms', type=float, default=1.0, help="Bỏ qua chênh lệch tuyệt đối nhỏ hơn (ms)")
+    args = parser.parse_args(argv)
+
+    scales = [float(s) for s in args.scales.split(',') if s.strip()]
+    suite = Suite(args.repeat, only=args.only)
+    started = time.time()
+
+    import app  # noqa: F401 - nạp hết module streamlit trước khi chỉnh log
+    from views import dashboard  # noqa: F401
+    quiet_streamlit_logs()
+
+    print("⏱️ import"); bench_imports(suite)
+    print("⏱️ transform_input"); bench_transform(suite, scales)
+    print("⏱️ loader"); bench_loader(suite)
+    print("⏱️ execute_prediction_flow"); bench_prediction_flow(suite)
+    print("⏱️ dashboard"); bench_dashboard(suite, scales)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'scales': scales, 'repeat': args.repeat, 'batch_rows': BATCH_ROWS,
+            'duration_s': round(time.time() - started, 1),
+            'environment': environment_info(),
+        },
+        'results': suite.results,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"bench_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"💾 Kết quả: {output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"📌 Đã lưu baseline: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("ℹ️ Chưa có baseline (chạy với --save-baseline để tạo).")
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(report, baseline, args.tolerance, args.noise_ms)
+    if regressions:
+        print(f"❌ {len(regressions)} case chậm hơn baseline quá {args.tolerance:.0%}:")
+        for name, old_ms, new_ms in regressions:
+            if new_ms is None:
+                print(f"   {name:<62} {old_ms:>10.2f} -> lỗi: {report['results'][name]['error']}")
+            else:
+                print(f"   {name:<62} {old_ms:>10.2f} -> {new_ms:.2f} ms (x{new_ms / old_ms:.2f})")
+        return 1
+    print(f"✅ Không có case nào chậm hơn baseline quá {args.tolerance:.0%}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,351 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# ==============================================================================
+# TỔNG HỢP DỰNG SẴN CHO DASHBOARD (TÍNH 1 LẦN / DATASET)
+# ==============================================================================
+# Các bảng tổng hợp được tính 1 lần khi dataset được nạp rồi giữ trong RAM của process.
+# Mỗi lần rerun Streamlit chỉ còn bước dựng biểu đồ, không quét lại cả DataFrame.
+
+_MEMO = OrderedDict()     # (loại, key dataset) -> (DataFrame nguồn, kết quả), LRU
+_LOCK = threading.Lock()
+
+# Số kết quả tối đa giữ lại (mỗi tổ hợp bộ lọc của dashboard là 1 key riêng)
+MAX_MEMO_ENTRIES = 64
+
+
+def cached(kind, key, source_df, build):
+    """
+    Trả về build() đã tính cho (kind, key). Tính lại khi DataFrame nguồn đổi
+    (so identity: loader đọc lại dataset hoặc người dùng lọc ra DataFrame khác).
+    """
+    entry = _MEMO.get((kind, key))
+    if entry is not None and entry[0] is source_df:
+        return entry[1]
+    with _LOCK:
+        entry = _MEMO.get((kind, key))
+        if entry is None or entry[0] is not source_df:
+            entry = (source_df, build())
+            _MEMO[(kind, key)] = entry
+        _MEMO.move_to_end((kind, key))
+        while len(_MEMO) > MAX_MEMO_ENTRIES:
+            _MEMO.popitem(last=False)
+        return entry[1]
+
+
+def clear_cache():
+    _MEMO.clear()
+
+# ==============================================================================
+# 1. BẢN ĐỒ NHIỀU MỨC CHI TIẾT (LEVEL OF DETAIL)
+# ==============================================================================
+# Gom điểm vào ô vuông theo độ (lat/lon) ở nhiều kích thước. Mức thô dùng khi nhìn cả vùng,
+# mức mịn khi nhìn cấp phường. Số marker gửi xuống trình duyệt bị chặn bởi số ô, không
+# tăng theo số tin đăng.
+
+MAP_LEVELS = [
+    {'name': 'Vùng (~20 km)',     'cell_deg': 0.2,    'zoom': 8},
+    {'name': 'Quận (~5 km)',      'cell_deg': 0.05,   'zoom': 10},
+    {'name': 'Phường (~1.2 km)',  'cell_deg': 0.0125, 'zoom': 11},
+    {'name': 'Khu phố (~300 m)',  'cell_deg': 0.003,  'zoom': 13},
+]
+
+# Dưới ngưỡng này thì vẽ thẳng từng tin; trên ngưỡng thì chế độ "Từng tin" chỉ lấy mẫu chừng này điểm
+RAW_POINT_LIMIT = 5000
+# Cột nhãn hover "BĐS #<index>" cho dataset không có tên dự án (chỉ tạo trên mẫu điểm của MapLevels)
+LISTING_LABEL_COL = 'Tin_BĐS'
+# Số ô tối đa ở chế độ tự động (chọn mức mịn nhất còn dưới ngưỡng)
+MAX_MAP_MARKERS = 3000
+
+
+def bin_points(df, cell_deg):
+    """
+    Gom điểm vào ô vuông cạnh cell_deg độ.
+    Mỗi ô: tâm (lat/lon trung bình các điểm), số tin, giá trung vị, đơn giá trung vị (Tr/m²).
+    """
+    price = df['price'].to_numpy(dtype=float)
+    area = df['area'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ppm2 = np.where(area > 0, price * 1000 / area, np.nan)
+
+    work = pd.DataFrame({
+        'row': np.floor(df['lat'].to_numpy(dtype=float) / cell_deg).astype(np.int64),
+        'col': np.floor(df['lon'].to_numpy(dtype=float) / cell_deg).astype(np.int64),
+        'lat': df['lat'].to_numpy(dtype=float),
+        'lon': df['lon'].to_numpy(dtype=float),
+        'price': price,
+        'price_per_m2': ppm2,
+    })
+    bins = work.groupby(['row', 'col'], sort=False).agg(
+        lat=('lat', 'mean'), lon=('lon', 'mean'), count=('price', 'size'),
+        median_price=('price', 'median'), median_price_per_m2=('price_per_m2', 'median'),
+    )
+    return bins.reset_index(drop=True)
+
+
+class MapLevels:
+    """Các mức tổng hợp của 1 dataset (đã lọc tọa độ) + mẫu điểm thô có giới hạn"""
+
+    def __init__(self, clean_df, hover_col=None):
+        self.n_points = 0 if clean_df is None else len(clean_df)
+        self.levels = {}
+        # Nhãn từng tin được tạo trên bản copy mẫu điểm bên dưới, không ghi vào clean_df
+        # (clean_df là lát cắt của dataset dùng chung cho mọi phiên)
+        make_labels = hover_col == LISTING_LABEL_COL and clean_df is not None and hover_col not in clean_df.columns
+        self.hover_col = hover_col if clean_df is not None and (make_labels or hover_col in clean_df.columns) else None
+        if clean_df is None or clean_df.empty:
+            self.points = clean_df
+            return
+
+        for level in MAP_LEVELS:
+            self.levels[level['name']] = bin_points(clean_df, level['cell_deg'])
+
+        cols = ['lat', 'lon', 'price', 'area']
+        if self.hover_col and not make_labels:
+            cols.append(self.hover_col)
+        points = clean_df[cols]
+        if len(points) > RAW_POINT_LIMIT:
+            points = points.sample(RAW_POINT_LIMIT, random_state=42)
+        points = points.copy()
+        if make_labels:
+            points[LISTING_LABEL_COL] = "BĐS #" + points.index.astype(str)
+        self.points = points
+
+    def auto_level(self):
+        """Ít tin -> vẽ từng tin (None). Nhiều tin -> mức mịn nhất có số ô <= MAX_MAP_MARKERS."""
+        if self.n_points <= RAW_POINT_LIMIT:
+            return None
+        chosen = MAP_LEVELS[0]['name']
+        for level in MAP_LEVELS:
+            if len(self.levels[level['name']]) <= MAX_MAP_MARKERS:
+                chosen = level['name']
+        return chosen
+
+
+def level_zoom(level_name):
+    for level in MAP_LEVELS:
+        if level['name'] == level_name:
+            return level['zoom']
+    return MAP_LEVELS[-1]['zoom']
+
+# ==============================================================================
+# 2. CUBE TỔNG HỢP CHO DASHBOARD
+# ==============================================================================
+# Gói gọn mọi con số dashboard cần: KPI, top dự án/khu vực, đếm pháp lý, histogram
+# và các mức bản đồ ở trên. Chỉ vài KB, biểu đồ đọc thẳng từ đây.
+
+# Thứ tự ưu tiên cột để xếp hạng Top khu vực đắt đỏ
+GROUP_COLS = ['project_name_raw', 'district', 'geo_cluster']
+TOP_N = 10
+SHAPE_RATIO_BINS = 40
+
+
+def compute_kpi(df):
+    """Tin đăng, giá TB, diện tích TB, đơn giá TB (bỏ đơn giá >= 1000 Tr/m²). None nếu không có tin hợp lệ."""
+    price = df['price'].to_numpy(dtype=float)
+    area = df['area'].to_numpy(dtype=float)
+    valid = (price > 0) & (area > 0)
+    if not valid.any():
+        return None
+    don_gia = price[valid] * 1000 / area[valid]
+    return {
+        'n_listings': len(df),
+        'avg_price': price[valid].mean(),
+        'avg_area': area[valid].mean(),
+        'avg_don_gia': don_gia[don_gia < 1000].mean(),
+    }
+
+
+def compute_top_groups(clean_df, group_col, top_n=TOP_N):
+    """Giá TB + tâm + số tin theo nhóm (>= 2 tin), lấy top_n nhóm đắt nhất"""
+    stats = clean_df.groupby(group_col).agg({
+        'price': 'mean',
+        'lat': 'mean',
+        'lon': 'mean',
+        'area': 'count'
+    }).reset_index()
+    stats = stats[stats['area'] >= 2]
+    return stats.sort_values(by='price', ascending=False).head(top_n)
+
+
+def compute_legal_counts(df):
+    # Cột legal đọc từ dataset_store là Categorical: đổi về object trước khi fillna (tránh lỗi
+    # "new category") và để value_counts chỉ đếm giá trị còn lại sau lọc (không có lát 0 tin)
+    legal_counts = df['legal'].astype(object).fillna("Chưa xác định").value_counts().reset_index()
+    legal_counts.columns = ['Pháp lý', 'Số lượng']
+    return legal_counts
+
+
+def compute_shape_ratio_hist(df, bins=SHAPE_RATIO_BINS):
+    """Histogram tỷ lệ Dài/Rộng (<= 20): (cận trái các cột, độ rộng cột, số tin)"""
+    front = df['front_width'].to_numpy(dtype=float)
+    area = df['area'].to_numpy(dtype=float)
+    valid = (front > 0) & (area > 0)
+    ratio = area[valid] / front[valid] / front[valid]
+    ratio = ratio[ratio <= 20]
+    if not len(ratio):
+        return None
+    counts, edges = np.histogram(ratio, bins=bins)
+    return {'left': edges[:-1], 'width': np.diff(edges), 'count': counts}
+
+
+# ==============================================================================
+# 3. SCATTER DIỆN TÍCH - GIÁ: HỒI QUY ĐÓNG + LẤY MẪU PHÂN TẦNG
+# ==============================================================================
+# Thay cho trendline="ols" (statsmodels fit lại từng nhóm mỗi lần rerun):
+# hệ số OLS y = a + b*x của mọi nhóm tính 1 lần bằng np.bincount.
+# Trên SCATTER_POINT_BUDGET điểm thì lấy mẫu theo tỷ lệ từng nhóm (nhóm nào cũng còn điểm).
+
+SCATTER_POINT_BUDGET = 5000
+
+
+def grouped_ols(x, y, codes, n_groups):
+    """
+    OLS 1 biến cho từng nhóm (dạng đóng, đã trừ trung bình để ổn định số học).
+    Trả về (n, slope, intercept) mỗi mảng dài n_groups. Nhóm x không đổi -> slope 0.
+    """
+    n = np.bincount(codes, minlength=n_groups).astype(float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_x = np.bincount(codes, weights=x, minlength=n_groups) / n
+        mean_y = np.bincount(codes, weights=y, minlength=n_groups) / n
+        dx = x - mean_x[codes]
+        sxy = np.bincount(codes, weights=dx * (y - mean_y[codes]), minlength=n_groups)
+        sxx = np.bincount(codes, weights=dx * dx, minlength=n_groups)
+        slope = np.where(sxx > 0, sxy / sxx, 0.0)
+    intercept = mean_y - slope * mean_x
+    return n, slope, intercept
+
+
+def stratified_sample_positions(codes, budget, seed=42):
+    """
+    Vị trí các dòng được giữ khi lấy mẫu phân tầng tối đa ~budget điểm:
+    mỗi nhóm giữ tỷ lệ như nhau (tối thiểu 1 điểm). Không vượt budget thì giữ hết.
+    """
+    n_total = len(codes)
+    if n_total <= budget:
+        return np.arange(n_total)
+    counts = np.bincount(codes)
+    quota = np.maximum(1, np.round(counts * budget / n_total)).astype(np.int64)
+
+    # Xếp ngẫu nhiên trong từng nhóm rồi lấy `quota` dòng đầu mỗi nhóm
+    keys = np.random.default_rng(seed).random(n_total)
+    order = np.lexsort((keys, codes))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    rank = np.arange(n_total) - starts[codes[order]]
+    keep = order[rank < quota[codes[order]]]
+    return np.sort(keep)
+
+
+class ScatterSummary:
+    """
+    Dữ liệu cho biểu đồ Diện tích - Giá:
+      - fits  : mỗi nhóm màu 1 dòng (group, n, slope, intercept, x_min, x_max)
+      - points: mẫu điểm (area, price, nhóm màu) tối đa ~SCATTER_POINT_BUDGET
+    """
+
+    def __init__(self, df, color_col=None, budget=SCATTER_POINT_BUDGET):
+        work = df[(df['area'] > 0) & (df['price'] > 0)]
+        if len(work) and work['area'].max() > 1000:
+            work = work[work['area'] < 1000]
+        self.color_col = color_col if color_col in df.columns else None
+        self.n_points = len(work)
+
+        if self.color_col:
+            # Thứ tự nhóm theo lần xuất hiện đầu tiên (giống thứ tự màu của plotly express)
+            codes, groups = pd.factorize(work[self.color_col], sort=False)
+            has_group = codes >= 0
+            work, codes = work[has_group], codes[has_group]
+            groups = [str(g) for g in groups]
+        else:
+            codes, groups = np.zeros(len(work), dtype=np.int64), ['Tất cả']
+
+        x = work['area'].to_numpy(dtype=float)
+        y = work['price'].to_numpy(dtype=float)
+        n_groups = len(groups)
+        n, slope, intercept = grouped_ols(x, y, codes, n_groups)
+        x_min = np.full(n_groups, np.inf)
+        x_max = np.full(n_groups, -np.inf)
+        np.minimum.at(x_min, codes, x)
+        np.maximum.at(x_max, codes, x)
+        self.fits = pd.DataFrame({
+            'group': groups, 'n': n.astype(int), 'slope': slope, 'intercept': intercept,
+            'x_min': x_min, 'x_max': x_max,
+        })
+
+        keep = stratified_sample_positions(codes, budget)
+        self.points = pd.DataFrame({
+            'area': x[keep], 'price': y[keep],
+            'group': np.asarray(groups, dtype=object)[codes[keep]] if n_groups else [],
+        })
+
+
+# ==============================================================================
+# 4. BOX PLOT GIÁ THEO LOẠI ĐƯỜNG (THỐNG KÊ TÍNH SẴN)
+# ==============================================================================
+# Chia nhóm bằng pd.cut (vector hóa), tính tứ phân vị / râu / outlier ngay ở server.
+# Trình duyệt chỉ nhận vài con số mỗi nhóm + tối đa MAX_BOX_OUTLIERS điểm outlier.
+
+ROAD_TYPE_BINS = [-np.inf, 2.5, 5.0, 10.0, np.inf]
+ROAD_TYPE_LABELS = ["1. Hẻm nhỏ", "2. Hẻm xe hơi", "3. Đường ô tô tránh", "4. Mặt tiền"]
+MAX_PRICE_PER_M2 = 500
+MAX_BOX_OUTLIERS = 200
+
+
+def classify_road_type(access_road):
+    """< 2.5m: Hẻm nhỏ | < 5m: Hẻm xe hơi | < 10m: Đường ô tô tránh | còn lại: Mặt tiền"""
+    return pd.cut(access_road, bins=ROAD_TYPE_BINS, labels=ROAD_TYPE_LABELS, right=False)
+
+
+def box_stats(values, max_outliers=MAX_BOX_OUTLIERS, seed=42):
+    """
+    Thống kê box plot giống plotly (tứ phân vị nội suy tuyến tính, râu 1.5 IQR
+    chạm điểm dữ liệu xa nhất còn trong ngưỡng) + mẫu outlier có giới hạn.
+    """
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    outliers = values[(values < q1 - 1.5 * iqr) | (values > q3 + 1.5 * iqr)]
+    if len(outliers) > max_outliers:
+        outliers = np.random.default_rng(seed).choice(outliers, max_outliers, replace=False)
+    return {
+        'n': len(values), 'q1': q1, 'median': median, 'q3': q3,
+        'lowerfence': inside.min(), 'upperfence': inside.max(), 'outliers': outliers,
+    }
+
+
+def compute_road_type_boxes(df):
+    """Thống kê box đơn giá (Tr/m²) cho từng loại đường có dữ liệu, theo thứ tự nhãn"""
+    work = df[(df['access_road'] > 0) & (df['area'] > 0)]
+    ppm2 = work['price'].to_numpy(dtype=float) * 1000 / work['area'].to_numpy(dtype=float)
+    road_type = classify_road_type(work['access_road'].to_numpy(dtype=float))
+    keep = ppm2 < MAX_PRICE_PER_M2
+    ppm2, codes = ppm2[keep], np.asarray(road_type.codes)[keep]
+
+    boxes = {}
+    for code, label in enumerate(ROAD_TYPE_LABELS):
+        values = ppm2[codes == code]
+        if len(values):
+            boxes[label] = box_stats(values)
+    return boxes
+
+
+class DashboardCube:
+    """Mọi tổng hợp của 1 dataset cho dashboard (tính 1 lần qua cached('cube', ...))"""
+
+    def __init__(self, df, clean_df, hover_col=None):
+        self.n_listings = len(df)
+        self.kpi = compute_kpi(df) if not df.empty else None
+
+        self.group_col = next((c for c in GROUP_COLS if c in df.columns), None)
+        self.top_groups = None
+        if self.group_col and clean_df is not None and not clean_df.empty:
+            self.top_groups = compute_top_groups(clean_df, self.group_col)
+
+        self.legal_counts = compute_legal_counts(df) if 'legal' in df.columns else None
+        self.shape_ratio_hist = compute_shape_ratio_hist(df) if 'front_width' in df.columns else None
+        self.scatter = ScatterSummary(df, color_col='legal') if not df.empty else None
+        self.road_type_boxes = compute_road_type_boxes(df) if 'access_road' in df.columns else None
+        self.map_levels = MapLevels(clean_df, hover_col=hover_col)
@@ -0,0 +1,80 @@
+import os
+import pickle
+import hashlib
+import threading
+
+# ==============================================================================
+# BỘ NHỚ ĐỆM ARTIFACT (ENCODER / KMEANS / MODEL) - 1 LẦN / PROCESS
+# ==============================================================================
+# Mọi nơi cần file .pkl (preprocessor, loader) đều lấy qua đây thay vì tự open + unpickle.
+# Mỗi file chỉ được unpickle 1 lần cho mỗi process; nếu file trên đĩa đổi
+# (mtime hoặc kích thước khác) thì lần gọi sau sẽ tự load lại bản mới.
+
+_CACHE = {}       # đường dẫn tuyệt đối -> (chữ ký file, object)
+_DIGESTS = {}     # đường dẫn tuyệt đối -> (chữ ký file, hash nội dung)
+_LOCK = threading.Lock()
+
+
+def file_signature(path):
+    """Chữ ký rẻ của file: (mtime_ns, size). Đổi nội dung -> đổi chữ ký."""
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def file_digest(path):
+    """
+    Hash nội dung file (blake2b). Chỉ đọc lại file khi chữ ký (mtime/size) thay đổi.
+    """
+    path = os.path.abspath(path)
+    signature = file_signature(path)
+    cached = _DIGESTS.get(path)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    digest = h.hexdigest()
+    _DIGESTS[path] = (signature, digest)
+    return digest
+
+
+def read_artifact(path):
+    """Đọc 1 file .pkl KHÔNG qua cache (Thử joblib trước, pickle sau)"""
+    import joblib  # chỉ nạp khi thật sự đọc artifact (import module này không tốn gì)
+    try:
+        return joblib.load(path)
+    except:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+
+def load_artifact(path):
+    """
+    Lấy artifact từ cache của process. Trả về None nếu file không tồn tại.
+    Tự động load lại khi file trên đĩa thay đổi.
+    """
+    path = os.path.abspath(path)
+    if not os.path.exists(path):
+        evict(path)
+        return None
+
+    signature = file_signature(path)
+    cached = _CACHE.get(path)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    with _LOCK:
+        # Kiểm tra lại sau khi lấy khóa (thread khác có thể vừa load xong)
+        cached = _CACHE.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        obj = read_artifact(path)
+        _CACHE[path] = (signature, obj)
+        return obj
+
+
+def evict(path):
+    """Bỏ 1 artifact khỏi cache (để giải phóng RAM)"""
+    _CACHE.pop(os.path.abspath(path), None)
@@ -0,0 +1,162 @@
+"""
+CLI định giá hàng loạt (không cần mở trình duyệt).
+
+Đọc file CSV/Parquet theo từng chunk, mỗi chunk đi qua đúng luồng của
+app.execute_prediction_flow (process_key -> transform_input -> khớp cột -> predict)
+nhưng chỉ gọi model.predict 1 lần cho cả chunk. Các chunk được chia cho
+process pool với hàng đợi giới hạn, nên RAM không tăng theo kích thước file.
+
+Ví dụ:
+    python -m src.batch_predict data/listings.csv -o out.csv --property-type "Nhà phố" --city-mode "Hà Nội"
+    python -m src.batch_predict listings.parquet -o out.parquet --workers 4 --chunksize 50000
+
+Nếu file có sẵn cột 'property_type' (và 'city_mode'), mỗi dòng được định tuyến
+theo giá trị của chính nó thay vì tham số dòng lệnh.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src import predictor
+
+ROUTE_COLS = ['city_mode', 'property_type']
+
+# ==============================================================================
+# 1. ĐỌC DỮ LIỆU THEO CHUNK (STREAMING)
+# ==============================================================================
+
+def iter_chunks(path, chunksize):
+    """Sinh lần lượt từng DataFrame con, không bao giờ đọc cả file vào RAM"""
+    if path.lower().endswith(('.parquet', '.pq')):
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+
+class ChunkWriter:
+    """Ghi nối tiếp từng chunk kết quả ra CSV hoặc Parquet"""
+
+    def __init__(self, path):
+        self.path = path
+        self.is_parquet = path.lower().endswith(('.parquet', '.pq'))
+        self._writer = None
+        self._header_written = False
+
+    def write(self, df):
+        if self.is_parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table.cast(self._writer.schema))
+        else:
+            df.to_csv(self.path, mode='a' if self._header_written else 'w',
+                      header=not self._header_written, index=False)
+            self._header_written = True
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+# ==============================================================================
+# 2. WORKER: ĐỊNH GIÁ 1 CHUNK (CHẠY TRONG PROCESS CON)
+# ==============================================================================
+
+def score_frame(df, city_mode, property_type):
+    """
+    Định giá N dòng cùng 1 loại hình (1 lần predict cho cả nhóm).
+    Trả về mảng giá thực (Tỷ); NaN nếu không có model.
+    """
+    try:
+        return predictor.predict(df, city_mode, property_type)
+    except predictor.ModelNotFoundError:
+        return np.full(len(df), np.nan)
+
+
+def score_chunk(chunk, city_mode, property_type, keep_cols):
+    """Định giá 1 chunk, tự định tuyến theo cột property_type/city_mode nếu có"""
+    chunk = chunk.reset_index(drop=True)
+    pred_real = np.full(len(chunk), np.nan)
+
+    if 'property_type' in chunk.columns:
+        routes = chunk[ROUTE_COLS[1:]].copy()
+        routes['city_mode'] = chunk['city_mode'] if 'city_mode' in chunk.columns else city_mode
+        for (row_city, row_type), idx in routes.groupby(ROUTE_COLS, dropna=False).groups.items():
+            pred_real[idx] = score_frame(chunk.loc[idx], row_city, row_type)
+    else:
+        pred_real[:] = score_frame(chunk, city_mode, property_type)
+
+    out = chunk if keep_cols is None else chunk[[c for c in keep_cols if c in chunk.columns]]
+    out = out.copy()
+    out['pred_real'] = pred_real
+    return out
+
+# ==============================================================================
+# 3. ĐIỀU PHỐI: PROCESS POOL + HÀNG ĐỢI GIỚI HẠN
+# ==============================================================================
+
+def run(input_path, output_path, city_mode, property_type,
+        chunksize=20000, workers=None, max_pending=None, keep_cols=None):
+    """
+    Chạy toàn bộ pipeline. Tối đa `max_pending` chunk nằm trong hàng đợi cùng lúc,
+    kết quả được ghi ra theo đúng thứ tự của file đầu vào.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 2
+    writer = ChunkWriter(output_path)
+    pending = deque()
+    n_rows = 0
+    start = time.perf_counter()
+
+    def flush_oldest():
+        nonlocal n_rows
+        result = pending.popleft().result()
+        writer.write(result)
+        n_rows += len(result)
+        print(f"✅ Đã định giá {n_rows:,} dòng ({time.perf_counter() - start:,.1f}s)", file=sys.stderr)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk in iter_chunks(input_path, chunksize):
+                if len(pending) >= max_pending:
+                    flush_oldest()
+                pending.append(pool.submit(score_chunk, chunk, city_mode, property_type, keep_cols))
+            while pending:
+                flush_oldest()
+    finally:
+        writer.close()
+    return n_rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Định giá hàng loạt BĐS từ file CSV/Parquet")
+    parser.add_argument('input', help="File đầu vào (.csv hoặc .parquet)")
+    parser.add_argument('-o', '--output', required=True, help="File kết quả (.csv hoặc .parquet)")
+    parser.add_argument('--property-type', default="Nhà phố",
+                        help='Loại hình như Sidebar: "Nhà phố", "Căn hộ Chung cư", "Đất nền", "Biệt thự / Villa"')
+    parser.add_argument('--city-mode', default="Hồ Chí Minh", help='Khu vực cho Nhà phố: "Hồ Chí Minh" | "Hà Nội"')
+    parser.add_argument('--chunksize', type=int, default=20000, help="Số dòng mỗi chunk")
+    parser.add_argument('--workers', type=int, default=None, help="Số process (mặc định = số CPU)")
+    parser.add_argument('--max-pending', type=int, default=None, help="Số chunk tối đa trong hàng đợi (mặc định = 2 x workers)")
+    parser.add_argument('--keep-cols', default=None, help="Các cột đầu vào giữ lại, cách nhau bởi dấu phẩy (mặc định: tất cả)")
+    args = parser.parse_args(argv)
+
+    keep_cols = args.keep_cols.split(',') if args.keep_cols else None
+    n_rows = run(args.input, args.output, args.city_mode, args.property_type,
+                 chunksize=args.chunksize, workers=args.workers,
+                 max_pending=args.max_pending, keep_cols=keep_cols)
+    print(f"🎉 Hoàn tất: {n_rows:,} dòng -> {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Lưu trữ dữ liệu dạng cột (Arrow IPC / Feather v2, không nén) + memory-map khi đọc.
+
+Mỗi file data/*.csv được chuyển 1 lần sang data/*.arrow theo schema cố định:
+  - Cột chữ (legal, direction, interior, project_name_raw) -> dictionary (category)
+  - Số thực -> float32, trừ lat/lon giữ float64 (cần độ chính xác ~1m cho KMeans/bản đồ)
+  - Số nguyên nhỏ -> int8/int16 (chỉ khi mọi giá trị đều nguyên và vừa khoảng, ngược lại float32)
+Lần đọc sau chỉ memory-map file .arrow (không parse text, không suy luận dtype),
+các process cùng máy dùng chung page cache của OS.
+
+Chạy tay để build trước toàn bộ:
+    python -m src.dataset_store
+"""
+import os
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# ==============================================================================
+# 1. SCHEMA CỐ ĐỊNH CHO CÁC CỘT ĐÃ BIẾT
+# ==============================================================================
+_CATEGORY = pa.dictionary(pa.int32(), pa.string())
+
+COLUMN_TYPES = {
+    # Tọa độ: giữ float64
+    'lat': pa.float64(), 'lon': pa.float64(),
+    # Số thực: float32 là đủ
+    'area': pa.float32(), 'price': pa.float32(),
+    'front_width': pa.float32(), 'access_road': pa.float32(),
+    'bedrooms': pa.float32(), 'bathrooms': pa.float32(),
+    'land_depth': pa.float32(), 'shape_ratio': pa.float32(),
+    'business_potential': pa.float32(), 'dist_to_center': pa.float32(),
+    'project_name': pa.float32(),
+    # Số nguyên nhỏ
+    'floors': pa.int16(), 'geo_cluster': pa.int16(),
+    'is_car_accessible': pa.int8(), 'is_corner': pa.int8(),
+    'road_class': pa.int8(), 'road_type': pa.int8(),
+    # Chữ -> category
+    'legal': _CATEGORY, 'direction': _CATEGORY, 'interior': _CATEGORY,
+    'project_name_raw': _CATEGORY,
+}
+
+# Metadata lưu chữ ký file CSV nguồn để biết khi nào cần build lại
+SOURCE_META_KEY = b'source_signature'
+
+
+def arrow_path_for(csv_path):
+    return os.path.splitext(csv_path)[0] + '.arrow'
+
+
+def _source_signature(csv_path):
+    stat = os.stat(csv_path)
+    return json.dumps([stat.st_mtime_ns, stat.st_size]).encode()
+
+
+def _inferred_type(series):
+    if series.dtype == object or pd.api.types.is_string_dtype(series):
+        return _CATEGORY
+    return pa.Array.from_pandas(series).type
+
+
+def _column_type(series, target):
+    """
+    Kiểu Arrow cho 1 cột đã biết, chỉ thu hẹp khi dữ liệu thật sự vừa:
+      - int8/int16: mọi giá trị (trừ NaN) là số nguyên trong khoảng của kiểu, ngược lại float32
+        (vd. floors = 2.5 -> float32 thay vì lỗi "truncated" làm mất cả dataset)
+      - Cột số mà CSV có chữ, cột chữ mà CSV toàn số -> để Arrow tự suy luận như cột lạ
+    """
+    if pa.types.is_dictionary(target):
+        return target if series.isna().all() or not pd.api.types.is_numeric_dtype(series) else _inferred_type(series)
+    if not pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        return target if series.isna().all() else _inferred_type(series)
+    if pa.types.is_integer(target):
+        values = series.to_numpy(dtype=float, na_value=np.nan)
+        values = values[~np.isnan(values)]
+        info = np.iinfo(target.to_pandas_dtype())
+        if len(values) and not (np.all(values == np.round(values))
+                                and values.min() >= info.min and values.max() <= info.max):
+            return pa.float32()
+    return target
+
+
+def build_schema(df):
+    """Schema Arrow cho DataFrame: cột đã biết theo COLUMN_TYPES (nếu dữ liệu vừa), cột lạ để Arrow tự suy luận"""
+    fields = []
+    for col in df.columns:
+        if col in COLUMN_TYPES:
+            arrow_type = _column_type(df[col], COLUMN_TYPES[col])
+        else:
+            arrow_type = _inferred_type(df[col])
+        fields.append(pa.field(col, arrow_type))
+    return pa.schema(fields)
+
+# ==============================================================================
+# 2. CHUYỂN ĐỔI CSV -> ARROW
+# ==============================================================================
+
+def read_csv_typed(csv_path):
+    """Đọc CSV (chuẩn hóa tên cột chữ thường) và ép về đúng schema"""
+    df = pd.read_csv(csv_path)
+    df.columns = [c.lower() for c in df.columns]
+    schema = build_schema(df)
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def convert_dataset(csv_path):
+    """Chuyển 1 file CSV sang .arrow (ghi file tạm rồi đổi tên để không process nào đọc file dở)"""
+    table = read_csv_typed(csv_path)
+    meta = dict(table.schema.metadata or {})
+    meta[SOURCE_META_KEY] = _source_signature(csv_path)
+    table = table.replace_schema_metadata(meta)
+
+    out_path = arrow_path_for(csv_path)
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    feather.write_feather(table, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, out_path)
+    return table
+
+# ==============================================================================
+# 3. ĐỌC (MEMORY-MAP)
+# ==============================================================================
+
+def _open_if_fresh(arrow_path, csv_path):
+    """Memory-map file .arrow nếu còn khớp với CSV nguồn (so chữ ký trong metadata), ngược lại None"""
+    if not os.path.exists(arrow_path):
+        return None
+    try:
+        table = feather.read_table(arrow_path, memory_map=True)
+    except Exception:
+        return None
+    if os.path.exists(csv_path) and (table.schema.metadata or {}).get(SOURCE_META_KEY) != _source_signature(csv_path):
+        return None
+    return table
+
+
+def read_dataset(csv_path):
+    """
+    Đọc 1 dataset dưới dạng DataFrame.
+      - Có .arrow còn mới -> memory-map (cột số không copy, cột chữ là category)
+      - Chưa có/cũ -> chuyển đổi 1 lần rồi dùng luôn kết quả
+    Cột số trỏ thẳng vào vùng nhớ map (read-only): muốn sửa thì gán lại cả cột.
+    """
+    arrow_path = arrow_path_for(csv_path)
+    table = _open_if_fresh(arrow_path, csv_path)
+    if table is None:
+        try:
+            table = convert_dataset(csv_path)
+        except OSError as e:
+            # Thư mục data chỉ đọc -> vẫn trả về dữ liệu đã ép schema
+            print(f"⚠️ Không ghi được {arrow_path}: {e}")
+            table = read_csv_typed(csv_path)
+    return table.to_pandas(split_blocks=True)
+
+
+if __name__ == "__main__":
+    DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+    for name in sorted(os.listdir(DATA_DIR)):
+        if name.endswith('.csv'):
+            table = convert_dataset(os.path.join(DATA_DIR, name))
+            print(f"✅ {name} -> {os.path.basename(arrow_path_for(name))} ({table.num_rows:,} dòng, {table.nbytes / 1024**2:,.1f} MB)")
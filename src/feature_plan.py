@@ -0,0 +1,94 @@
+import threading
+
+import numpy as np
+
+from src.preprocessor import FEATURE_ORDERS
+
+# ==============================================================================
+# KẾ HOẠCH CỘT (FEATURE PLAN) - BIÊN DỊCH 1 LẦN / MODEL
+# ==============================================================================
+# Thay cho việc dò model.feature_names_in_ + fill 0 từng cột ở MỖI lần bấm dự báo:
+# lúc load model ta "biên dịch" sẵn thứ tự cột, kiểu dữ liệu và giá trị mặc định,
+# sau đó chỉ việc chép từng cột vào 1 mảng numpy float32 cấp phát sẵn.
+
+# Mapping kiểu của XGBoost Booster (feature_types) -> dtype numpy lúc train
+XGB_TYPE_MAP = {'float': 'float64', 'int': 'int64', 'i': 'bool', 'q': 'float64', 'c': 'category'}
+
+
+class FeaturePlan:
+    """
+    Layout cột cố định của 1 model.
+      - columns : thứ tự cột model yêu cầu
+      - dtypes  : kiểu dữ liệu lúc train (tham khảo/debug)
+      - defaults: giá trị điền khi worker không tạo ra cột đó
+    """
+
+    def __init__(self, columns, dtypes=None, defaults=None):
+        self.columns = list(columns)
+        self.dtypes = dict(dtypes or {})
+        self.defaults = np.array([(defaults or {}).get(c, 0.0) for c in self.columns], dtype=np.float32)
+        # Buffer 1 dòng riêng cho từng thread (Streamlit chạy mỗi phiên trên 1 thread)
+        self._local = threading.local()
+
+    def __len__(self):
+        return len(self.columns)
+
+    def to_array(self, processed_df, out=None):
+        """
+        Chép processed_df vào mảng (N, n_features) float32 theo đúng thứ tự model.
+        1 dòng (Sidebar) dùng lại buffer cấp phát sẵn của thread; batch cấp phát 1 lần cho cả N dòng.
+        Cột thiếu lấy giá trị mặc định, cột thừa bị bỏ qua.
+        """
+        n_rows = len(processed_df)
+        if out is None:
+            if n_rows == 1:
+                out = getattr(self._local, 'row', None)
+                if out is None:
+                    out = self._local.row = np.empty((1, len(self.columns)), dtype=np.float32)
+            else:
+                out = np.empty((n_rows, len(self.columns)), dtype=np.float32)
+
+        present = processed_df.columns
+        for j, col in enumerate(self.columns):
+            if col in present:
+                out[:, j] = processed_df[col].to_numpy(dtype=np.float32)
+            else:
+                out[:, j] = self.defaults[j]
+        return out
+
+
+def compile_plan(model, process_key):
+    """
+    Biên dịch FeaturePlan cho model, đồng thời so khớp với FEATURE_ORDERS của worker.
+    Mọi sai lệch (thiếu/thừa/lệch thứ tự cột) chỉ in ra 1 lần tại đây, lúc load model.
+    """
+    worker_cols = FEATURE_ORDERS.get(process_key, [])
+
+    if hasattr(model, 'feature_names_in_'):
+        model_cols = [str(c) for c in model.feature_names_in_]
+    else:
+        model_cols = list(worker_cols)
+
+    # Kiểu dữ liệu lấy từ Booster (nếu có)
+    dtypes = {}
+    try:
+        feature_types = model.get_booster().feature_types or []
+        dtypes = {c: XGB_TYPE_MAP.get(t, t) for c, t in zip(model_cols, feature_types)}
+    except Exception:
+        pass
+
+    # --- So khớp worker <-> model (báo 1 lần) ---
+    missing = [c for c in model_cols if c not in worker_cols]
+    extra = [c for c in worker_cols if c not in model_cols]
+    if missing or extra:
+        print("\n" + "="*40)
+        print(f"⚠️ CẢNH BÁO: Model {process_key} không khớp với FEATURE_ORDERS của worker")
+        if missing:
+            print(f"   - Model cần nhưng worker không tạo (sẽ fill 0): {missing}")
+        if extra:
+            print(f"   - Worker tạo nhưng model không dùng (bỏ qua): {extra}")
+        print("="*40 + "\n")
+    elif model_cols != worker_cols:
+        print(f"ℹ️ Model {process_key}: thứ tự cột khác FEATURE_ORDERS, đã sắp lại theo model.")
+
+    return FeaturePlan(model_cols, dtypes=dtypes)
@@ -0,0 +1,227 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from src import artifacts
+
+# ==============================================================================
+# ENGINE KHOẢNG CÁCH TỚI TÂM GẦN NHẤT (VECTOR HÓA CHO CẢ BATCH)
+# ==============================================================================
+# Cho N điểm và M tâm (thành phố, quận/huyện...), trả về tâm gần nhất + khoảng cách (km).
+#   - M nhỏ (vài chục tâm)  : ma trận haversine N x M, chia khúc theo N để giới hạn RAM
+#   - M lớn (hàng trăm tâm+) : BallTree haversine trên các tâm, O(N log M)
+
+EARTH_RADIUS_KM = 6371
+
+# Số ô tối đa của 1 khúc ma trận (N_khúc x M) ~ 32 MB float64 mỗi mảng tạm
+MAX_MATRIX_CELLS = 1 << 22
+# Từ bao nhiêu tâm trở lên thì chuyển sang BallTree
+TREE_MIN_CENTERS = 256
+# CentroidIndex: 2 tâm gần nhất chênh nhau (bình phương khoảng cách) dưới
+# TIE_RELATIVE_TOLERANCE x (|x|² + max|c|²) thì coi là "suýt hòa" và hỏi lại KMeans.predict.
+# Sai số làm tròn của |c|² - 2x·c chỉ cỡ vài eps x (|x|² + |c|²), nhỏ hơn ngưỡng này nhiều bậc,
+# nên ngoài các dòng sát ranh giới 2 cụm, nhãn không thể lệch so với sklearn.
+TIE_RELATIVE_TOLERANCE = 1e-10
+# Khúc nhỏ (~512 KB / mảng tạm) để ma trận N x K nằm gọn trong cache CPU
+CENTROID_BLOCK_CELLS = 1 << 16
+# Từ bao nhiêu dòng trở lên thì gọi thẳng KMeans.predict: vòng Cython của sklearn gộp mọi bước
+# vào 1 lượt, nhanh hơn numpy khi chi phí cố định (~1ms / lần gọi) không còn đáng kể
+SKLEARN_MIN_ROWS = 8192
+
+
+def haversine_np(lat1, lon1, lat2, lon2):
+    """Hàm tính khoảng cách (km) giữa 2 điểm tọa độ"""
+    R = EARTH_RADIUS_KM
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dphi = np.radians(lat2 - lat1)
+    dlambda = np.radians(lon2 - lon1)
+    a = np.sin(dphi/2.0)**2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda/2.0)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return R * c
+
+
+def load_centers(csv_path):
+    """Đọc danh sách tâm từ CSV có cột name, lat, lon (VD: toàn bộ trụ sở quận/huyện)"""
+    df = pd.read_csv(csv_path)
+    df.columns = [c.lower() for c in df.columns]
+    return dict(zip(df['name'], zip(df['lat'], df['lon'])))
+
+
+class CenterIndex:
+    """
+    Tập tâm cố định (dict tên -> (lat, lon)), dựng 1 lần rồi truy vấn cho cả batch.
+    """
+
+    def __init__(self, centers, use_tree=None):
+        self.names = list(centers)
+        coords = np.array([centers[n] for n in self.names], dtype=float).reshape(-1, 2)
+        self.lats, self.lons = coords[:, 0], coords[:, 1]
+        self._cos_lats = np.cos(np.radians(self.lats))
+
+        if use_tree is None:
+            use_tree = len(self.names) >= TREE_MIN_CENTERS
+        self.tree = None
+        if use_tree and len(self.names):
+            from sklearn.neighbors import BallTree
+            self.tree = BallTree(np.radians(coords), metric='haversine')
+
+    def __len__(self):
+        return len(self.names)
+
+    def nearest(self, lat, lon):
+        """
+        Tâm gần nhất cho từng điểm.
+        Trả về (chỉ số tâm, khoảng cách km). Tọa độ NaN -> chỉ số -1, khoảng cách inf.
+        """
+        lat = np.atleast_1d(np.asarray(lat, dtype=float))
+        lon = np.atleast_1d(np.asarray(lon, dtype=float))
+        idx = np.full(len(lat), -1, dtype=np.int64)
+        dist = np.full(len(lat), np.inf)
+        if not len(self.names):
+            return idx, dist
+
+        valid = ~(np.isnan(lat) | np.isnan(lon))
+        if not valid.all():
+            idx[valid], dist[valid] = self.nearest(lat[valid], lon[valid])
+            return idx, dist
+
+        if self.tree is not None:
+            d, i = self.tree.query(np.radians(np.column_stack([lat, lon])), k=1)
+            return i[:, 0], d[:, 0] * EARTH_RADIUS_KM
+
+        # Ma trận N x M theo từng khúc hàng. Khoảng cách tăng đơn điệu theo số hạng `a` của
+        # haversine nên chỉ cần argmin trên `a`; arctan2 chỉ tính cho N tâm được chọn.
+        step = max(1, MAX_MATRIX_CELLS // len(self.names))
+        for start in range(0, len(lat), step):
+            end = start + step
+            blat, blon = lat[start:end, None], lon[start:end, None]
+            a = (np.sin(np.radians(self.lats - blat) / 2.0)**2
+                 + np.cos(np.radians(blat)) * self._cos_lats * np.sin(np.radians(self.lons - blon) / 2.0)**2)
+            idx[start:end] = a.argmin(axis=1)
+        dist = haversine_np(lat, lon, self.lats[idx], self.lons[idx])
+        return idx, dist
+
+    def nearest_distance(self, lat, lon):
+        """Chỉ khoảng cách (km) tới tâm gần nhất"""
+        return self.nearest(lat, lon)[1]
+
+    def nearest_name(self, lat, lon):
+        """Tên tâm gần nhất (None nếu tọa độ lỗi)"""
+        idx, _ = self.nearest(lat, lon)
+        names = np.array(self.names + [None], dtype=object)
+        return names[idx]
+
+    def distance_to_center(self, df):
+        """Cột dist_to_center (km) cho DataFrame có lat/lon (dùng cho dashboard / dữ liệu mới)"""
+        return pd.Series(self.nearest_distance(df['lat'].to_numpy(dtype=float), df['lon'].to_numpy(dtype=float)),
+                         index=df.index, name='dist_to_center')
+
+
+# ==============================================================================
+# GÁN CỤM KMEANS = TÂM GẦN NHẤT (KHÔNG QUA KMeans.predict)
+# ==============================================================================
+# KMeans.predict chỉ là argmin khoảng cách Euclid tới 20-100 tâm, nhưng mỗi lần gọi sklearn
+# kiểm tra input + dựng threadpool tốn hơn chính phép tính. Tâm được lấy ra 1 lần / file KMeans.
+
+class CentroidIndex:
+    """
+    Tâm cụm của 1 model KMeans (cột lat, lon). Nhãn trả về giống hệt kmeans.predict:
+    dòng nào 2 tâm gần nhất suýt bằng nhau thì hỏi lại chính kmeans.
+    """
+
+    def __init__(self, kmeans):
+        self.kmeans = kmeans
+        self.centers = np.ascontiguousarray(kmeans.cluster_centers_, dtype=np.float64)
+        self._center_sq = (self.centers ** 2).sum(axis=1)
+        self._max_center_sq = float(self._center_sq.max())
+        # Bộ đệm cho assign_point (dùng lại mọi lần gọi, khóa vì có nhiều thread dự báo)
+        self._point = np.empty(self.centers.shape[1])
+        self._diff = np.empty_like(self.centers)
+        self._dist = np.empty(len(self.centers))
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.centers)
+
+    def _sklearn_predict(self, coords):
+        names = getattr(self.kmeans, 'feature_names_in_', None)
+        if names is not None:   # model fit bằng DataFrame: truyền lại đúng tên cột, tránh cảnh báo
+            coords = pd.DataFrame(coords, columns=list(names))
+        return self.kmeans.predict(coords)
+
+    def assign(self, coords):
+        """
+        Nhãn cụm cho mảng (N, 2) [lat, lon] (không được có NaN - nơi gọi tự lọc như với sklearn).
+        Lô nhỏ (micro-batch, batch CLI): ma trận N x K theo từng khúc hàng; lô lớn: KMeans.predict.
+        """
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, self.centers.shape[1])
+        if len(coords) >= SKLEARN_MIN_ROWS:
+            return np.asarray(self._sklearn_predict(coords), dtype=np.int64)
+        labels = np.empty(len(coords), dtype=np.int64)
+        if len(self.centers) < 2:
+            labels[:] = 0
+            return labels
+
+        # Cùng công thức với sklearn: |x - c|² = |x|² + |c|² - 2x·c, bỏ |x|² (không đổi argmin)
+        # -> 1 phép nhân ma trận (BLAS) cho cả khúc
+        neg_two_centers_t = -2.0 * self.centers.T
+        near_tie = []
+        step = max(1, CENTROID_BLOCK_CELLS // len(self.centers))
+        for start in range(0, len(coords), step):
+            block = coords[start:start + step]
+            dist = block @ neg_two_centers_t
+            dist += self._center_sq
+            best = dist.argmin(axis=1)
+            labels[start:start + len(block)] = best
+
+            # Khoảng cách tới tâm gần thứ 2: che tâm gần nhất rồi lấy min lần nữa
+            rows = np.arange(len(block))
+            first = dist[rows, best]
+            dist[rows, best] = np.inf
+            gap = dist.min(axis=1) - first
+            tolerance = TIE_RELATIVE_TOLERANCE * ((block ** 2).sum(axis=1) + self._max_center_sq)
+            near_tie.append(start + np.flatnonzero(gap <= tolerance))
+
+        near_tie = np.concatenate(near_tie) if near_tie else []
+        if len(near_tie):
+            labels[near_tie] = self._sklearn_predict(coords[near_tie])
+        return labels
+
+    def assign_point(self, lat, lon):
+        """Nhãn cụm cho 1 điểm (luồng dự báo từng BĐS): chỉ dùng bộ đệm có sẵn, không cấp phát mảng"""
+        with self._lock:
+            self._point[0] = lat
+            self._point[1] = lon
+            np.subtract(self.centers, self._point, out=self._diff)
+            np.multiply(self._diff, self._diff, out=self._diff)
+            np.sum(self._diff, axis=1, out=self._dist)
+            best = int(self._dist.argmin())
+            if len(self._dist) < 2:
+                return best
+            first = self._dist[best]
+            self._dist[best] = np.inf
+            second = self._dist.min()
+
+        if second - first <= TIE_RELATIVE_TOLERANCE * (lat * lat + lon * lon + self._max_center_sq):
+            return int(self._sklearn_predict(np.array([[lat, lon]]))[0])
+        return best
+
+
+_CENTROID_INDEXES = {}   # đường dẫn file KMeans -> CentroidIndex
+
+
+def kmeans_index(kmeans_path):
+    """
+    CentroidIndex của file KMeans (None nếu không có file). Dựng lại khi cache artifact
+    load lại file (file trên đĩa đổi) -> luôn khớp với object KMeans đang dùng.
+    """
+    kmeans = artifacts.load_artifact(kmeans_path)
+    if kmeans is None:
+        return None
+    path = os.path.abspath(kmeans_path)
+    index = _CENTROID_INDEXES.get(path)
+    if index is None or index.kmeans is not kmeans:
+        index = _CENTROID_INDEXES[path] = CentroidIndex(kmeans)
+    return index
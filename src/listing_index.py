@@ -0,0 +1,141 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# ==============================================================================
+# INDEX LỌC CHÉO (CROSS-FILTER) CHO DASHBOARD
+# ==============================================================================
+# Dựng 1 lần / dataset:
+#   - Cột phân loại: mỗi giá trị 1 bitmap (np.packbits, 1 bit / tin)
+#   - Cột số      : mảng giá trị đã sắp xếp + thứ tự dòng -> khoảng [lo, hi] bằng searchsorted
+# Kết hợp bộ lọc = OR các bitmap trong cùng 1 cột, AND giữa các cột.
+
+CATEGORICAL_FILTERS = ['legal', 'direction', 'interior', 'geo_cluster', 'project_name_raw']
+NUMERIC_FILTERS = ['price', 'area']
+
+# Số tổ hợp bộ lọc gần nhất giữ lại DataFrame đã lọc (cùng bộ lọc -> cùng object -> cube dùng lại)
+MAX_CACHED_FILTERS = 16
+
+
+class FilterIndex:
+    def __init__(self, df):
+        self.n_rows = len(df)
+        self.bitmaps = {}      # cột -> {giá trị: bitmap}
+        self.counts = {}       # cột -> {giá trị: số tin}, sắp xếp giảm dần
+        self.sorted_values = {}
+        self.sorted_rows = {}
+        self._filtered = OrderedDict()
+        # Index dùng chung cho mọi phiên Streamlit (mỗi phiên 1 thread): khóa mọi thao tác LRU
+        self._lock = threading.Lock()
+
+        for col in CATEGORICAL_FILTERS:
+            if col not in df.columns:
+                continue
+            codes, values = pd.factorize(df[col], sort=True)
+            counts = np.bincount(codes[codes >= 0], minlength=len(values))
+            self.bitmaps[col] = {self._plain(v): np.packbits(codes == i) for i, v in enumerate(values)}
+            order = np.argsort(-counts, kind='stable')
+            self.counts[col] = {self._plain(values[i]): int(counts[i]) for i in order}
+
+        for col in NUMERIC_FILTERS:
+            if col not in df.columns:
+                continue
+            values = df[col].to_numpy(dtype=float)
+            order = np.argsort(values, kind='stable')   # NaN nằm cuối
+            self.sorted_values[col] = values[order]
+            self.sorted_rows[col] = order
+
+    @staticmethod
+    def _plain(value):
+        """numpy scalar -> kiểu Python (để so với giá trị từ widget)"""
+        return value.item() if isinstance(value, np.generic) else value
+
+    # --- THÔNG TIN CHO WIDGET ---
+    def options(self, col):
+        """Các giá trị của cột phân loại, nhiều tin trước"""
+        return list(self.counts.get(col, {}))
+
+    def value_range(self, col):
+        """(min, max) của cột số, bỏ NaN. None nếu cột không có dữ liệu."""
+        values = self.sorted_values.get(col)
+        if values is None:
+            return None
+        finite = values[~np.isnan(values)]
+        if not len(finite):
+            return None
+        return float(finite[0]), float(finite[-1])
+
+    # --- KẾT HỢP BỘ LỌC ---
+    def normalize(self, filters):
+        """
+        Bỏ bộ lọc không có tác dụng (list rỗng, khoảng phủ trọn min-max) và trả về
+        (bộ lọc đã chuẩn hóa, key hashable của tổ hợp).
+        """
+        active = {}
+        for col, value in (filters or {}).items():
+            if col in self.sorted_values:
+                full = self.value_range(col)
+                lo, hi = value
+                if full is None or (lo <= full[0] and hi >= full[1]):
+                    continue
+                active[col] = (float(lo), float(hi))
+            elif col in self.bitmaps and value:
+                active[col] = tuple(sorted(value, key=str))
+        return active, tuple(sorted(active.items()))
+
+    def range_bitmap(self, col, lo, hi):
+        values = self.sorted_values[col]
+        start = np.searchsorted(values, lo, side='left')
+        end = np.searchsorted(values, hi, side='right')
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[self.sorted_rows[col][start:end]] = True
+        return np.packbits(mask)
+
+    def mask(self, filters):
+        """Mask boolean các tin thỏa mọi bộ lọc. None = không lọc gì."""
+        active, _ = self.normalize(filters)
+        if not active:
+            return None
+        combined = None
+        for col, value in active.items():
+            if col in self.sorted_values:
+                bits = self.range_bitmap(col, *value)
+            else:
+                bitmaps = self.bitmaps[col]
+                bits = np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+                for v in value:
+                    if v in bitmaps:
+                        bits |= bitmaps[v]
+            combined = bits if combined is None else combined & bits
+        return np.unpackbits(combined, count=self.n_rows).astype(bool)
+
+    def apply(self, df, filters):
+        """
+        Trả về (DataFrame đã lọc, key bộ lọc). Không lọc gì -> chính df.
+        Cùng tổ hợp bộ lọc trả về cùng 1 object (để cache tổng hợp phía sau dùng lại).
+        """
+        _, key = self.normalize(filters)
+        if not key:
+            return df, key
+        with self._lock:
+            filtered = self._filtered.get(key)
+            if filtered is not None:
+                self._filtered.move_to_end(key)
+                return filtered, key
+
+        # Lọc ngoài khóa (phiên khác không phải chờ); 2 phiên cùng bộ lọc thì giữ bản đầu tiên
+        filtered = df[self.mask(filters)]
+        with self._lock:
+            filtered = self._filtered.setdefault(key, filtered)
+            self._filtered.move_to_end(key)
+            while len(self._filtered) > MAX_CACHED_FILTERS:
+                self._filtered.popitem(last=False)
+        return filtered, key
+
+
+def get_filter_index(df, key):
+    """Index lọc của dataset (dựng 1 lần, dựng lại nếu loader đọc lại dataset)"""
+    from src import aggregates
+    return aggregates.cached('filter_index', key, df, lambda: FilterIndex(df))
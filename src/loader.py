@@ -1,21 +1,60 @@
-import streamlit as st
 import pandas as pd
-import joblib
 import os
-import pickle
+import threading
 import numpy as np
 
+from src import artifacts
+from src import dataset_store
+from src import geo_distance
+from src import model_registry
+from src import spatial_index
+
 # --- CẤU HÌNH ĐƯỜNG DẪN ---
 current_dir = os.path.dirname(os.path.abspath(__file__))
 root_dir = os.path.dirname(current_dir)
-DATA_DIR = os.path.join(root_dir, 'data')
+# Trỏ sang thư mục dữ liệu khác (vd. dữ liệu tổng hợp từ src/synth_data.py) bằng REAL_ESTATE_DATA_DIR
+DATA_DIR_ENV = 'REAL_ESTATE_DATA_DIR'
+DATA_DIR = os.environ.get(DATA_DIR_ENV) or os.path.join(root_dir, 'data')
 MODEL_DIR = os.path.join(root_dir, 'models')
 
 # --- HÀM PHỤ TRỢ: GẮN CLUSTER ---
-def apply_kmeans_logic(df, model_filename):
+def geo_cluster_cache_path(source_path):
+    """File nhãn cluster lưu cạnh file dữ liệu: data/xxx.csv -> data/xxx.geo_cluster.npz"""
+    return os.path.splitext(source_path)[0] + '.geo_cluster.npz'
+
+
+def _load_cached_clusters(cache_path, data_digest, kmeans_digest, n_rows):
+    """Đọc nhãn đã lưu nếu vẫn khớp hash của cả file dữ liệu lẫn file KMeans, ngược lại None"""
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        with np.load(cache_path) as cached:
+            if (str(cached['data_digest']) == data_digest
+                    and str(cached['kmeans_digest']) == kmeans_digest
+                    and len(cached['labels']) == n_rows):
+                return cached['labels']
+    except Exception:
+        pass
+    return None
+
+
+def _save_cached_clusters(cache_path, labels, data_digest, kmeans_digest):
+    """Lưu nhãn (ghi file tạm rồi đổi tên). Thư mục chỉ đọc thì bỏ qua."""
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, labels=labels.astype(np.int32), data_digest=data_digest, kmeans_digest=kmeans_digest)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"⚠️ Không lưu được nhãn cluster {cache_path}: {e}")
+
+
+def apply_kmeans_logic(df, model_filename, source_path=None):
     """
     Hàm nhận vào DataFrame và tên file model KMeans.
     Trả về DataFrame đã có thêm cột 'geo_cluster'.
+    Nếu có source_path (file dữ liệu gốc), nhãn được lưu cạnh file đó và dùng lại
+    cho tới khi hash nội dung của file dữ liệu hoặc file KMeans thay đổi.
     """
     if df is None or df.empty:
         return df
@@ -29,27 +68,41 @@ def apply_kmeans_logic(df, model_filename):
         return df
 
     try:
-        # Load Model (Thử joblib trước, pickle sau)
-        try:
-            kmeans = joblib.load(kmeans_path)
-        except:
-            with open(kmeans_path, 'rb') as f:
-                kmeans = pickle.load(f)
-
-        # Chỉ predict trên các dòng có tọa độ hợp lệ
-        valid_mask = df['lat'].notna() & df['lon'].notna() & (df['lat'] != 0)
-        valid_data = df.loc[valid_mask]
-
-        if not valid_data.empty:
-            # Sklearn yêu cầu input là array 2 cột [[lat, lon]]
-            coords = valid_data[['lat', 'lon']]
-            clusters = kmeans.predict(coords)
-
-            # Gán ngược lại vào DF gốc
-            df.loc[valid_mask, 'geo_cluster'] = clusters
-            
-            # Fill các dòng lỗi bằng -1
-            df['geo_cluster'] = df['geo_cluster'].fillna(-1).astype(int)
+        # 0. Dùng lại nhãn đã lưu (khỏi unpickle KMeans + predict lại ~85k điểm)
+        cache_path = None
+        if source_path and os.path.exists(source_path):
+            cache_path = geo_cluster_cache_path(source_path)
+            data_digest = artifacts.file_digest(source_path)
+            kmeans_digest = artifacts.file_digest(kmeans_path)
+            labels = _load_cached_clusters(cache_path, data_digest, kmeans_digest, len(df))
+            if labels is not None:
+                df['geo_cluster'] = labels.astype(int)
+                return df
+
+        # Tâm cụm lấy 1 lần từ KMeans (qua cache artifact của process, dùng chung với preprocessor)
+        index = geo_distance.kmeans_index(kmeans_path)
+
+        # Chỉ gán cụm cho các dòng có tọa độ hợp lệ
+        valid_mask = (df['lat'].notna() & df['lon'].notna() & (df['lat'] != 0)).to_numpy()
+
+        if valid_mask.any():
+            # Mảng 2 cột [[lat, lon]] -> tâm gần nhất (cùng nhãn với kmeans.predict)
+            coords = np.column_stack([df['lat'].to_numpy(dtype=float)[valid_mask],
+                                      df['lon'].to_numpy(dtype=float)[valid_mask]])
+            clusters = index.assign(coords)
+
+            # Dựng mảng nhãn bằng numpy rồi gán cả cột 1 lần (cột đọc từ file .arrow là
+            # vùng nhớ map read-only). Dòng lỗi giữ giá trị cũ nếu có, không thì -1.
+            if 'geo_cluster' in df.columns:
+                labels = np.array(df['geo_cluster'], dtype=float)
+            else:
+                labels = np.full(len(df), np.nan)
+            labels[valid_mask] = clusters
+            labels[np.isnan(labels)] = -1
+            df['geo_cluster'] = labels.astype(int)
+
+            if cache_path:
+                _save_cached_clusters(cache_path, df['geo_cluster'].to_numpy(), data_digest, kmeans_digest)
         
         return df
 
@@ -57,124 +110,156 @@ def apply_kmeans_logic(df, model_filename):
         print(f"⚠️ Lỗi khi chạy KMeans {model_filename}: {e}")
         return df
 
+# --- HÀM PHỤ TRỢ: ĐÁNH DẤU TOẠ ĐỘ HỢP LỆ ---
+def mark_valid_coordinates(df):
+    """
+    Tính mask khung toạ độ Việt Nam 1 lần lúc load (cột 'coord_valid'), giữ nguyên thứ tự dòng.
+    Bước lọc nhiễu Bắc/Nam (trung vị) KHÔNG nằm ở đây: dashboard chạy lại trên các dòng đã lọc chéo.
+    """
+    if df is None or df.empty or 'lat' not in df.columns or 'lon' not in df.columns:
+        return df
+    df['coord_valid'] = spatial_index.valid_coordinate_mask(df)
+    return df
+
 # --- 1. HÀM LOAD DỮ LIỆU (CHO DASHBOARD) ---
-@st.cache_data
+# Mapping: Key -> (Tên file CSV, Tên file KMeans tương ứng)
+# Lưu ý: Tên file KMeans phải khớp với trong folder models của bạn
+DATASET_CONFIG = {
+    'hcm':       {'csv': 'data_nha_hcm_final.csv',     'kmeans': 'kmeans_hcm.pkl'},
+    'hanoi':     {'csv': 'data_nha_hn_final.csv',      'kmeans': 'kmeans_hanoi.pkl'},
+    'apartment': {'csv': 'data_apartment_final.csv',   'kmeans': 'kmeans_apartment.pkl'},
+    'land':      {'csv': 'data_land_all_final.csv',    'kmeans': 'kmeans_land.pkl'},
+    'villa':     {'csv': 'data_villa_vip_final.csv',   'kmeans': 'kmeans_villa.pkl'}
+}
+
+# Cache riêng từng dataset, dùng chung cho mọi phiên & thread (kể cả thread prefetch).
+# DataFrame trả về dùng chung -> các hàm vẽ chỉ được ĐỌC, không sửa tại chỗ.
+_DATASETS = {}
+_DATASET_LOCKS = {key: threading.Lock() for key in DATASET_CONFIG}
+# Lỗi đọc gần nhất của từng dataset (app tự hiển thị, loader không phụ thuộc Streamlit)
+_LOAD_ERRORS = {}
+_PREFETCH_LOCK = threading.Lock()
+_PREFETCH_STARTED = False
+
+# Tắt prefetch nền bằng REAL_ESTATE_PREFETCH=0
+PREFETCH_ENV = 'REAL_ESTATE_PREFETCH'
+
+
+def _read_dataset(key):
+    """Đọc 1 dataset (bản cột .arrow, memory-map) và gắn thêm cột 'geo_cluster'"""
+    cfg = DATASET_CONFIG[key]
+    csv_path = os.path.join(DATA_DIR, cfg['csv'])
+
+    if not (os.path.exists(csv_path) or os.path.exists(dataset_store.arrow_path_for(csv_path))):
+        return pd.DataFrame()
+
+    try:
+        # 1. Đọc dữ liệu: memory-map file .arrow (tự build từ CSV ở lần đầu)
+        df = dataset_store.read_dataset(csv_path)
+
+        # 2. Chuẩn hóa tên cột (Để tránh lỗi District/district)
+        df.columns = [c.lower() for c in df.columns]
+
+        # 3. Gắn Geo Cluster (Chạy KMeans - nhãn được lưu cạnh file dữ liệu để dùng lại)
+        # Đây chính là bước bạn đang thiếu ở file loader cũ!
+        source_path = csv_path if os.path.exists(csv_path) else dataset_store.arrow_path_for(csv_path)
+        df = apply_kmeans_logic(df, cfg['kmeans'], source_path=source_path)
+
+        # 4. Mask toạ độ hợp lệ (tính 1 lần, giữ nguyên thứ tự dòng)
+        return mark_valid_coordinates(df)
+    except Exception as e:
+        _LOAD_ERRORS[key] = f"Lỗi đọc {cfg['csv']}: {e}"
+        print(f"⚠️ {_LOAD_ERRORS[key]}")
+        return pd.DataFrame()
+
+
+def dataset_error(key):
+    """Thông báo lỗi của lần đọc dataset `key` gần nhất (None nếu không lỗi)"""
+    return _LOAD_ERRORS.get(key)
+
+
+def load_dataset(key):
+    """
+    Lấy 1 dataset theo key ('hcm', 'hanoi', 'apartment', 'land', 'villa').
+    Chỉ đọc khi có người cần lần đầu, sau đó trả về ngay từ cache.
+    """
+    if key not in DATASET_CONFIG:
+        return pd.DataFrame()
+
+    df = _DATASETS.get(key)
+    if df is not None:
+        return df
+
+    # Mỗi key 1 khóa: thread prefetch và phiên người dùng không đọc trùng 1 file
+    with _DATASET_LOCKS[key]:
+        df = _DATASETS.get(key)
+        if df is None:
+            _LOAD_ERRORS.pop(key, None)
+            df = _read_dataset(key)
+            if not df.empty:
+                _DATASETS[key] = df
+        return df
+
+
+def prefetch_datasets(exclude=None):
+    """
+    Đọc trước các dataset còn lại ở thread nền (1 lần / process),
+    để lần chuyển danh mục sau không phải chờ.
+    """
+    global _PREFETCH_STARTED
+    if os.environ.get(PREFETCH_ENV, '1') == '0':
+        return
+    with _PREFETCH_LOCK:
+        if _PREFETCH_STARTED:
+            return
+        _PREFETCH_STARTED = True
+
+    keys = [k for k in DATASET_CONFIG if k != exclude]
+    threading.Thread(target=lambda: [load_dataset(k) for k in keys], daemon=True).start()
+
+
+def clear_dataset_cache():
+    """Xóa cache dataset (VD: sau khi cập nhật file data/)"""
+    _DATASETS.clear()
+
+
+def dataset_key_for(city_mode, property_type):
+    """Key dataset cùng danh mục với lựa chọn ở Sidebar (trùng key chuẩn của model)"""
+    return model_registry.canonical_model_id(city_mode, property_type)
+
+
 def load_raw_data():
     """
-    Load CSV và tự động gắn thêm cột 'geo_cluster'
+    Load cả 5 dataset (giữ cho code cũ). Dashboard nên dùng load_dataset(key)
+    để chỉ đọc đúng danh mục đang xem.
     """
-    data = {}
-    
-    # Mapping: Key -> (Tên file CSV, Tên file KMeans tương ứng)
-    # Lưu ý: Tên file KMeans phải khớp với trong folder models của bạn
-    config = {
-        'hcm':       {'csv': 'data_nha_hcm_final.csv',     'kmeans': 'kmeans_hcm.pkl'},
-        'hanoi':     {'csv': 'data_nha_hn_final.csv',      'kmeans': 'kmeans_hanoi.pkl'},
-        'apartment': {'csv': 'data_apartment_final.csv',   'kmeans': 'kmeans_apartment.pkl'},
-        'land':      {'csv': 'data_land_all_final.csv',    'kmeans': 'kmeans_land.pkl'},
-        'villa':     {'csv': 'data_villa_vip_final.csv',   'kmeans': 'kmeans_villa.pkl'}
-    }
-    
-    for key, cfg in config.items():
-        csv_path = os.path.join(DATA_DIR, cfg['csv'])
-        
-        if os.path.exists(csv_path):
-            try:
-                # 1. Đọc CSV
-                df = pd.read_csv(csv_path)
-                
-                # 2. Chuẩn hóa tên cột (Để tránh lỗi District/district)
-                df.columns = [c.lower() for c in df.columns]
-
-                # 3. Gắn Geo Cluster (Chạy KMeans)
-                # Đây chính là bước bạn đang thiếu ở file loader cũ!
-                df = apply_kmeans_logic(df, cfg['kmeans'])
-                
-                data[key] = df
-            except Exception as e:
-                st.error(f"Lỗi đọc {cfg['csv']}: {e}")
-                data[key] = pd.DataFrame()
-        else:
-            data[key] = pd.DataFrame() 
-            
-    return data
+    return {key: load_dataset(key) for key in DATASET_CONFIG}
 
 # --- 2. HÀM LOAD MODEL (CHO DỰ BÁO) ---
-@st.cache_resource
 def load_models(city_mode, property_type):
     """
-    Load Model XGBoost VÀ KMeans cho phần dự báo giá
+    Load Model XGBoost VÀ KMeans cho phần dự báo giá.
+    Model được giữ trong model_registry theo key chuẩn (lazy load + LRU theo ngân sách RAM),
+    nên các alias như "Chung cư"/"Căn hộ Chung cư" chỉ tốn 1 bản trong RAM.
     """
-    resources = {}
-    
-    # Mapping Logic (Giữ nguyên như cũ)
-    if property_type == "Nhà phố":
-        if city_mode == "Hồ Chí Minh":
-            model_file = "best_xgboost_HouseHCM.pkl"
-            kmeans_file = "kmeans_hcm.pkl"
-        else:
-            model_file = "best_xgboost_HanoiHouse.pkl"
-            kmeans_file = "kmeans_hanoi.pkl"
-    elif property_type == "Căn hộ Chung cư" or property_type == "Chung cư":
-        model_file = "best_xgboost_Apartment.pkl"
-        kmeans_file = "kmeans_apartment.pkl"
-    elif property_type == "Đất nền":
-        model_file = "best_xgboost_landall.pkl"
-        kmeans_file = "kmeans_land.pkl"
-    else: 
-        model_file = "best_xgboost_villavip.pkl"
-        kmeans_file = "kmeans_villa.pkl"
-
-    # Load XGBoost
-    model_path = os.path.join(MODEL_DIR, model_file)
-    if os.path.exists(model_path):
-        try:
-            resources['model'] = joblib.load(model_path)
-        except:
-            with open(model_path, 'rb') as f:
-                resources['model'] = pickle.load(f)
-    else:
-        return None
+    model_id = model_registry.canonical_model_id(city_mode, property_type)
+    return model_registry.registry.get(model_id)
+
+
+def warm_up_models():
+    """Warm-up model lúc khởi động server (bật bằng biến môi trường REAL_ESTATE_WARMUP)"""
+    model_registry.registry.warm_up_from_env()
 
-    # Load KMeans
-    kmeans_path = os.path.join(MODEL_DIR, kmeans_file)
-    if os.path.exists(kmeans_path):
-        try:
-            resources['kmeans'] = joblib.load(kmeans_path)
-        except:
-            with open(kmeans_path, 'rb') as f:
-                resources['kmeans'] = pickle.load(f)
-    else:
-        resources['kmeans'] = None
-
-    return resources
 # --- THÊM VÀO CUỐI FILE src/loader.py ---
 
-@st.cache_data
 def get_project_list():
     """
-    Hàm lấy danh sách tên dự án duy nhất từ file data_apartment_final.csv
-    Để hiển thị lên Sidebar cho người dùng chọn.
+    Danh sách tên dự án (A-Z) để hiển thị lên Sidebar.
+    Lấy từ index dự án (src/project_index.py) - dựng 1 lần / process từ dataset chung cư.
     """
     try:
-        file_path = os.path.join(DATA_DIR, 'data_apartment_final.csv')
-        if os.path.exists(file_path):
-            df = pd.read_csv(file_path)
-            
-            # Ưu tiên lấy cột tên dự án dạng chữ (Raw)
-            if 'project_name_raw' in df.columns:
-                projects = df['project_name_raw'].unique().tolist()
-            elif 'project_name' in df.columns:
-                projects = df['project_name'].unique().tolist()
-            else:
-                return []
-            
-            # Sắp xếp A-Z và loại bỏ giá trị nan
-            projects = [str(p) for p in projects if str(p) != 'nan']
-            projects.sort()
-            return projects
-        else:
-            return []
+        from src import project_index
+        return list(project_index.get_project_index().names)
     except Exception as e:
         print(f"Lỗi lấy danh sách dự án: {e}")
-        return []
\ No newline at end of file
+        return []
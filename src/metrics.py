@@ -0,0 +1,246 @@
+"""
+Đo thời gian từng bước của luồng dự báo (histogram trong process, chi phí ~1µs / lần đo).
+
+Mỗi cặp (model, bước) có 1 histogram bucket cố định (cấp số nhân từ 50µs tới ~1 phút),
+ước lượng p50/p95/p99 bằng nội suy trong bucket. Các bước của execute_prediction_flow:
+    resolve_key -> cache_lookup -> load_model -> preprocess -> align -> predict   (+ total cho cả luồng)
+
+Module khác gắn thêm số liệu dạng gauge qua register_collector (vd. hit-rate của prediction_cache).
+
+Xuất số liệu cho scraper cục bộ (bật bằng biến môi trường, 1 lần / process):
+    REAL_ESTATE_METRICS_PORT=9108        -> http://127.0.0.1:9108/metrics (Prometheus text)
+                                            http://127.0.0.1:9108/metrics.json (JSON)
+    REAL_ESTATE_METRICS_FILE=/tmp/re.prom -> ghi file định kỳ (.json -> JSON, còn lại Prometheus text)
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STAGES = ('resolve_key', 'cache_lookup', 'load_model', 'preprocess', 'align', 'predict', 'total',
+          # src/service.py: thời gian 1 lô (preprocess + predict) và thời gian 1 request HTTP
+          'batch_predict', 'request')
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Cận trên các bucket (giây): 50µs x 1.5^k, 35 bucket -> tới ~70s, còn lại rơi vào +Inf
+BUCKET_BOUNDS = tuple(5e-5 * 1.5 ** k for k in range(35))
+
+METRIC_NAME = 'real_estate_prediction_stage_seconds'
+
+PORT_ENV = 'REAL_ESTATE_METRICS_PORT'
+FILE_ENV = 'REAL_ESTATE_METRICS_FILE'
+FILE_INTERVAL_ENV = 'REAL_ESTATE_METRICS_INTERVAL'
+DEFAULT_FILE_INTERVAL = 15.0
+
+# ==============================================================================
+# 1. HISTOGRAM
+# ==============================================================================
+
+class LatencyHistogram:
+    """Histogram bucket cố định (không giữ từng mẫu -> RAM không tăng theo số lần đo)"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)   # bucket cuối = +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """Ước lượng phân vị q: nội suy tuyến tính trong bucket chứa nó, không vượt max đã thấy"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            if n and cumulative + n >= rank:
+                lo = BUCKET_BOUNDS[i - 1] if i > 0 else 0.0
+                hi = BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else self.max
+                return min(lo + (hi - lo) * (rank - cumulative) / n, self.max)
+            cumulative += n
+        return self.max
+
+# ==============================================================================
+# 2. SỔ GHI THEO (MODEL, BƯỚC)
+# ==============================================================================
+
+class StageMetrics:
+    def __init__(self):
+        self._histograms = {}   # (model, stage) -> LatencyHistogram
+        self._collectors = {}   # tên -> hàm trả về dict {chỉ số: giá trị số}
+        self._lock = threading.Lock()
+
+    def observe(self, model, stage, seconds):
+        with self._lock:
+            histogram = self._histograms.get((model, stage))
+            if histogram is None:
+                histogram = self._histograms[(model, stage)] = LatencyHistogram()
+            histogram.observe(seconds)
+
+    def register_collector(self, name, collect):
+        """Gắn thêm nhóm số liệu `name`: collect() -> dict {chỉ số: số}, gọi lúc xuất"""
+        self._collectors[name] = collect
+
+    def collect(self):
+        return {name: collect() for name, collect in list(self._collectors.items())}
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def _sorted_items(self):
+        order = {stage: i for i, stage in enumerate(STAGES)}
+        return sorted(self._histograms.items(), key=lambda kv: (kv[0][0], order.get(kv[0][1], len(order)), kv[0][1]))
+
+    def snapshot(self):
+        """Dict thuần (dùng cho JSON): mỗi (model, bước) -> count, sum, p50/p95/p99, max (giây)"""
+        with self._lock:
+            stages = []
+            for (model, stage), h in self._sorted_items():
+                row = {'model': model, 'stage': stage, 'count': h.count, 'sum': h.sum, 'max': h.max}
+                for q in QUANTILES:
+                    row[f'p{int(q * 100)}'] = h.quantile(q)
+                stages.append(row)
+        return {'generated_at': time.time(), 'unit': 'seconds', 'stages': stages, 'collectors': self.collect()}
+
+    def render_json(self):
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def render_prometheus(self):
+        """Định dạng Prometheus text 0.0.4: histogram + gauge phân vị ước lượng sẵn"""
+        lines = [
+            f'# HELP {METRIC_NAME} Thời gian từng bước của luồng dự báo giá.',
+            f'# TYPE {METRIC_NAME} histogram',
+        ]
+        quantile_lines = []
+        with self._lock:
+            for (model, stage), h in self._sorted_items():
+                labels = f'model="{model}",stage="{stage}"'
+                cumulative = 0
+                for bound, n in zip(BUCKET_BOUNDS, h.counts):
+                    cumulative += n
+                    lines.append(f'{METRIC_NAME}_bucket{{{labels},le="{bound:.6g}"}} {cumulative}')
+                lines.append(f'{METRIC_NAME}_bucket{{{labels},le="+Inf"}} {h.count}')
+                lines.append(f'{METRIC_NAME}_sum{{{labels}}} {h.sum:.9g}')
+                lines.append(f'{METRIC_NAME}_count{{{labels}}} {h.count}')
+                for q in QUANTILES:
+                    quantile_lines.append(f'{METRIC_NAME}_quantile{{{labels},quantile="{q}"}} {h.quantile(q):.9g}')
+
+        lines += [
+            f'# HELP {METRIC_NAME}_quantile Phân vị ước lượng từ histogram trong process.',
+            f'# TYPE {METRIC_NAME}_quantile gauge',
+        ] + quantile_lines
+
+        for name, values in self.collect().items():
+            for field, value in values.items():
+                metric = f'real_estate_{name}_{field}'
+                lines += [f'# TYPE {metric} gauge', f'{metric} {float(value):.9g}']
+        return '\n'.join(lines) + '\n'
+
+    def write_file(self, path):
+        """Ghi snapshot ra file (.json -> JSON, còn lại Prometheus text); ghi file tạm rồi đổi tên"""
+        body = self.render_json() if path.lower().endswith('.json') else self.render_prometheus()
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+
+
+STAGE_METRICS = StageMetrics()
+
+
+class StageTimer:
+    """
+    Bấm giờ 1 lượt dự báo: lap(stage) ghi thời gian kể từ lần lap trước,
+    finish() ghi tổng thời gian cả luồng (gọi trong finally để tính cả lượt lỗi).
+    """
+
+    def __init__(self, model, metrics=STAGE_METRICS):
+        self.model = model
+        self.metrics = metrics
+        self.start = self.last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.metrics.observe(self.model, stage, now - self.last)
+        self.last = now
+
+    def finish(self):
+        self.metrics.observe(self.model, 'total', time.perf_counter() - self.start)
+
+# ==============================================================================
+# 3. XUẤT SỐ LIỆU: HTTP ENDPOINT + FILE ĐỊNH KỲ
+# ==============================================================================
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    metrics = STAGE_METRICS
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/metrics':
+            body, content_type = self.metrics.render_prometheus(), 'text/plain; version=0.0.4; charset=utf-8'
+        elif path == '/metrics.json':
+            body, content_type = self.metrics.render_json(), 'application/json; charset=utf-8'
+        else:
+            self.send_error(404)
+            return
+        payload = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass   # scraper gọi liên tục, không in log mỗi request
+
+
+def start_http_server(port, host='127.0.0.1'):
+    """Phục vụ /metrics và /metrics.json ở thread nền. Trả về server (gọi shutdown() để dừng)."""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _write_periodically(path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            STAGE_METRICS.write_file(path)
+        except OSError as e:
+            print(f"⚠️ Không ghi được metrics {path}: {e}")
+
+
+_EXPORT_LOCK = threading.Lock()
+_EXPORT_STARTED = False
+
+
+def start_exporters_from_env():
+    """Bật endpoint / file metrics theo biến môi trường (1 lần / process, không chặn luồng chính)"""
+    global _EXPORT_STARTED
+    with _EXPORT_LOCK:
+        if _EXPORT_STARTED:
+            return
+        _EXPORT_STARTED = True
+
+    port = os.environ.get(PORT_ENV, '').strip()
+    if port:
+        try:
+            start_http_server(int(port))
+            print(f"📈 Metrics: http://127.0.0.1:{port}/metrics")
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Không mở được cổng metrics {port}: {e}")
+
+    path = os.environ.get(FILE_ENV, '').strip()
+    if path:
+        interval = float(os.environ.get(FILE_INTERVAL_ENV, 0) or DEFAULT_FILE_INTERVAL)
+        threading.Thread(target=_write_periodically, args=(path, interval), daemon=True).start()
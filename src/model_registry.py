@@ -0,0 +1,186 @@
+import os
+import threading
+from collections import OrderedDict
+
+from src import artifacts
+from src import feature_plan
+from src import model_store
+
+# ==============================================================================
+# 1. CẤU HÌNH MODEL (KEY CHUẨN -> FILE)
+# ==============================================================================
+# Key chuẩn (canonical id) trùng với key dữ liệu của loader ('hcm', 'hanoi', ...),
+# nên "Chung cư" / "Căn hộ Chung cư" hay city_mode "All" / "Hồ Chí Minh"
+# đều quy về đúng 1 bản model trong RAM.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_DIR = os.path.join(BASE_DIR, 'models')
+
+MODEL_SPECS = {
+    'hcm':       {'model': 'best_xgboost_HouseHCM.pkl',   'kmeans': 'kmeans_hcm.pkl',       'process_key': 'Nhà phố Hồ Chí Minh'},
+    'hanoi':     {'model': 'best_xgboost_HanoiHouse.pkl', 'kmeans': 'kmeans_hanoi.pkl',     'process_key': 'Nhà phố Hà Nội'},
+    'apartment': {'model': 'best_xgboost_Apartment.pkl',  'kmeans': 'kmeans_apartment.pkl', 'process_key': 'Căn hộ Chung cư',
+                  # Encoder dự án mà preprocessor.process_apartment dùng (chỉ để tính fingerprint)
+                  'extra': ['encoders/apartment_project_encoder.pkl']},
+    'land':      {'model': 'best_xgboost_landall.pkl',    'kmeans': 'kmeans_land.pkl',      'process_key': 'Đất nền'},
+    'villa':     {'model': 'best_xgboost_villavip.pkl',   'kmeans': 'kmeans_villa.pkl',     'process_key': 'Biệt thự / Villa'},
+}
+
+# Giới hạn RAM cho các model XGBoost (MB). 0 = không giới hạn.
+MEMORY_BUDGET_ENV = 'REAL_ESTATE_MODEL_MEMORY_MB'
+# Danh sách model warm-up lúc khởi động server: "all" hoặc "hanoi,villa"
+WARMUP_ENV = 'REAL_ESTATE_WARMUP'
+
+
+def canonical_model_id(city_mode, property_type):
+    """Quy (city_mode, property_type) từ Sidebar về key chuẩn của model"""
+    if property_type == "Nhà phố":
+        return 'hcm' if city_mode == "Hồ Chí Minh" else 'hanoi'
+    elif property_type in ("Căn hộ Chung cư", "Chung cư"):
+        return 'apartment'
+    elif property_type == "Đất nền":
+        return 'land'
+    return 'villa'
+
+
+def model_fingerprint(model_id):
+    """
+    Dấu vân tay các artifact quyết định kết quả dự báo của model (model, KMeans, encoder).
+    Đổi file trên đĩa -> đổi fingerprint. None nếu thiếu file model
+    (cả pickle lẫn bản native của src/model_store.py).
+    """
+    spec = MODEL_SPECS[model_id]
+    model_path = os.path.join(MODEL_DIR, spec['model'])
+    if not os.path.exists(model_path):
+        # Chỉ deploy bản native: hash file .ubj thay cho pickle
+        model_path = model_store.native_paths(model_path)[0]
+        if not os.path.exists(model_path):
+            return None
+    parts = [artifacts.file_digest(model_path)]
+    for name in [spec['kmeans']] + spec.get('extra', []):
+        path = os.path.join(MODEL_DIR, name)
+        parts.append(artifacts.file_digest(path) if os.path.exists(path) else '-')
+    return ':'.join(parts)
+
+
+def estimate_model_size(model, model_path):
+    """Ước lượng RAM của model (byte): kích thước booster đã serialize, fallback = file trên đĩa"""
+    try:
+        return len(model.get_booster().save_raw())
+    except Exception:
+        return os.path.getsize(model_path)
+
+# ==============================================================================
+# 2. REGISTRY: LAZY LOAD + LRU THEO NGÂN SÁCH RAM
+# ==============================================================================
+
+class ModelRegistry:
+    """
+    Giữ các model đã load theo key chuẩn.
+      - Lazy: chỉ load khi có request đầu tiên (hoặc khi warm-up).
+      - LRU: vượt ngân sách RAM thì bỏ model lâu không dùng nhất.
+    """
+
+    def __init__(self, memory_budget_mb=0):
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self._entries = OrderedDict()   # model_id -> resources
+        self._sizes = {}                # model_id -> byte
+        self._lock = threading.Lock()
+        self._load_locks = {model_id: threading.Lock() for model_id in MODEL_SPECS}
+        self._warmup_started = False
+
+    def get(self, model_id):
+        """Trả về {'model', 'kmeans', 'plan', 'model_id'} hoặc None nếu không có file model"""
+        with self._lock:
+            if model_id in self._entries:
+                self._entries.move_to_end(model_id)
+                return self._entries[model_id]
+
+        # Mỗi model có khóa riêng: 2 request cùng lúc không load trùng 1 file
+        with self._load_locks[model_id]:
+            with self._lock:
+                if model_id in self._entries:
+                    self._entries.move_to_end(model_id)
+                    return self._entries[model_id]
+
+            resources = self._load(model_id)
+            if resources is None:
+                return None
+
+            with self._lock:
+                self._entries[model_id] = resources
+                self._evict_over_budget(keep=model_id)
+            return resources
+
+    def _load(self, model_id):
+        spec = MODEL_SPECS[model_id]
+        model_path = os.path.join(MODEL_DIR, spec['model'])
+
+        # XGBoost đọc thẳng (không qua cache artifact) để registry là nơi DUY NHẤT giữ model,
+        # evict ở đây là giải phóng RAM thật. KMeans nhỏ nên dùng chung cache artifact.
+        # Ưu tiên Booster native đã export (python -m src.model_store), không có thì dùng pickle.
+        model = model_store.load_native(model_path)
+        if model is not None:
+            source = 'native'
+            size_path = model_store.native_paths(model_path)[0]
+        elif os.path.exists(model_path):
+            model = artifacts.read_artifact(model_path)
+            source = 'pickle'
+            size_path = model_path
+        else:
+            return None
+        self._sizes[model_id] = estimate_model_size(model, size_path)
+        print(f"📦 Load model {model_id} [{source}] ({self._sizes[model_id] / 1024**2:,.1f} MB)")
+
+        return {
+            'model_id': model_id,
+            'model': model,
+            'kmeans': artifacts.load_artifact(os.path.join(MODEL_DIR, spec['kmeans'])),
+            # Biên dịch layout cột 1 lần cho model này (báo lệch cột ngay lúc load)
+            'plan': feature_plan.compile_plan(model, spec['process_key']),
+        }
+
+    def _evict_over_budget(self, keep):
+        """Bỏ model ít dùng nhất cho tới khi tổng RAM <= ngân sách (không bỏ model vừa load)"""
+        if self.memory_budget <= 0:
+            return
+        while self.total_size() > self.memory_budget and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            if oldest == keep:
+                break
+            del self._entries[oldest]
+            print(f"♻️ Evict model {oldest} (vượt ngân sách {self.memory_budget / 1024**2:,.0f} MB)")
+
+    def total_size(self):
+        return sum(self._sizes[m] for m in self._entries)
+
+    def warm_up(self, model_ids=None):
+        """Load trước các model (mặc định: tất cả model có file)"""
+        for model_id in model_ids or list(MODEL_SPECS):
+            if model_id in MODEL_SPECS:
+                self.get(model_id)
+
+    def warm_up_from_env(self):
+        """
+        Warm-up 1 lần / process theo biến môi trường REAL_ESTATE_WARMUP, chạy ở thread nền
+        để không chặn lần render đầu tiên.
+        """
+        value = os.environ.get(WARMUP_ENV, '').strip()
+        with self._lock:
+            if not value or self._warmup_started:
+                return
+            self._warmup_started = True
+        model_ids = None if value.lower() == 'all' else [v.strip() for v in value.split(',')]
+        threading.Thread(target=self.warm_up, args=(model_ids,), daemon=True).start()
+
+    def stats(self):
+        """Thông tin RAM từng model đang nằm trong registry"""
+        with self._lock:
+            return {
+                'models': {m: self._sizes[m] for m in self._entries},
+                'total_bytes': self.total_size(),
+                'budget_bytes': self.memory_budget,
+            }
+
+
+registry = ModelRegistry(memory_budget_mb=float(os.environ.get(MEMORY_BUDGET_ENV, 0) or 0))
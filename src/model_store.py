@@ -0,0 +1,140 @@
+"""
+Lưu model XGBoost dạng NATIVE (UBJSON của chính XGBoost) + file schema cột đi kèm.
+
+Pickle (best_xgboost_*.pkl) gắn chặt với phiên bản xgboost/sklearn lúc train và phải đi qua
+wrapper sklearn (kiểm tra input mỗi lần predict). Bước export chuyển 1 lần sang:
+    models/best_xgboost_xxx.ubj          - Booster, đọc được ở mọi phiên bản xgboost >= 1.6
+    models/best_xgboost_xxx.schema.json  - thứ tự/kiểu cột, iteration_range, hash pickle nguồn
+Lúc phục vụ, model_registry ưu tiên bản native còn khớp với pickle (so hash) và dự báo bằng
+Booster.inplace_predict trên mảng float32 liền bộ nhớ (không DataFrame, không DMatrix).
+
+Chạy export:
+    python -m src.model_store            # mọi model có file .pkl
+    python -m src.model_store hanoi villa
+"""
+import json
+import os
+
+import numpy as np
+
+from src import artifacts
+
+NATIVE_EXT = '.ubj'
+SCHEMA_EXT = '.schema.json'
+SCHEMA_VERSION = 1
+
+
+def native_paths(model_path):
+    """models/xxx.pkl -> (models/xxx.ubj, models/xxx.schema.json)"""
+    stem = os.path.splitext(model_path)[0]
+    return stem + NATIVE_EXT, stem + SCHEMA_EXT
+
+# ==============================================================================
+# 1. MODEL NATIVE (THAY CHO WRAPPER SKLEARN LÚC PHỤC VỤ)
+# ==============================================================================
+
+class NativeModel:
+    """
+    Booster + schema, cùng giao diện mà predictor/feature_plan cần từ XGBRegressor:
+    predict(), feature_names_in_, get_booster().
+    """
+
+    def __init__(self, booster, schema):
+        self.booster = booster
+        self.schema = schema
+        self.feature_names_in_ = np.array(schema['features'], dtype=object)
+        self.n_features_in_ = len(schema['features'])
+        self.iteration_range = tuple(schema.get('iteration_range', (0, 0)))
+
+    def get_booster(self):
+        return self.booster
+
+    def predict(self, features):
+        """features: mảng (N, n_features); chỉ copy nếu chưa phải float32 liền bộ nhớ"""
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        return self.booster.inplace_predict(features, iteration_range=self.iteration_range,
+                                            validate_features=False)
+
+
+def read_schema(schema_path):
+    with open(schema_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_native(model_path):
+    """
+    NativeModel cho models/xxx.pkl nếu đã export và còn khớp pickle nguồn, ngược lại None.
+    Không có pickle (chỉ deploy bản native) thì dùng luôn bản native.
+    """
+    native_path, schema_path = native_paths(model_path)
+    if not (os.path.exists(native_path) and os.path.exists(schema_path)):
+        return None
+    try:
+        schema = read_schema(schema_path)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Schema hỏng {schema_path}: {e}")
+        return None
+    if os.path.exists(model_path) and schema.get('source_digest') != artifacts.file_digest(model_path):
+        print(f"⚠️ {os.path.basename(native_path)} cũ hơn {os.path.basename(model_path)}, "
+              f"dùng pickle (chạy lại: python -m src.model_store)")
+        return None
+
+    import xgboost as xgb
+    booster = xgb.Booster()
+    booster.load_model(native_path)
+    return NativeModel(booster, schema)
+
+# ==============================================================================
+# 2. EXPORT PICKLE -> NATIVE + SCHEMA
+# ==============================================================================
+
+def build_schema(model, model_path):
+    booster = model.get_booster()
+    names = getattr(model, 'feature_names_in_', None)
+    features = [str(c) for c in (names if names is not None else booster.feature_names or [])]
+    best_iteration = getattr(model, 'best_iteration', None)
+
+    import xgboost as xgb
+    return {
+        'schema_version': SCHEMA_VERSION,
+        'source': os.path.basename(model_path),
+        'source_digest': artifacts.file_digest(model_path),
+        'xgboost_version': xgb.__version__,
+        'features': features,
+        'feature_types': list(booster.feature_types or []),
+        'objective': getattr(model, 'objective', None),
+        # Giống XGBRegressor.predict: có early stopping thì chỉ dùng tới best_iteration
+        'iteration_range': [0, best_iteration + 1] if best_iteration is not None else [0, 0],
+        'num_boosted_rounds': booster.num_boosted_rounds(),
+    }
+
+
+def export_model(model_path):
+    """Đọc pickle, ghi .ubj + .schema.json cạnh nó (ghi file tạm rồi đổi tên). Trả về schema."""
+    model = artifacts.read_artifact(model_path)
+    schema = build_schema(model, model_path)
+    native_path, schema_path = native_paths(model_path)
+
+    tmp_native = f"{native_path}.{os.getpid()}.tmp{NATIVE_EXT}"   # xgboost chọn định dạng theo đuôi file
+    model.get_booster().save_model(tmp_native)
+    tmp_schema = f"{schema_path}.{os.getpid()}.tmp"
+    with open(tmp_schema, 'w', encoding='utf-8') as f:
+        json.dump(schema, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_native, native_path)
+    os.replace(tmp_schema, schema_path)
+    return schema
+
+
+if __name__ == "__main__":
+    import sys
+    from src.model_registry import MODEL_DIR, MODEL_SPECS
+
+    for model_id in sys.argv[1:] or list(MODEL_SPECS):
+        model_path = os.path.join(MODEL_DIR, MODEL_SPECS[model_id]['model'])
+        if not os.path.exists(model_path):
+            print(f"⏭️ {model_id}: không có {os.path.basename(model_path)}")
+            continue
+        schema = export_model(model_path)
+        native_path, _ = native_paths(model_path)
+        print(f"✅ {model_id}: {os.path.basename(native_path)} ({os.path.getsize(native_path) / 1024**2:,.1f} MB, "
+              f"{len(schema['features'])} cột, {schema['num_boosted_rounds']} cây)")
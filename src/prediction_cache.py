@@ -0,0 +1,148 @@
+"""
+Cache kết quả dự báo (LRU + TTL) cho execute_prediction_flow.
+
+Key = (model, fingerprint artifact, input đã chuẩn hóa):
+  - Tọa độ làm tròn COORD_DECIMALS chữ số (~1m), số thực khác FLOAT_DECIMALS chữ số
+  - Chuỗi chuẩn hóa Unicode NFC + bỏ khoảng trắng thừa (KHÔNG đổi hoa/thường vì encoder phân biệt)
+  - Fingerprint = hash file model/KMeans/encoder -> thay model là key cũ tự hết hiệu lực
+Luồng dự báo chạy trên chính input đã chuẩn hóa, nên kết quả lấy từ cache luôn khớp
+với kết quả tính lại.
+
+Cấu hình qua biến môi trường:
+    REAL_ESTATE_PREDICTION_CACHE_SIZE=4096   (0 = tắt cache)
+    REAL_ESTATE_PREDICTION_CACHE_TTL=900     (giây)
+"""
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+from src import metrics
+from src import model_registry
+
+COORD_KEYS = ('lat', 'lon')
+COORD_DECIMALS = 5
+FLOAT_DECIMALS = 3
+
+SIZE_ENV = 'REAL_ESTATE_PREDICTION_CACHE_SIZE'
+TTL_ENV = 'REAL_ESTATE_PREDICTION_CACHE_TTL'
+DEFAULT_SIZE = 4096
+DEFAULT_TTL = 900.0
+
+# ==============================================================================
+# 1. CHUẨN HÓA INPUT
+# ==============================================================================
+
+def canonical_value(name, value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        if value != value:   # NaN
+            return None
+        rounded = round(value, COORD_DECIMALS if name in COORD_KEYS else FLOAT_DECIMALS)
+        return rounded + 0.0   # -0.0 -> 0.0
+    if isinstance(value, str):
+        return ' '.join(unicodedata.normalize('NFC', value).split())
+    return value
+
+
+def canonicalize_inputs(user_inputs):
+    """Dict input đã chuẩn hóa (cùng key, cùng kiểu) - dùng cả để dự báo lẫn làm key cache.
+    DataFrame (batch) giữ nguyên, không cache."""
+    if not isinstance(user_inputs, dict):
+        return user_inputs
+    return {name: canonical_value(name, value) for name, value in user_inputs.items()}
+
+
+def make_key(model_id, canonical_inputs):
+    """Key cache; None nếu không cache được (thiếu model / input không phải dict / không hash được)"""
+    if not isinstance(canonical_inputs, dict):
+        return None
+    fingerprint = model_registry.model_fingerprint(model_id)
+    if fingerprint is None:
+        return None
+    key = (model_id, fingerprint, tuple(sorted(canonical_inputs.items())))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+# ==============================================================================
+# 2. CACHE LRU + TTL
+# ==============================================================================
+
+class PredictionCache:
+    def __init__(self, max_entries=DEFAULT_SIZE, ttl_seconds=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._entries = OrderedDict()   # key -> (hết hạn lúc, giá)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, key):
+        """(True, giá) nếu có và còn hạn, ngược lại (False, None)"""
+        if key is None or not self.enabled:
+            return False, None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def put(self, key, value):
+        if key is None or not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+prediction_cache = PredictionCache(
+    max_entries=int(os.environ.get(SIZE_ENV, DEFAULT_SIZE)),
+    ttl_seconds=float(os.environ.get(TTL_ENV, DEFAULT_TTL)),
+)
+# Hit-rate / kích thước cache xuất cùng /metrics
+metrics.STAGE_METRICS.register_collector('prediction_cache', prediction_cache.stats)
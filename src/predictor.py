@@ -0,0 +1,73 @@
+import numpy as np
+
+from src import model_registry
+from src import preprocessor
+
+# ==============================================================================
+# CÁC BƯỚC DỰ BÁO DÙNG CHUNG (APP STREAMLIT + BATCH CLI + HTTP SERVICE)
+# ==============================================================================
+# Không phụ thuộc Streamlit: lỗi được raise ra ngoài, nơi gọi tự quyết định cách hiển thị.
+
+
+class ModelNotFoundError(LookupError):
+    """Không có file model cho loại hình được yêu cầu"""
+
+def resolve_process_key(city_mode, property_type):
+    """
+    BƯỚC 1: Tạo key cho preprocessor.
+    Key này phải khớp chính xác với các if/elif trong preprocessor.transform_input
+    """
+    if property_type == "Nhà phố":
+        return f"Nhà phố {city_mode}"  # VD: "Nhà phố Hồ Chí Minh"
+    elif property_type in ("Căn hộ Chung cư", "Chung cư"): # Sidebar trả về "Căn hộ Chung cư", loader chấp nhận cả "Chung cư"
+        return "Căn hộ Chung cư"
+    elif property_type == "Đất nền":
+        return "Đất nền"
+    else:
+        return "Biệt thự / Villa"
+
+
+def build_features(plan, processed_df):
+    """
+    BƯỚC 4: Khớp cột theo FeaturePlan đã biên dịch sẵn lúc load model
+    (xem src/feature_plan.py) -> mảng numpy float32 đúng thứ tự cột của model.
+    """
+    return plan.to_array(processed_df)
+
+
+def predict_prices(model, features):
+    """
+    BƯỚC 5: Dự báo & chuyển từ Log -> Giá thực (Tỷ), chặn dưới 0.
+    Trả về mảng numpy, mỗi phần tử ứng với 1 dòng của features.
+    """
+    # Dự báo (Kết quả là Logarit)
+    pred_log = model.predict(features)
+
+    # Chuyển về giá thực (Anti-Log)
+    pred_real = np.expm1(pred_log)
+    return np.maximum(pred_real, 0)
+
+
+def load_resources(model_id):
+    """BƯỚC 2: Model + FeaturePlan từ registry. Raise ModelNotFoundError nếu thiếu file model."""
+    resources = model_registry.registry.get(model_id)
+    if not resources or 'model' not in resources:
+        raise ModelNotFoundError(f"Không tìm thấy model '{model_id}' trong folder models/")
+    return resources
+
+
+def predict_frame(resources, process_key, inputs):
+    """
+    BƯỚC 3 -> 5 cho N dòng cùng loại hình (dict 1 BĐS hoặc DataFrame N dòng):
+    preprocess -> khớp cột -> 1 lần model.predict. Trả về mảng giá thực (Tỷ).
+    """
+    processed_df = preprocessor.transform_input(inputs, process_key)
+    features = build_features(resources['plan'], processed_df)
+    return predict_prices(resources['model'], features)
+
+
+def predict(inputs, city_mode, property_type):
+    """Luồng đầy đủ (BƯỚC 1 -> 5) không cần Streamlit"""
+    process_key = resolve_process_key(city_mode, property_type)
+    resources = load_resources(model_registry.canonical_model_id(city_mode, property_type))
+    return predict_frame(resources, process_key, inputs)
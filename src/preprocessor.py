@@ -1,9 +1,10 @@
 import pandas as pd
 import numpy as np
-import pickle
 import os
-import streamlit as st
-import category_encoders as ce
+
+from src import artifacts
+from src import geo_distance
+from src.geo_distance import haversine_np  # Giữ tên cũ cho code gọi preprocessor.haversine_np
 # ==============================================================================
 # 1. CẤU HÌNH (CONFIG & MAPPING)
 # ==============================================================================
@@ -71,6 +72,63 @@ SCORE_MAPS = {
 
 BINARY_MAP = {"Có": 1, "Yes": 1, "True": 1, "Không": 0, "No": 0, "False": 0}
 
+# --- THỨ TỰ CỘT ĐẦU RA CỦA TỪNG WORKER (Chuẩn theo X_train.info() lúc train) ---
+# Dùng chung cho worker và src/feature_plan.py (so khớp với model.feature_names_in_ lúc load)
+FEATURE_ORDERS = {
+    'Căn hộ Chung cư': [
+        'area', 'lat', 'lon', 
+        'bedrooms', 'bathrooms', 
+        'legal_score', 'interior_score', 
+        'project_name'
+    ],
+    'Nhà phố Hồ Chí Minh': [
+        'area', 'lat', 'lon', 'front_width', 'access_road', 
+        'floors', 'bedrooms', 'bathrooms', 
+        'is_car_accessible', 'is_corner', 
+        'interior_encoded', 'legal_score', 
+        'direction_Chưa xác định', 
+        'direction_Nam', 
+        'direction_Tây', 
+        'direction_Tây Bắc', 
+        'direction_Tây Nam', 
+        'direction_Đông', 
+        'direction_Đông Bắc', 
+        'direction_Đông Nam'
+    ],
+    'Nhà phố Hà Nội': [
+        'area', 'lat', 'lon', 'front_width', 'access_road', 
+        'floors', 'bedrooms', 'bathrooms', 
+        'is_corner', 'road_class', 'interior_encoded', 
+        'legal_Hợp đồng mua bán', 'legal_Sổ hồng/Sổ đỏ', 'legal_Vi bằng/Giấy tay'
+    ],
+    'Đất nền': [
+        'lat', 'lon', 
+        'front_width', 'access_road',
+        # Nhóm Direction (8 cột - mất Bắc)
+        'direction_Chưa xác định', 'direction_Nam', 'direction_Tây',
+        'direction_Tây Bắc', 'direction_Tây Nam', 'direction_Đông',
+        'direction_Đông Bắc', 'direction_Đông Nam',
+        # Nhóm Legal (3 cột - mất Giấy tờ khác)
+        'legal_Hợp đồng mua bán', 'legal_Sổ hồng/Sổ đỏ', 'legal_Vi bằng/Giấy tay',
+        # Các cột Feature Engineering
+        'geo_cluster', 
+        'land_depth', 'shape_ratio', 'business_potential',
+        'log_area', 'log_dist', 'road_type'
+    ],
+    'Biệt thự / Villa': [
+        'area', 'lat', 'lon', 'front_width', 'access_road', 
+        'floors', 'bedrooms', 'bathrooms', 
+        'is_corner', 'interior_encoded', 
+        # Direction (8 cột - không có Bắc)
+        'direction_Chưa xác định', 'direction_Nam', 'direction_Tây', 
+        'direction_Tây Bắc', 'direction_Tây Nam', 'direction_Đông', 
+        'direction_Đông Bắc', 'direction_Đông Nam', 
+        # Legal (3 cột - không có Giấy tờ khác)
+        'legal_Hợp đồng mua bán', 'legal_Sổ hồng/Sổ đỏ', 'legal_Vi bằng/Giấy tay', 
+        'road_class'
+    ],
+}
+
 # ==============================================================================
 # 2. CÁC HÀM HỖ TRỢ (HELPER FUNCTIONS)
 # ==============================================================================
@@ -102,16 +160,23 @@ MEDIAN_DEFAULTS = {
         'lat': 16.069, 'lon': 106.6589
     },
 }
+def fill_invalid(series, default):
+    """
+    Thay các giá trị NaN hoặc <= 0 bằng giá trị mặc định.
+    Chạy theo cả cột nên dùng được cho 1 dòng (Sidebar) lẫn N dòng (Batch).
+    """
+    return series.mask(series.isna() | (series <= 0), default)
+
 def apply_one_hot(df, col_name, options):
-    """Biến 1 cột thành nhiều cột One-Hot (gán 0 hoặc 1)"""
+    """Biến 1 cột thành nhiều cột One-Hot (gán 0 hoặc 1) - Chạy theo cột cho cả batch"""
     if col_name not in df.columns:
         return df
         
-    user_val = df[col_name].iloc[0]
+    values = df[col_name]
     for opt in options:
         # Tên cột mới: Ví dụ 'direction_Đông' (Kiểm tra lại prefix của bạn lúc train nhé)
         new_col = f"{col_name}_{opt}" 
-        df[new_col] = 1.0 if user_val == opt else 0.0
+        df[new_col] = (values == opt).astype(float)
         
     return df.drop(columns=[col_name])
 # --- CẤU HÌNH ĐỊA LÝ (CHO ĐẤT NỀN) ---
@@ -129,19 +194,12 @@ PROVINCE_CENTERS = {
     'VietTri': (21.3228, 105.4022), 'Pleiku': (13.9833, 108.0000),
     'PhanThiet': (10.9804, 108.0389), 'CaMau': (9.1769, 105.1524)
 }
+# Index tâm dựng sẵn 1 lần (thay bằng danh sách lớn hơn, VD trụ sở quận/huyện, qua geo_distance.load_centers)
+PROVINCE_INDEX = geo_distance.CenterIndex(PROVINCE_CENTERS)
 
 # Đường dẫn file KMeans (Bạn cần lưu file này lúc train nhé!)
 KMEANS_PATH = os.path.join(BASE_DIR, "models", "kmeans_land.pkl")
 
-def haversine_np(lat1, lon1, lat2, lon2):
-    """Hàm tính khoảng cách (km) giữa 2 điểm tọa độ"""
-    R = 6371
-    phi1, phi2 = np.radians(lat1), np.radians(lat2)
-    dphi = np.radians(lat2 - lat1)
-    dlambda = np.radians(lon2 - lon1)
-    a = np.sin(dphi/2.0)**2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda/2.0)**2
-    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
-    return R * c
 def clean_binary_cols(df):
     """
     Chuyển đổi Có/Không thành 1/0 (Chỉ áp dụng cho các cột Yes/No thực sự)
@@ -209,25 +267,20 @@ def process_apartment(df):
     # ==========================================================
     # 4. ENCODE TÊN DỰ ÁN (KHẮC PHỤC LỖI DIMENSION)
     # ==========================================================
-    # Đây là danh sách 8 cột VÀNG mà Encoder/Model yêu cầu
+    # Đây là danh sách 8 cột VÀNG mà Encoder/Model yêu cầu (xem FEATURE_ORDERS)
     # Thứ tự phải chuẩn xác 100%
-    target_cols = [
-        'area', 'lat', 'lon', 
-        'bedrooms', 'bathrooms', 
-        'legal_score', 'interior_score', 
-        'project_name'
-    ]
+    target_cols = FEATURE_ORDERS['Căn hộ Chung cư']
 
     # Mặc định gán giá trị trung bình nếu chưa encode được
     # (Giá trị 22.5 tương đương khoảng 6 tỷ sau khi expm1, tránh bị về 0)
     df['project_name_encoded'] = 22.5 
 
     if 'project_name' in df.columns:
-        if os.path.exists(ENCODER_PATH):
+        # Encoder lấy từ cache của process (chỉ unpickle 1 lần, tự load lại khi file đổi).
+        # Unpickle tự import category_encoders (kéo theo sklearn/scipy) -> chỉ tốn khi định giá chung cư
+        encoder = artifacts.load_artifact(ENCODER_PATH)
+        if encoder is not None:
             try:
-                with open(ENCODER_PATH, "rb") as f:
-                    encoder = pickle.load(f)
-                
                 # --- BƯỚC QUAN TRỌNG NHẤT: LỌC CỘT ---
                 # Tạo một DataFrame tạm chỉ chứa đúng 8 cột cần thiết
                 # Để Encoder không bị "sốc" khi thấy các cột lạ (front_width, direction...)
@@ -238,8 +291,8 @@ def process_apartment(df):
                 
                 # Gán lại kết quả
                 if 'project_name' in df_encoded.columns:
-                    df['project_name_encoded'] = df_encoded['project_name']
-                    print(f"✅ Encode OK: {df['project_name_encoded'].iloc[0]}")
+                    df['project_name_encoded'] = df_encoded['project_name'].to_numpy()
+                    print(f"✅ Encode OK: {df['project_name_encoded'].iloc[0]} ({len(df)} dòng)")
                 
             except Exception as e:
                 print(f"⚠️ Lỗi Encoder: {e}")
@@ -274,14 +327,10 @@ def process_hcm(df):
 
     # A. Xử lý số thực (Float)
     if 'front_width' in df.columns:
-        val = df['front_width'].iloc[0]
-        if pd.isna(val) or val <= 0:
-             df['front_width'] = defaults['front_width']
+        df['front_width'] = fill_invalid(df['front_width'], defaults['front_width'])
 
     if 'access_road' in df.columns:
-        val = df['access_road'].iloc[0]
-        if pd.isna(val) or val <= 0:
-             df['access_road'] = defaults['access_road']
+        df['access_road'] = fill_invalid(df['access_road'], defaults['access_road'])
 
     # B. Xử lý Toilet/Phòng ngủ/Tầng (Int)
     # Trong X_train của bạn bedrooms/bathrooms là float (có thể do có NaN),
@@ -289,20 +338,15 @@ def process_hcm(df):
     int_cols = ['floors', 'bedrooms', 'bathrooms']
     for col in int_cols:
         if col in df.columns:
-            val = df[col].iloc[0]
-            if pd.isna(val) or val <= 0:
-                # Logic thông minh cho bathroom
-                if col == 'bathrooms' and 'bedrooms' in df.columns:
-                    bed_val = df['bedrooms'].iloc[0]
-                    if bed_val > 0:
-                        df[col] = bed_val
-                    else:
-                        df[col] = defaults[col]
-                else:
-                    df[col] = defaults.get(col, 1) # Mặc định tối thiểu 1
+            # Logic thông minh cho bathroom: lấy theo số phòng ngủ (nếu > 0)
+            if col == 'bathrooms' and 'bedrooms' in df.columns:
+                bed = df['bedrooms']
+                fallback = bed.where(bed > 0, defaults[col])
+            else:
+                fallback = defaults.get(col, 1) # Mặc định tối thiểu 1
             
             # Ép kiểu số nguyên
-            df[col] = df[col].astype(int)
+            df[col] = fill_invalid(df[col], fallback).astype(int)
 
     # ==========================================================
     # 2. FEATURE ENGINEERING
@@ -347,21 +391,8 @@ def process_hcm(df):
     # ==========================================================
     # 4. SẮP XẾP CỘT (REORDER) - QUAN TRỌNG NHẤT
     # ==========================================================
-    # Thứ tự phải khớp y chang ảnh X_train.info() bạn gửi
-    final_order = [
-        'area', 'lat', 'lon', 'front_width', 'access_road', 
-        'floors', 'bedrooms', 'bathrooms', 
-        'is_car_accessible', 'is_corner', 
-        'interior_encoded', 'legal_score', 
-        'direction_Chưa xác định', 
-        'direction_Nam', 
-        'direction_Tây', 
-        'direction_Tây Bắc', 
-        'direction_Tây Nam', 
-        'direction_Đông', 
-        'direction_Đông Bắc', 
-        'direction_Đông Nam'
-    ]
+    # Thứ tự phải khớp y chang ảnh X_train.info() bạn gửi (xem FEATURE_ORDERS)
+    final_order = FEATURE_ORDERS['Nhà phố Hồ Chí Minh']
     
     # Đảm bảo đủ cột, thiếu thì bù 0 (False)
     for col in final_order:
@@ -396,20 +427,14 @@ def process_hanoi(df):
     float_cols = ['area', 'lat', 'lon', 'front_width', 'access_road']
     for col in float_cols:
         if col in df.columns:
-            val = df[col].iloc[0]
-            if pd.isna(val) or val <= 0:
-                df[col] = defaults.get(col, 0.0)
-            df[col] = df[col].astype(float)
+            df[col] = fill_invalid(df[col], defaults.get(col, 0.0)).astype(float)
 
     # List các cột số nguyên (Bắt buộc làm tròn)
     int_cols = ['floors', 'bedrooms', 'bathrooms']
     for col in int_cols:
         if col in df.columns:
-            val = df[col].iloc[0]
-            if pd.isna(val) or val <= 0:
-                df[col] = defaults.get(col, 0)
             # Làm tròn và ép kiểu int (Ví dụ: 2.5 tầng -> 3 tầng)
-            df[col] = df[col].round().astype(int)
+            df[col] = fill_invalid(df[col], defaults.get(col, 0)).round().astype(int)
 
     # ==========================================================
     # 2. FEATURE ENGINEERING (TẠO CỘT MỚI)
@@ -420,13 +445,8 @@ def process_hanoi(df):
     # Bạn kiểm tra lại logic lúc train nhé. Đây là logic phổ biến:
     # 1: Ngõ ba gác (< 2.5m) | 2: Ngõ ô tô (2.5m - 5m) | 3: Mặt phố (> 5m)
     if 'access_road' in df.columns:
-        width = df['access_road'].iloc[0]
-        if width >= 5.0:
-            df['road_class'] = 3
-        elif width >= 2.5:
-            df['road_class'] = 2
-        else:
-            df['road_class'] = 1
+        width = df['access_road']
+        df['road_class'] = np.select([width >= 5.0, width >= 2.5], [3, 2], default=1)
     else:
         df['road_class'] = 1 # Mặc định ngõ nhỏ
 
@@ -477,13 +497,8 @@ def process_hanoi(df):
     # ==========================================================
     # 4. SẮP XẾP CỘT (REORDER) - ĐỂ KHỚP VỊ TRÍ VỚI MODEL
     # ==========================================================
-    # Model sklearn rất khó tính, thứ tự cột phải đúng y chang lúc train
-    final_order = [
-        'area', 'lat', 'lon', 'front_width', 'access_road', 
-        'floors', 'bedrooms', 'bathrooms', 
-        'is_corner', 'road_class', 'interior_encoded', 
-        'legal_Hợp đồng mua bán', 'legal_Sổ hồng/Sổ đỏ', 'legal_Vi bằng/Giấy tay'
-    ]
+    # Model sklearn rất khó tính, thứ tự cột phải đúng y chang lúc train (xem FEATURE_ORDERS)
+    final_order = FEATURE_ORDERS['Nhà phố Hà Nội']
     
     # Chỉ lấy các cột có trong list trên
     # (Nếu thiếu cột nào thì fill 0 để tránh crash)
@@ -505,25 +520,20 @@ def process_land(df):
     
     # A. Front Width (Mặt tiền) - Logic Median từ Train
     if 'front_width' in df.columns:
-        val = df['front_width'].iloc[0]
-        if pd.isna(val) or val <= 0:
-            df['front_width'] = defaults['front_width']
+        df['front_width'] = fill_invalid(df['front_width'], defaults['front_width'])
             
     # B. Access Road (Đường vào)
     if 'access_road' in df.columns:
-        val = df['access_road'].iloc[0]
-        if pd.isna(val) or val <= 0:
-            df['access_road'] = defaults['access_road']
+        df['access_road'] = fill_invalid(df['access_road'], defaults['access_road'])
 
     # C. Area (Diện tích) - Để tránh log(0)
     if 'area' in df.columns:
-         if df['area'].iloc[0] <= 0:
-             df['area'] = 50.0 # Giá trị an toàn
+        df['area'] = df['area'].mask(df['area'] <= 0, 50.0) # Giá trị an toàn
 
     # Đảm bảo lat/lon không bị 0 (dùng default)
     for col in ['lat', 'lon']:
         if col in df.columns:
-            if df[col].iloc[0] == 0: df[col] = defaults[col]
+            df[col] = df[col].mask(df[col] == 0, defaults[col])
 
     # ==========================================================
     # 2. FEATURE ENGINEERING (HÌNH HỌC & LOGIC)
@@ -546,13 +556,8 @@ def process_land(df):
 
     # E. Road Type (Binning) - Logic 3 nhóm
     # < 3m: 0 | 3-6m: 1 | > 6m: 2
-    width = df['access_road'].iloc[0]
-    if width < 3.0:
-        df['road_type'] = 0
-    elif width <= 6.0:
-        df['road_type'] = 1
-    else:
-        df['road_type'] = 2
+    width = df['access_road']
+    df['road_type'] = np.select([width < 3.0, width <= 6.0], [0, 1], default=2)
     # Ép kiểu int64 cho road_type
     df['road_type'] = df['road_type'].astype(int)
 
@@ -561,29 +566,29 @@ def process_land(df):
     # ==========================================================
 
     # A. Log Distance (Khoảng cách đến TP gần nhất)
-    # Tìm khoảng cách nhỏ nhất trong list PROVINCE_CENTERS
-    centers_coords = list(PROVINCE_CENTERS.values()) # List các tuple (lat, lon)
-    user_lat = df['lat'].iloc[0]
-    user_lon = df['lon'].iloc[0]
-    
-    # Tính khoảng cách đến TẤT CẢ các tâm, lấy min
-    # Lưu ý: Ta tính thủ công thay vì dùng KDTree vì ở đây chỉ có 1 điểm, dùng vòng lặp nhanh hơn load KDTree
-    min_dist = float('inf')
-    for c_lat, c_lon in centers_coords:
-        dist = haversine_np(user_lat, user_lon, c_lat, c_lon)
-        if dist < min_dist:
-            min_dist = dist
-            
+    # Tìm khoảng cách nhỏ nhất trong list PROVINCE_CENTERS (engine vector hóa, cả batch 1 lần)
+    # Tọa độ NaN -> khoảng cách inf (giống vòng lặp cũ: không tâm nào "gần hơn" inf)
+    min_dist = PROVINCE_INDEX.nearest_distance(df['lat'].to_numpy(dtype=float), df['lon'].to_numpy(dtype=float))
     df['log_dist'] = np.log1p(min_dist)
 
     # B. Geo Cluster (KMeans) - QUAN TRỌNG
     # Bạn phải load model KMeans đã train. Nếu chưa có file, ta gán mặc định cluster 0.
-    if os.path.exists(KMEANS_PATH):
+    # (Tâm cụm lấy từ KMeans trong cache của process - chung object với loader.load_models)
+    kmeans_index = geo_distance.kmeans_index(KMEANS_PATH)
+    if kmeans_index is not None:
         try:
-            with open(KMEANS_PATH, "rb") as f:
-                kmeans = pickle.load(f)
-            # Dự báo cụm
-            df['geo_cluster'] = kmeans.predict(df[['lat', 'lon']])[0]
+            # Gán cụm cho các dòng có tọa độ hợp lệ, dòng lỗi giữ cluster 0
+            lat = df['lat'].to_numpy(dtype=float)
+            lon = df['lon'].to_numpy(dtype=float)
+            valid_mask = ~(np.isnan(lat) | np.isnan(lon))
+            clusters = np.zeros(len(df), dtype=int)
+            if len(df) == 1:
+                # 1 BĐS từ Sidebar: không cấp phát ma trận
+                if valid_mask[0]:
+                    clusters[0] = kmeans_index.assign_point(lat[0], lon[0])
+            elif valid_mask.any():
+                clusters[valid_mask] = kmeans_index.assign(np.column_stack([lat[valid_mask], lon[valid_mask]]))
+            df['geo_cluster'] = clusters
         except:
             df['geo_cluster'] = 0 # Fallback
     else:
@@ -618,21 +623,8 @@ def process_land(df):
     # 5. SẮP XẾP CỘT (REORDER & CLEANUP)
     # ==========================================================
     
-    # Danh sách cột chuẩn từ X_train.info()
-    final_order = [
-        'lat', 'lon', 
-        'front_width', 'access_road',
-        # Nhóm Direction (8 cột - mất Bắc)
-        'direction_Chưa xác định', 'direction_Nam', 'direction_Tây',
-        'direction_Tây Bắc', 'direction_Tây Nam', 'direction_Đông',
-        'direction_Đông Bắc', 'direction_Đông Nam',
-        # Nhóm Legal (3 cột - mất Giấy tờ khác)
-        'legal_Hợp đồng mua bán', 'legal_Sổ hồng/Sổ đỏ', 'legal_Vi bằng/Giấy tay',
-        # Các cột Feature Engineering
-        'geo_cluster', 
-        'land_depth', 'shape_ratio', 'business_potential',
-        'log_area', 'log_dist', 'road_type'
-    ]
+    # Danh sách cột chuẩn từ X_train.info() (xem FEATURE_ORDERS)
+    final_order = FEATURE_ORDERS['Đất nền']
 
     # Bù các cột thiếu bằng 0 / False
     for col in final_order:
@@ -662,20 +654,14 @@ def process_villa(df):
     float_cols = ['area', 'lat', 'lon', 'front_width', 'access_road']
     for col in float_cols:
         if col in df.columns:
-            val = df[col].iloc[0]
-            if pd.isna(val) or val <= 0:
-                df[col] = defaults.get(col, 0.0)
-            df[col] = df[col].astype(float)
+            df[col] = fill_invalid(df[col], defaults.get(col, 0.0)).astype(float)
 
     # B. Cột số nguyên (Int) - Bắt buộc làm tròn
     int_cols = ['floors', 'bedrooms', 'bathrooms']
     for col in int_cols:
         if col in df.columns:
-            val = df[col].iloc[0]
-            if pd.isna(val) or val <= 0:
-                df[col] = defaults.get(col, 0)
             # Làm tròn và ép kiểu int (VD: 2.5 -> 3)
-            df[col] = df[col].round().astype(int)
+            df[col] = fill_invalid(df[col], defaults.get(col, 0)).round().astype(int)
 
     # ==========================================================
     # 2. FEATURE ENGINEERING (TẠO CỘT MỚI)
@@ -684,15 +670,12 @@ def process_villa(df):
     # A. Road Class (Phân loại đường - Logic RIÊNG của Villa)
     # Logic Train: < 4m (0) | < 7m (1) | >= 7m (2)
     if 'access_road' in df.columns:
-        width = df['access_road'].iloc[0]
-        if pd.isna(width):
-             df['road_class'] = 0
-        elif width < 4.0:
-            df['road_class'] = 0  # Hẻm nhỏ
-        elif width < 7.0:
-            df['road_class'] = 1  # Xe hơi vào
-        else:
-            df['road_class'] = 2  # Đường lớn/2 xe tránh
+        width = df['access_road']
+        df['road_class'] = np.select(
+            [width.isna(), width < 4.0, width < 7.0],
+            [0, 0, 1],   # NaN | Hẻm nhỏ | Xe hơi vào
+            default=2    # Đường lớn/2 xe tránh
+        )
     else:
         df['road_class'] = 0
     
@@ -745,19 +728,8 @@ def process_villa(df):
     # ==========================================================
     # 4. SẮP XẾP CỘT (REORDER) - BƯỚC CUỐI
     # ==========================================================
-    # Thứ tự chuẩn theo X_train.info() của Villa
-    final_order = [
-        'area', 'lat', 'lon', 'front_width', 'access_road', 
-        'floors', 'bedrooms', 'bathrooms', 
-        'is_corner', 'interior_encoded', 
-        # Direction (8 cột - không có Bắc)
-        'direction_Chưa xác định', 'direction_Nam', 'direction_Tây', 
-        'direction_Tây Bắc', 'direction_Tây Nam', 'direction_Đông', 
-        'direction_Đông Bắc', 'direction_Đông Nam', 
-        # Legal (3 cột - không có Giấy tờ khác)
-        'legal_Hợp đồng mua bán', 'legal_Sổ hồng/Sổ đỏ', 'legal_Vi bằng/Giấy tay', 
-        'road_class'
-    ]
+    # Thứ tự chuẩn theo X_train.info() của Villa (xem FEATURE_ORDERS)
+    final_order = FEATURE_ORDERS['Biệt thự / Villa']
     
     # Bù cột thiếu bằng 0
     for col in final_order:
@@ -781,14 +753,20 @@ def process_villa(df):
 # ==============================================================================
 
 # Đổi tên hàm thành transform_input để khớp với app.py
-def transform_input(user_input_dict, model_type):
+def transform_input(user_input, model_type):
     """
     Hàm tổng nhận dữ liệu từ App và gọi Worker tương ứng.
     Tham số:
-      - user_input_dict: Dictionary chứa dữ liệu nhập từ Sidebar
+      - user_input: Dictionary chứa dữ liệu nhập từ Sidebar (1 BĐS),
+                    hoặc DataFrame N dòng (chế độ Batch - định giá cả kho hàng)
       - model_type: Chuỗi tên loại hình (VD: "Nhà phố Hồ Chí Minh")
+    Mọi worker đều xử lý theo cột, nên kết quả của 1 dòng trong batch
+    giống hệt khi gửi riêng dòng đó.
     """
-    df = pd.DataFrame([user_input_dict])
+    if isinstance(user_input, pd.DataFrame):
+        df = user_input.copy()
+    else:
+        df = pd.DataFrame([user_input])
     
     # 1. Xử lý Binary (Có/Không -> 1/0)
     df = clean_binary_cols(df)
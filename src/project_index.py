@@ -0,0 +1,135 @@
+import bisect
+import difflib
+import threading
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# ==============================================================================
+# DANH MỤC DỰ ÁN CHUNG CƯ (PROJECT INDEX) - BUILD 1 LẦN, TÌM KIẾM NHANH
+# ==============================================================================
+# Thay vì đọc cả file chung cư rồi đẩy hàng nghìn tên vào 1 selectbox mỗi lần rerun,
+# ta dựng sẵn 1 bảng nhỏ: tên đã sắp xếp, key không dấu, số tin và tâm (lat/lon)
+# của từng dự án. Sidebar chỉ hỏi index lấy vài chục kết quả khớp nhất.
+
+
+def normalize_text(text):
+    """Chuẩn hóa để so khớp: bỏ dấu tiếng Việt, đ -> d, chữ thường, gộp khoảng trắng"""
+    text = unicodedata.normalize('NFD', str(text))
+    text = ''.join(ch for ch in text if unicodedata.category(ch) != 'Mn')
+    text = text.replace('đ', 'd').replace('Đ', 'D').lower()
+    text = ''.join(ch if ch.isalnum() else ' ' for ch in text)
+    return ' '.join(text.split())
+
+
+class ProjectIndex:
+    """
+    Bảng dự án đã sắp xếp theo tên:
+      - names : tên gốc (project_name_raw)
+      - keys  : tên đã chuẩn hóa (không dấu)
+      - counts: số tin đăng của dự án
+      - lats/lons: tọa độ trung bình (tâm dự án)
+    """
+
+    def __init__(self, names, counts, lats, lons):
+        order = np.argsort(np.asarray(names, dtype=object))
+        self.names = [names[i] for i in order]
+        self.counts = np.asarray(counts)[order]
+        self.lats = np.asarray(lats, dtype=float)[order]
+        self.lons = np.asarray(lons, dtype=float)[order]
+        self.keys = [normalize_text(n) for n in self.names]
+
+        # Bảng phụ cho tìm theo tiền tố: key đã sắp xếp -> vị trí trong names
+        self._prefix_order = sorted(range(len(self.keys)), key=lambda i: self.keys[i])
+        self._prefix_keys = [self.keys[i] for i in self._prefix_order]
+        self._position = {name: i for i, name in enumerate(self.names)}
+
+    @classmethod
+    def from_frame(cls, df, name_col='project_name_raw'):
+        """Dựng index từ DataFrame chung cư (1 lần groupby)"""
+        if df is None or df.empty or name_col not in df.columns:
+            return cls([], [], [], [])
+
+        work = pd.DataFrame({
+            'name': df[name_col].astype(object),
+            'lat': df['lat'].where(df['lat'] != 0) if 'lat' in df.columns else np.nan,
+            'lon': df['lon'].where(df['lon'] != 0) if 'lon' in df.columns else np.nan,
+        }).dropna(subset=['name'])
+        work = work[work['name'].astype(str) != 'nan']
+        stats = work.groupby('name', sort=False).agg(count=('name', 'size'), lat=('lat', 'mean'), lon=('lon', 'mean'))
+        return cls([str(n) for n in stats.index], stats['count'].to_numpy(),
+                   stats['lat'].to_numpy(), stats['lon'].to_numpy())
+
+    def __len__(self):
+        return len(self.names)
+
+    def info(self, name):
+        """Số tin + tâm dự án (None nếu không có trong index)"""
+        i = self._position.get(name)
+        if i is None:
+            return None
+        return {'name': name, 'count': int(self.counts[i]), 'lat': self.lats[i], 'lon': self.lons[i]}
+
+    def search(self, query, limit=30):
+        """
+        Trả về tối đa `limit` tên dự án khớp nhất với query (không phân biệt dấu/hoa thường):
+          1. Khớp tiền tố (bisect trên key đã sắp xếp)
+          2. Khớp đầu 1 từ bất kỳ / chứa chuỗi con
+          3. Gần đúng (gõ sai chính tả) bằng difflib
+        Trong mỗi nhóm, dự án nhiều tin hơn đứng trước. Query rỗng -> các dự án nhiều tin nhất.
+        """
+        q = normalize_text(query or '')
+        if not q:
+            top = np.argsort(-self.counts, kind='stable')[:limit]
+            return [self.names[i] for i in top]
+
+        by_count = lambda idx: sorted(idx, key=lambda i: -self.counts[i])
+        results, seen = [], set()
+
+        def add(group):
+            for i in by_count(group):
+                if i not in seen and len(results) < limit:
+                    seen.add(i)
+                    results.append(self.names[i])
+
+        # 1. Tiền tố
+        lo = bisect.bisect_left(self._prefix_keys, q)
+        hi = bisect.bisect_left(self._prefix_keys, q + '\uffff')
+        add(self._prefix_order[lo:hi])
+
+        # 2. Đầu từ / chuỗi con
+        if len(results) < limit:
+            word_hits = [i for i, k in enumerate(self.keys) if f' {q}' in f' {k}']
+            add(word_hits)
+        if len(results) < limit:
+            add([i for i, k in enumerate(self.keys) if q in k])
+
+        # 3. Gần đúng
+        if len(results) < limit and len(q) >= 3:
+            close = difflib.get_close_matches(q, self.keys, n=limit, cutoff=0.6)
+            key_pos = {}
+            for i, k in enumerate(self.keys):
+                key_pos.setdefault(k, []).append(i)
+            add([i for k in close for i in key_pos[k]])
+
+        return results
+
+
+_INDEX = None
+_INDEX_SOURCE = None
+_INDEX_LOCK = threading.Lock()
+
+
+def get_project_index():
+    """Index dự án dựng 1 lần / process từ dataset chung cư (dựng lại nếu dataset được load lại)"""
+    global _INDEX, _INDEX_SOURCE
+    from src import loader
+    df = loader.load_dataset('apartment')
+    if _INDEX is not None and _INDEX_SOURCE is df:
+        return _INDEX
+    with _INDEX_LOCK:
+        if _INDEX is None or _INDEX_SOURCE is not df:
+            _INDEX = ProjectIndex.from_frame(df)
+            _INDEX_SOURCE = df
+        return _INDEX
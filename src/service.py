@@ -0,0 +1,287 @@
+"""
+Dịch vụ HTTP định giá BĐS (không cần Streamlit) cho hệ thống khác (CRM, ...) gọi qua mạng nội bộ.
+
+Các request đồng thời cho cùng 1 model được gom trong cửa sổ vài mili giây (micro-batching)
+rồi đi qua preprocess + 1 lần model.predict cho mỗi nhóm request cùng tập key trong lô,
+thay vì mỗi request 1 lần predict.
+Kết quả trùng input (đã chuẩn hóa) lấy từ src/prediction_cache.py, không vào hàng đợi.
+
+Chạy:
+    python -m src.service --port 8600 --batch-window-ms 5 --max-batch 256
+
+API (JSON, UTF-8):
+    POST /predict   {"property_type": "Nhà phố", "city_mode": "Hà Nội", "inputs": {...}}
+                 -> {"model": "hanoi", "price": 8.01, "cached": false}
+                    "inputs" là list -> {"model": ..., "prices": [...]}
+                    Các key của inputs giống Sidebar: area, front_width, access_road, bedrooms,
+                    floors, toilet, legal, direction, interior, project_name, lat, lon
+    GET  /health    -> {"status": "ok", "models": [...model đang nằm trong RAM]}
+    GET  /metrics, /metrics.json -> số liệu src/metrics.py (thời gian từng bước, cache, batch)
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from src import metrics
+from src import model_registry
+from src import prediction_cache
+from src import predictor
+
+DEFAULT_PORT = 8600
+DEFAULT_BATCH_WINDOW_MS = 5.0
+DEFAULT_MAX_BATCH = 256
+# Thời gian tối đa 1 request chờ kết quả từ lô (giây)
+REQUEST_TIMEOUT = 30.0
+# Giới hạn kích thước body (byte)
+MAX_BODY_BYTES = 8 * 1024 * 1024
+
+# ==============================================================================
+# 1. MICRO-BATCHING THEO MODEL
+# ==============================================================================
+
+class MicroBatcher:
+    """
+    1 thread / model: lấy request đầu tiên trong hàng đợi, gom thêm các request tới trong
+    `window` giây (tối đa `max_batch` dòng), rồi định giá cả lô bằng 1 lần predict.
+    """
+
+    def __init__(self, model_id, window_seconds, max_batch):
+        self.model_id = model_id
+        self.process_key = model_registry.MODEL_SPECS[model_id]['process_key']
+        self.window = window_seconds
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        self.batches = 0
+        self.rows = 0
+        self.max_seen = 0
+        threading.Thread(target=self._loop, name=f"batcher-{model_id}", daemon=True).start()
+
+    def submit(self, inputs):
+        """Đưa 1 dòng input (dict) vào lô kế tiếp, trả về Future -> giá (Tỷ)"""
+        future = Future()
+        self.queue.put((inputs, future))
+        return future
+
+    def _collect(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._score(batch)
+            except Exception as e:   # lỗi ngoài dự kiến: không để thread chết, báo lỗi cho cả lô
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _score(self, batch):
+        self.batches += 1
+        self.rows += len(batch)
+        self.max_seen = max(self.max_seen, len(batch))
+
+        timer = metrics.StageTimer(self.model_id)
+        resources = predictor.load_resources(self.model_id)
+        timer.lap('load_model')
+        # Gom theo tập key của input: key thiếu ở 1 request mà request khác có sẽ thành NaN trong
+        # DataFrame chung, preprocessor đi nhánh fillna thay vì nhánh "không có cột"
+        # -> giá của 1 request phụ thuộc request khác cùng lô. Mỗi nhóm cùng key = 1 lần predict.
+        groups = {}
+        for inputs, future in batch:
+            groups.setdefault(tuple(sorted(inputs)), []).append((inputs, future))
+        for group in groups.values():
+            self._score_group(resources, group)
+        timer.lap('batch_predict')
+
+    def _score_group(self, resources, group):
+        frame = pd.DataFrame([inputs for inputs, _ in group])
+        try:
+            prices = predictor.predict_frame(resources, self.process_key, frame)
+        except Exception:
+            # 1 dòng lỗi không được kéo cả nhóm: tính lại từng dòng để chỉ dòng lỗi nhận exception
+            prices = None
+
+        for i, (inputs, future) in enumerate(group):
+            if prices is not None:
+                future.set_result(float(prices[i]))
+                continue
+            try:
+                future.set_result(float(predictor.predict_frame(resources, self.process_key, inputs)[0]))
+            except Exception as e:
+                future.set_exception(e)
+
+    def stats(self):
+        return {'batches': self.batches, 'rows': self.rows, 'max_batch_seen': self.max_seen,
+                'mean_batch': self.rows / self.batches if self.batches else 0.0,
+                'queued': self.queue.qsize()}
+
+
+class PredictionService:
+    def __init__(self, window_ms=DEFAULT_BATCH_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH):
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._batchers = {}
+        self._lock = threading.Lock()
+        metrics.STAGE_METRICS.register_collector('service', self.stats)
+
+    def batcher(self, model_id):
+        batcher = self._batchers.get(model_id)
+        if batcher is None:
+            with self._lock:
+                batcher = self._batchers.get(model_id)
+                if batcher is None:
+                    batcher = self._batchers[model_id] = MicroBatcher(model_id, self.window, self.max_batch)
+        return batcher
+
+    def predict_many(self, records, city_mode, property_type):
+        """
+        Định giá list input cùng loại hình. Trả về (model_id, [(giá, lấy từ cache?)]).
+        Raise ModelNotFoundError nếu không có model.
+        """
+        model_id = model_registry.canonical_model_id(city_mode, property_type)
+        if model_registry.model_fingerprint(model_id) is None:
+            raise predictor.ModelNotFoundError(f"Không tìm thấy model '{model_id}' trong folder models/")
+
+        start = time.perf_counter()
+        cache = prediction_cache.prediction_cache
+        pending = []
+        results = [None] * len(records)
+        for i, record in enumerate(records):
+            inputs = prediction_cache.canonicalize_inputs(record)
+            key = prediction_cache.make_key(model_id, inputs)
+            hit, price = cache.get(key)
+            if hit:
+                results[i] = (float(price), True)
+            else:
+                pending.append((i, key, self.batcher(model_id).submit(inputs)))
+
+        for i, key, future in pending:
+            price = future.result(timeout=REQUEST_TIMEOUT)
+            cache.put(key, price)
+            results[i] = (price, False)
+
+        metrics.STAGE_METRICS.observe(model_id, 'request', time.perf_counter() - start)
+        return model_id, results
+
+    def stats(self):
+        totals = {'batches': 0, 'rows': 0, 'max_batch_seen': 0, 'queued': 0}
+        for batcher in list(self._batchers.values()):
+            s = batcher.stats()
+            for name in totals:
+                totals[name] = max(totals[name], s[name]) if name == 'max_batch_seen' else totals[name] + s[name]
+        totals['mean_batch'] = totals['rows'] / totals['batches'] if totals['batches'] else 0.0
+        return totals
+
+# ==============================================================================
+# 2. HTTP
+# ==============================================================================
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   # giữ kết nối (keep-alive) cho client gọi liên tục
+    service = None                  # PredictionService, gán lúc khởi động
+
+    def _send(self, status, body, content_type='application/json; charset=utf-8'):
+        payload = body.encode('utf-8') if isinstance(body, str) else json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/health':
+            self._send(200, {'status': 'ok', 'models': list(model_registry.registry.stats()['models'])})
+        elif path == '/metrics':
+            self._send(200, metrics.STAGE_METRICS.render_prometheus(), 'text/plain; version=0.0.4; charset=utf-8')
+        elif path == '/metrics.json':
+            self._send(200, metrics.STAGE_METRICS.render_json())
+        else:
+            self._send(404, {'error': f"Không có đường dẫn {path}"})
+
+    def do_POST(self):
+        if self.path.split('?', 1)[0] != '/predict':
+            self._send(404, {'error': f"Không có đường dẫn {self.path}"})
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            if length > MAX_BODY_BYTES:
+                raise ValueError(f"Body quá lớn ({length} byte)")
+            body = json.loads(self.rfile.read(length) or b'{}')
+            property_type = body['property_type']
+            city_mode = body.get('city_mode', "Hồ Chí Minh")
+            inputs = body['inputs']
+            records = inputs if isinstance(inputs, list) else [inputs]
+            if not all(isinstance(r, dict) for r in records):
+                raise ValueError("'inputs' phải là object hoặc list các object")
+        except (ValueError, KeyError, TypeError) as e:
+            self._send(400, {'error': f"Request không hợp lệ: {e}"})
+            return
+
+        try:
+            model_id, results = self.service.predict_many(records, city_mode, property_type)
+        except predictor.ModelNotFoundError as e:
+            self._send(404, {'error': str(e)})
+            return
+        except Exception as e:
+            self._send(500, {'error': f"Lỗi khi định giá: {e}"})
+            return
+
+        if isinstance(inputs, list):
+            self._send(200, {'model': model_id, 'prices': [price for price, _ in results]})
+        else:
+            price, cached = results[0]
+            self._send(200, {'model': model_id, 'price': price, 'cached': cached})
+
+    def log_message(self, format, *args):
+        pass   # hàng nghìn request / giây, không in log từng request
+
+
+def make_server(host='127.0.0.1', port=DEFAULT_PORT, window_ms=DEFAULT_BATCH_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH):
+    handler = type('BoundServiceHandler', (ServiceHandler,), {'service': PredictionService(window_ms, max_batch)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dịch vụ HTTP định giá BĐS (micro-batching)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--batch-window-ms', type=float, default=DEFAULT_BATCH_WINDOW_MS,
+                        help="Thời gian gom request cùng model thành 1 lô (ms)")
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH, help="Số dòng tối đa mỗi lô")
+    parser.add_argument('--warm-up', default='all', help='Model load sẵn lúc khởi động: "all", "hanoi,villa" hoặc "" để tắt')
+    args = parser.parse_args(argv)
+
+    if args.warm_up:
+        model_ids = None if args.warm_up == 'all' else [m.strip() for m in args.warm_up.split(',')]
+        model_registry.registry.warm_up(model_ids)
+
+    server = make_server(args.host, args.port, args.batch_window_ms, args.max_batch)
+    print(f"🚀 Dịch vụ định giá: http://{args.host}:{args.port}/predict "
+          f"(cửa sổ gom {args.batch_window_ms:g} ms, tối đa {args.max_batch} dòng / lô)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+# ==============================================================================
+# CHỈ MỤC KHÔNG GIAN (BALL TREE HAVERSINE) - TÌM BĐS TƯƠNG ĐỒNG GẦN NHẤT
+# ==============================================================================
+# Mỗi dataset dựng 1 BallTree (metric haversine, tọa độ radian) 1 lần / process.
+# Truy vấn k điểm gần nhất là O(log N) thay vì quét haversine cả DataFrame.
+
+EARTH_RADIUS_KM = 6371.0
+
+# Khung tọa độ Việt Nam (giống bước lọc cơ bản của dashboard)
+LAT_RANGE = (8.0, 24.0)
+LON_RANGE = (102.0, 110.0)
+
+# Cột hiển thị cho bảng BĐS tương đồng (cột nào dataset có mới lấy)
+COMPARABLE_COLS = ['project_name_raw', 'price', 'area', 'bedrooms', 'floors', 'legal', 'lat', 'lon']
+
+
+def valid_coordinate_mask(df):
+    """Dòng có tọa độ dùng được: không NaN, khác 0, nằm trong lãnh thổ VN"""
+    lat = df['lat'].to_numpy(dtype=float)
+    lon = df['lon'].to_numpy(dtype=float)
+    with np.errstate(invalid='ignore'):
+        return ((lat > LAT_RANGE[0]) & (lat < LAT_RANGE[1])
+                & (lon > LON_RANGE[0]) & (lon < LON_RANGE[1]))
+
+
+def smart_coordinate_mask(df):
+    """
+    Mask toạ độ dùng cho bản đồ/dashboard:
+      1. Trong khung Việt Nam (loại NaN, toạ độ 0)
+      2. Lọc nhiễu Bắc/Nam theo trung vị vĩ độ: đa số ở Nam (< 16) thì bỏ điểm phía Bắc và ngược lại
+    """
+    return region_mask(df['lat'].to_numpy(dtype=float), valid_coordinate_mask(df))
+
+
+def region_mask(lat, mask):
+    """
+    Bước 2 của smart_coordinate_mask trên mask khung VN có sẵn (vd. cột 'coord_valid' tính lúc load).
+    Phải chạy trên đúng tập dòng đang xem: sau lọc chéo, số đông có thể đổi miền.
+    """
+    if not mask.any():
+        return mask
+    if np.median(lat[mask]) < 16.0:
+        return mask & (lat < 16.0)
+    return mask & (lat >= 16.0)
+
+
+class ListingIndex:
+    """BallTree trên các tin đăng có tọa độ hợp lệ của 1 dataset"""
+
+    def __init__(self, df):
+        self.df = df
+        if df is None or df.empty or 'lat' not in df.columns or 'lon' not in df.columns:
+            self.rows = np.empty(0, dtype=np.int64)
+            self.tree = None
+            return
+
+        from sklearn.neighbors import BallTree  # sklearn chỉ nạp khi dựng cây lần đầu
+
+        # Vị trí dòng (iloc) của các điểm hợp lệ -> ánh xạ kết quả cây về DataFrame gốc
+        self.rows = np.flatnonzero(valid_coordinate_mask(df))
+        coords = np.radians(df[['lat', 'lon']].to_numpy(dtype=float)[self.rows])
+        self.tree = BallTree(coords, metric='haversine') if len(self.rows) else None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def query(self, lat, lon, k=5):
+        """Trả về (vị trí dòng, khoảng cách km) của k tin gần (lat, lon) nhất"""
+        if self.tree is None:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        k = min(k, len(self.rows))
+        dist, idx = self.tree.query(np.radians([[lat, lon]]), k=k)
+        return self.rows[idx[0]], dist[0] * EARTH_RADIUS_KM
+
+    def nearest_comparables(self, lat, lon, k=5):
+        """
+        Bảng k BĐS thật gần nhất: giá (Tỷ), diện tích, đơn giá (Tr/m²), khoảng cách (km).
+        """
+        rows, dist_km = self.query(lat, lon, k)
+        cols = [c for c in COMPARABLE_COLS if c in self.df.columns]
+        result = self.df.iloc[rows][cols].reset_index(drop=True)
+        result['price_per_m2'] = (result['price'].astype(float) * 1000 / result['area'].astype(float)).round(1)
+        result['distance_km'] = np.round(dist_km, 2)
+        return result
+
+
+_INDEXES = {}   # dataset key -> ListingIndex
+_LOCK = threading.Lock()
+
+
+def get_listing_index(key):
+    """Index của dataset `key` (dựng 1 lần / process, dựng lại nếu loader đọc lại dataset)"""
+    from src import loader
+    df = loader.load_dataset(key)
+    index = _INDEXES.get(key)
+    if index is not None and index.df is df:
+        return index
+    with _LOCK:
+        index = _INDEXES.get(key)
+        if index is None or index.df is not df:
+            index = ListingIndex(df)
+            _INDEXES[key] = index
+        return index
+
+
+def find_comparables(key, lat, lon, k=5):
+    """k BĐS cùng danh mục gần vị trí (lat, lon) nhất. DataFrame rỗng nếu không có dữ liệu."""
+    index = get_listing_index(key)
+    if not len(index):
+        return pd.DataFrame()
+    return index.nearest_comparables(lat, lon, k)
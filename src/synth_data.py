@@ -0,0 +1,347 @@
+"""
+Sinh dữ liệu tin đăng TỔNG HỢP (synthetic) cỡ lớn để thử tải loader / KMeans / dashboard.
+
+Học từ 1 file CSV thật một "hồ sơ" (profile) gồm schema + phân phối biên của từng cột,
+rồi sinh N dòng bất kỳ với đúng tên & thứ tự cột:
+  - Cột chữ (legal, direction, interior, project_name_raw, ...) -> tần suất từng giá trị
+  - Cột số nguyên ít giá trị (floors, bedrooms, is_corner, road_class, ...) -> tần suất từng giá trị
+  - Cột số liên tục (area, price, front_width, ...) -> hàm phân vị thực nghiệm (inverse CDF),
+    làm tròn theo đúng số chữ số thập phân của dữ liệu gốc
+  - Cột số phụ thuộc hàm vào 1 cột chữ (project_name = mã hóa của project_name_raw) -> tra bảng
+  - lat/lon -> lấy ngẫu nhiên 1 tọa độ thật rồi rung (jitter) Gauss vài trăm mét,
+    giữ nguyên cụm không gian và tỉ lệ tọa độ lỗi (0 / NaN / ngoài VN) của dữ liệu gốc
+Số dự án (project_name_raw) giữ nguyên mặc định, nhân lên bằng --project-scale.
+Các cột được sinh ĐỘC LẬP nhau (chỉ giữ phân phối biên), đủ cho thử tải, không dùng để train.
+
+Sinh theo chunk trên process pool (mỗi chunk 1 seed riêng -> kết quả không phụ thuộc số worker),
+chính worker định dạng CSV (pyarrow.csv, nhanh ~8x DataFrame.to_csv), process chính chỉ ghi
+nối tiếp theo thứ tự với hàng đợi giới hạn -> RAM không tăng theo số dòng.
+Lưu ý: Arrow ghi số thực nguyên dạng "4" thay vì "4.0" và đặt chuỗi trong ngoặc kép;
+loader ép lại đúng schema (dataset_store.COLUMN_TYPES) nên không ảnh hưởng.
+
+Ví dụ:
+    python -m src.synth_data hcm --rows 1000000 -o /tmp/synth/data_nha_hcm_final.csv
+    python -m src.synth_data all --rows 10000000 --out-dir /tmp/synth --workers 8
+    REAL_ESTATE_DATA_DIR=/tmp/synth streamlit run app.py
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+from src import spatial_index
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+# Giống loader.DATASET_CONFIG (không import loader để worker không kéo theo model registry / sklearn)
+DATASET_FILES = {
+    'hcm':       'data_nha_hcm_final.csv',
+    'hanoi':     'data_nha_hn_final.csv',
+    'apartment': 'data_apartment_final.csv',
+    'land':      'data_land_all_final.csv',
+    'villa':     'data_villa_vip_final.csv',
+}
+
+# Cột số nguyên có tối đa bấy nhiêu giá trị khác nhau -> coi là rời rạc (lấy mẫu theo tần suất)
+DISCRETE_MAX_UNIQUE = 128
+# Số điểm của hàm phân vị thực nghiệm cho cột liên tục
+N_QUANTILES = 1001
+# Số chữ số thập phân tối đa khi dò độ chính xác của cột gốc
+MAX_DECIMALS = 6
+COORD_DECIMALS = 7
+# Độ lệch chuẩn khi rung tọa độ quanh điểm thật (km)
+DEFAULT_JITTER_KM = 0.3
+KM_PER_DEGREE = 111.32
+
+DEFAULT_CHUNK_ROWS = 200_000
+
+# ==============================================================================
+# 1. HỌC HỒ SƠ (PROFILE) TỪ FILE THẬT
+# ==============================================================================
+
+def _detect_decimals(values):
+    """Số chữ số thập phân nhỏ nhất biểu diễn được (gần như) mọi giá trị; None nếu quá nhiều"""
+    values = values[np.isfinite(values)]
+    if not len(values):
+        return None
+    for decimals in range(MAX_DECIMALS + 1):
+        scaled = values * 10 ** decimals
+        if np.mean(np.abs(scaled - np.round(scaled)) < 1e-9 * np.maximum(1, np.abs(scaled))) >= 0.99:
+            return decimals
+    return None
+
+
+def _frequencies(series):
+    counts = series.value_counts(dropna=False)
+    return counts.index.to_numpy(), (counts.to_numpy() / counts.sum())
+
+
+def _functional_parent(df, col, text_cols):
+    """Cột chữ mà `col` phụ thuộc hàm vào (mỗi giá trị chữ -> đúng 1 giá trị số), nếu có"""
+    for parent in text_cols:
+        # Cột chữ gần như duy nhất theo dòng (kiểu ID) thì cột nào cũng "phụ thuộc" -> bỏ qua
+        if not 2 <= df[parent].nunique() <= len(df) // 10:
+            continue
+        if df.groupby(parent, dropna=False)[col].nunique(dropna=False).max() <= 1:
+            return parent
+    return None
+
+
+def learn_profile(csv_path):
+    """
+    Đọc file CSV thật và trả về profile (dict thuần, pickle được để gửi sang worker).
+    Thứ tự & tên cột giữ đúng như file gốc.
+    """
+    df = pd.read_csv(csv_path)
+    text_cols = [c for c in df.columns
+                 if df[c].dtype == object or pd.api.types.is_string_dtype(df[c])]
+    has_coords = 'lat' in df.columns and 'lon' in df.columns
+
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if has_coords and col in ('lat', 'lon'):
+            columns[col] = {'kind': 'coord'}
+        elif col in text_cols:
+            values, probs = _frequencies(series)
+            columns[col] = {'kind': 'category', 'values': values, 'probs': probs}
+        else:
+            values = series.to_numpy(dtype=float)
+            finite = values[np.isfinite(values)]
+            is_integral = len(finite) and np.all(finite == np.round(finite))
+            parent = _functional_parent(df, col, text_cols)
+            if parent is not None:
+                lookup = df.groupby(parent, dropna=False)[col].first()
+                columns[col] = {'kind': 'lookup', 'parent': parent,
+                                'keys': lookup.index.to_numpy(), 'values': lookup.to_numpy(),
+                                'default': float(np.nanmedian(values))}
+            elif is_integral and series.nunique() <= DISCRETE_MAX_UNIQUE:
+                values, probs = _frequencies(series)
+                columns[col] = {'kind': 'category', 'values': values, 'probs': probs}
+            else:
+                columns[col] = {
+                    'kind': 'numeric',
+                    'quantiles': np.quantile(finite, np.linspace(0, 1, N_QUANTILES)) if len(finite) else None,
+                    'decimals': 0 if is_integral else _detect_decimals(finite),
+                    'null_rate': 1 - len(finite) / max(len(values), 1),
+                    'dtype': series.dtype,
+                }
+
+    profile = {'source': os.path.basename(csv_path), 'n_rows': len(df),
+               'column_order': list(df.columns), 'columns': columns}
+    if has_coords:
+        # Neo tọa độ: mọi dòng thật (kể cả tọa độ lỗi -> giữ đúng tỉ lệ lỗi)
+        profile['anchors'] = df[['lat', 'lon']].to_numpy(dtype=float)
+        profile['anchor_valid'] = spatial_index.valid_coordinate_mask(df)
+    return profile
+
+
+def scale_project_cardinality(profile, scale):
+    """
+    Nhân số dự án (project_name_raw) lên `scale` lần: dự án nhân bản "<tên> #k" chia đều
+    tần suất với dự án gốc, cột tra bảng theo dự án (project_name) chép giá trị của bản gốc.
+    """
+    spec = profile['columns'].get('project_name_raw')
+    if spec is None or spec['kind'] != 'category' or scale <= 1:
+        return profile
+    values, probs = spec['values'], spec['probs']
+    named = np.array([isinstance(v, str) for v in values])
+    n_extra = int(round(named.sum() * (scale - 1)))
+    if n_extra <= 0:
+        return profile
+
+    # Dự án nhiều tin được nhân bản trước (xoay vòng nếu scale > 2)
+    order = np.flatnonzero(named)[np.argsort(-probs[named], kind='stable')]
+    sources = order[np.arange(n_extra) % len(order)]
+    copies = np.bincount(sources, minlength=len(values)) + 1     # số bản / dự án (kể cả gốc)
+
+    new_values, new_probs, origin = list(values), list(probs / copies), list(values)
+    seen = {}
+    for src in sources:
+        seen[src] = seen.get(src, 1) + 1
+        new_values.append(f"{values[src]} #{seen[src]}")
+        new_probs.append(probs[src] / copies[src])
+        origin.append(values[src])
+
+    columns = dict(profile['columns'])
+    columns['project_name_raw'] = {'kind': 'category', 'values': np.array(new_values, dtype=object),
+                                   'probs': np.array(new_probs)}
+    for col, other in profile['columns'].items():
+        if other['kind'] == 'lookup' and other['parent'] == 'project_name_raw':
+            table = dict(zip(other['keys'], other['values']))
+            columns[col] = dict(other, keys=np.array(new_values, dtype=object),
+                                values=np.array([table.get(v, other['default']) for v in origin]))
+    return dict(profile, columns=columns)
+
+# ==============================================================================
+# 2. SINH DỮ LIỆU (CHẠY TRONG PROCESS CON)
+# ==============================================================================
+
+def _sample_coords(profile, n, rng, jitter_km):
+    anchors = profile['anchors']
+    pick = rng.integers(0, len(anchors), size=n)
+    lat = anchors[pick, 0].copy()
+    lon = anchors[pick, 1].copy()
+    valid = profile['anchor_valid'][pick]
+
+    # Chỉ rung điểm hợp lệ; điểm lỗi (0 / NaN / ngoài VN) giữ nguyên để giữ tỉ lệ lỗi
+    sigma_lat = jitter_km / KM_PER_DEGREE
+    lat[valid] += rng.normal(0.0, sigma_lat, size=valid.sum())
+    lon[valid] += rng.normal(0.0, 1.0, size=valid.sum()) * sigma_lat / np.cos(np.radians(lat[valid]))
+    return np.round(lat, COORD_DECIMALS), np.round(lon, COORD_DECIMALS)
+
+
+def _sample_numeric(spec, n, rng):
+    if spec['quantiles'] is None:
+        return np.full(n, np.nan)
+    q = spec['quantiles']
+    values = np.interp(rng.random(n) * (len(q) - 1), np.arange(len(q)), q)
+    if spec['decimals'] is not None:
+        values = np.round(values, spec['decimals'])
+    if spec['null_rate'] > 0:
+        values[rng.random(n) < spec['null_rate']] = np.nan
+    elif spec['decimals'] == 0 and pd.api.types.is_integer_dtype(spec['dtype']):
+        values = values.astype(np.int64)
+    return values
+
+
+def generate_frame(profile, n, seed, jitter_km=DEFAULT_JITTER_KM):
+    """n dòng tổng hợp theo profile (cùng seed -> cùng kết quả)"""
+    rng = np.random.default_rng(seed)
+    columns = profile['columns']
+    data = {}
+
+    if 'anchors' in profile:
+        data['lat'], data['lon'] = _sample_coords(profile, n, rng, jitter_km)
+
+    for col, spec in columns.items():
+        if spec['kind'] == 'category':
+            data[col] = spec['values'][rng.choice(len(spec['values']), size=n, p=spec['probs'])]
+        elif spec['kind'] == 'numeric':
+            data[col] = _sample_numeric(spec, n, rng)
+
+    # Cột tra bảng sinh sau cùng (cần cột cha đã có)
+    for col, spec in columns.items():
+        if spec['kind'] == 'lookup':
+            pos = pd.Index(spec['keys']).get_indexer(data[spec['parent']])
+            data[col] = np.where(pos >= 0, spec['values'][pos], spec['default'])
+
+    return pd.DataFrame({col: data[col] for col in profile['column_order']})
+
+
+_WORKER_PROFILE = None
+
+
+def _init_worker(profile):
+    global _WORKER_PROFILE
+    _WORKER_PROFILE = profile
+
+
+def render_chunk(n, seed, jitter_km, as_csv):
+    """Sinh 1 chunk; ghi CSV thì định dạng luôn trong worker (phần tốn CPU nhất) -> bytes"""
+    df = generate_frame(_WORKER_PROFILE, n, seed, jitter_km)
+    if not as_csv:
+        return df
+    sink = pa.BufferOutputStream()
+    pa_csv.write_csv(pa.Table.from_pandas(df, preserve_index=False), sink,
+                     pa_csv.WriteOptions(include_header=False, quoting_style='needed'))
+    return sink.getvalue().to_pybytes()
+
+# ==============================================================================
+# 3. ĐIỀU PHỐI: PROCESS POOL + GHI NỐI TIẾP
+# ==============================================================================
+
+def run(profile, output_path, n_rows, seed=0, chunk_rows=DEFAULT_CHUNK_ROWS,
+        workers=None, max_pending=None, jitter_km=DEFAULT_JITTER_KM):
+    """Ghi `n_rows` dòng tổng hợp ra CSV/Parquet, tối đa `max_pending` chunk trong RAM cùng lúc"""
+    from src.batch_predict import ChunkWriter
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 2
+    as_csv = not output_path.lower().endswith(('.parquet', '.pq'))
+    sizes = [chunk_rows] * (n_rows // chunk_rows) + ([n_rows % chunk_rows] if n_rows % chunk_rows else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    writer = None if as_csv else ChunkWriter(output_path)
+    csv_file = open(output_path, 'wb') if as_csv else None
+    if csv_file is not None:
+        csv_file.write((','.join(profile['column_order']) + '\n').encode('utf-8'))
+
+    pending = deque()
+    written = 0
+    start = time.perf_counter()
+
+    def flush_oldest():
+        nonlocal written
+        n, future = pending.popleft()
+        result = future.result()
+        if csv_file is not None:
+            csv_file.write(result)
+        else:
+            writer.write(result)
+        written += n
+        print(f"✅ {profile['source']}: {written:,}/{n_rows:,} dòng ({time.perf_counter() - start:,.1f}s)", file=sys.stderr)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(profile,)) as pool:
+            for n, chunk_seed in zip(sizes, seeds):
+                if len(pending) >= max_pending:
+                    flush_oldest()
+                pending.append((n, pool.submit(render_chunk, n, chunk_seed, jitter_km, as_csv)))
+            while pending:
+                flush_oldest()
+    finally:
+        if csv_file is not None:
+            csv_file.close()
+        if writer is not None:
+            writer.close()
+    return written
+
+
+def resolve_source(source):
+    """Key dataset ('hcm', 'land', ...) hoặc đường dẫn CSV -> đường dẫn CSV"""
+    if source in DATASET_FILES:
+        return os.path.join(DATA_DIR, DATASET_FILES[source])
+    return source
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sinh dữ liệu BĐS tổng hợp cỡ lớn theo schema & phân phối của file thật")
+    parser.add_argument('source', help=f"Key dataset ({', '.join(DATASET_FILES)}), 'all', hoặc đường dẫn CSV nguồn")
+    parser.add_argument('--rows', type=int, required=True, help="Số dòng cần sinh (mỗi dataset)")
+    parser.add_argument('-o', '--output', default=None, help="File kết quả (.csv hoặc .parquet) khi sinh 1 dataset")
+    parser.add_argument('--out-dir', default=None,
+                        help="Thư mục kết quả, giữ nguyên tên file gốc (dùng với REAL_ESTATE_DATA_DIR)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help="Số dòng mỗi chunk")
+    parser.add_argument('--workers', type=int, default=None, help="Số process (mặc định = số CPU)")
+    parser.add_argument('--max-pending', type=int, default=None, help="Số chunk tối đa trong hàng đợi (mặc định = 2 x workers)")
+    parser.add_argument('--jitter-km', type=float, default=DEFAULT_JITTER_KM, help="Độ lệch chuẩn khi rung tọa độ (km)")
+    parser.add_argument('--project-scale', type=float, default=1.0, help="Nhân số dự án (project_name_raw) lên bấy nhiêu lần")
+    args = parser.parse_args(argv)
+
+    sources = list(DATASET_FILES) if args.source == 'all' else [args.source]
+    if args.output and len(sources) > 1:
+        parser.error("Sinh nhiều dataset thì dùng --out-dir thay cho -o")
+    if not args.output and not args.out_dir:
+        parser.error("Cần -o hoặc --out-dir")
+
+    for source in sources:
+        csv_path = resolve_source(source)
+        output = args.output or os.path.join(args.out_dir, os.path.basename(csv_path))
+        profile = scale_project_cardinality(learn_profile(csv_path), args.project_scale)
+        n_rows = run(profile, output, args.rows, seed=args.seed, chunk_rows=args.chunk_rows,
+                     workers=args.workers, max_pending=args.max_pending, jitter_km=args.jitter_km)
+        print(f"🎉 Hoàn tất: {n_rows:,} dòng -> {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
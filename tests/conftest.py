@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Chạy pytest từ thư mục gốc repo: cho phép `from src import ...` như app.py
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
@@ -0,0 +1,55 @@
+import os
+
+import pandas as pd
+import plotly.express as px
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from src import loader
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+DASHBOARD_MODE = "📊 Dashboard Phân tích"
+CATEGORIES = ["Nhà phố Hồ Chí Minh", "Nhà phố Hà Nội", "Căn hộ Chung cư", "Đất nền", "Biệt thự / Villa"]
+
+
+def fingerprint(df):
+    """Cột, kiểu, index và nội dung của DataFrame (đổi bất kỳ thứ gì -> khác)"""
+    return (list(df.columns), [str(t) for t in df.dtypes], len(df),
+            int(pd.util.hash_pandas_object(df, index=True).sum()))
+
+
+@pytest.fixture
+def mapbox_compat(monkeypatch):
+    # plotly >= 6 bỏ scatter_mapbox / set_mapbox_access_token: thay tạm bằng bản MapLibre
+    # để dashboard vẽ được hết các biểu đồ (test này kiểm tra dữ liệu, không kiểm tra bản đồ)
+    if not hasattr(px, 'scatter_mapbox'):
+        monkeypatch.setattr(px, 'scatter_mapbox', lambda *a, mapbox_style=None, **k: px.scatter_map(*a, **k), raising=False)
+    if not hasattr(px, 'set_mapbox_access_token'):
+        monkeypatch.setattr(px, 'set_mapbox_access_token', lambda token: None, raising=False)
+
+
+def test_dashboards_do_not_mutate_cached_datasets(mapbox_compat):
+    """Dataset trong cache của loader dùng chung cho mọi phiên: vẽ dashboard không được sửa nó"""
+    datasets = {key: loader.load_dataset(key) for key in loader.DATASET_CONFIG}
+    datasets = {key: df for key, df in datasets.items() if not df.empty}
+    if not datasets:
+        pytest.skip("Không có dữ liệu trong data/")
+    before = {key: fingerprint(df) for key, df in datasets.items()}
+
+    at = AppTest.from_file(APP_PATH, default_timeout=300)
+    at.secrets['MAPBOX_TOKEN'] = 'test'
+    at.run()
+    at.sidebar.radio[0].set_value(DASHBOARD_MODE).run()
+    for category in CATEGORIES:
+        at.sidebar.selectbox[0].set_value(category).run()
+        assert not at.exception, (category, [e.value for e in at.exception])
+        # Thêm 1 bộ lọc chéo (cụm địa lý đầu tiên) để chạy cả nhánh dữ liệu đã lọc
+        clusters = [m for m in at.sidebar.multiselect if 'Cluster' in str(m.label)]
+        if clusters and clusters[0].options:
+            clusters[0].set_value([clusters[0].options[0]]).run()
+            assert not at.exception, (category, [e.value for e in at.exception])
+            clusters[0].set_value([]).run()
+
+    for key, df in datasets.items():
+        assert loader.load_dataset(key) is df
+        assert fingerprint(df) == before[key], key
@@ -0,0 +1,34 @@
+import numpy as np
+
+from src import dataset_store
+
+
+def write_csv(tmp_path, text):
+    path = tmp_path / 'data.csv'
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def test_integral_columns_are_narrowed(tmp_path):
+    df = dataset_store.read_dataset(write_csv(tmp_path, "price,floors,is_corner\n5.5,3,1\n7.0,4,0\n"))
+    assert df['floors'].dtype == np.int16
+    assert df['is_corner'].dtype == np.int8
+    assert df['floors'].tolist() == [3, 4]
+
+
+def test_fractional_value_in_int_column_keeps_float(tmp_path):
+    df = dataset_store.read_dataset(write_csv(tmp_path, "price,floors\n5.5,2.5\n7.0,3\n"))
+    assert len(df) == 2
+    assert df['floors'].tolist() == [2.5, 3.0]
+
+
+def test_nan_in_int_column_is_kept(tmp_path):
+    df = dataset_store.read_dataset(write_csv(tmp_path, "price,floors,is_corner\n5.5,,1\n7.0,3,\n"))
+    assert len(df) == 2
+    assert np.isnan(df['floors'].iloc[0]) and df['floors'].iloc[1] == 3
+    assert df['is_corner'].iloc[0] == 1 and np.isnan(df['is_corner'].iloc[1])
+
+
+def test_text_in_numeric_column_does_not_drop_dataset(tmp_path):
+    df = dataset_store.read_dataset(write_csv(tmp_path, "price,floors\nThỏa thuận,3\n7.0,4\n"))
+    assert df['price'].astype(str).tolist() == ["Thỏa thuận", "7.0"]
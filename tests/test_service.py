@@ -0,0 +1,32 @@
+import pytest
+
+from src import model_registry
+from src import predictor
+from src import service
+
+# Request Hà Nội thiếu interior / floors / bedrooms (preprocessor đi nhánh "không có cột")
+SPARSE = {'area': 60.0, 'front_width': 4.0, 'access_road': 3.0, 'toilet': 2,
+          'legal': "Sổ hồng/Sổ đỏ", 'direction': "Nam", 'lat': 21.03, 'lon': 105.85}
+FULL = dict(SPARSE, interior="Đầy đủ", floors=5, bedrooms=4)
+
+
+@pytest.fixture(scope='module')
+def hanoi():
+    if model_registry.model_fingerprint('hanoi') is None:
+        pytest.skip("Không có model hanoi trong models/")
+    return predictor.load_resources('hanoi')
+
+
+def test_batched_price_equals_solo_price(hanoi):
+    process_key = model_registry.MODEL_SPECS['hanoi']['process_key']
+    solo_sparse = float(predictor.predict_frame(hanoi, process_key, SPARSE)[0])
+    solo_full = float(predictor.predict_frame(hanoi, process_key, FULL)[0])
+
+    # Cửa sổ gom rộng để 2 request chắc chắn rơi vào cùng 1 lô
+    batcher = service.MicroBatcher('hanoi', window_seconds=0.5, max_batch=16)
+    sparse_future = batcher.submit(SPARSE)
+    full_future = batcher.submit(FULL)
+
+    assert sparse_future.result(timeout=30) == pytest.approx(solo_sparse, rel=1e-6)
+    assert full_future.result(timeout=30) == pytest.approx(solo_full, rel=1e-6)
+    assert batcher.stats()['batches'] == 1
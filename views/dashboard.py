@@ -1,8 +1,13 @@
 import streamlit as st
 import plotly.express as px
+import plotly.graph_objects as go
 import pandas as pd
 import numpy as np
 
+from src import aggregates
+from src import listing_index
+from src import spatial_index
+
 # ==============================================================================
 # 1. CÁC HÀM HỖ TRỢ (HELPER FUNCTIONS)
 # ==============================================================================
@@ -53,6 +58,12 @@ def filter_smart_coordinates(df):
     """
     if df is None or df.empty: return df
     
+    # Nhanh: loader đã tính sẵn khung VN (cột 'coord_valid'); chỉ tính lại trung vị Bắc/Nam
+    # trên các dòng đang xem (sau lọc chéo, vd. 1 cụm phía Bắc trong dataset đa số phía Nam)
+    if 'coord_valid' in df.columns:
+        mask = spatial_index.region_mask(df['lat'].to_numpy(dtype=float), df['coord_valid'].to_numpy())
+        return df[mask]
+    
     # Copy để không ảnh hưởng data gốc
     df_clean = df.copy()
     
@@ -81,6 +92,11 @@ def filter_smart_coordinates(df):
             
     return df_clean
 
+def show_chart(fig, **kwargs):
+    """st.plotly_chart bỏ qua biểu đồ None (hàm vẽ đã báo warning/error hoặc thiếu cột)"""
+    if fig is not None:
+        st.plotly_chart(fig, width="stretch", **kwargs)
+
 def format_price(val):
     if val >= 1: return f"{val:.2f} Tỷ"
     return f"{val*1000:.0f} Tr"
@@ -89,9 +105,36 @@ def format_price(val):
 # 2. CÁC BIỂU ĐỒ CHÍNH (CHARTS)
 # ==============================================================================
 
-def chart_heatmap_location(df):
+# Lựa chọn mức chi tiết bản đồ ngoài các mức ô vuông trong aggregates.MAP_LEVELS
+LOD_AUTO = "Tự động"
+LOD_RAW = "Từng tin"
+
+
+def build_cube(df):
+    """Lọc toạ độ 1 lần rồi tính toàn bộ tổng hợp cho dashboard (KPI, Top, pháp lý, histogram, bản đồ)"""
+    clean_df = filter_smart_coordinates(df)
+    if clean_df is None or clean_df.empty:
+        return aggregates.DashboardCube(df, clean_df)
+
+    hover_name = 'district'
+    if 'project_name_raw' in clean_df.columns:
+        hover_name = 'project_name_raw'
+    else:
+        # Nhãn "BĐS #<index>" do MapLevels tạo trên mẫu điểm của nó (không ghi vào dataset dùng chung)
+        hover_name = aggregates.LISTING_LABEL_COL
+    return aggregates.DashboardCube(df, clean_df, hover_col=hover_name)
+
+
+def get_cube(df, cache_key=None):
+    """Cube tổng hợp của dataset (tính 1 lần, dùng lại cho mọi rerun tới khi df đổi)"""
+    return aggregates.cached('cube', cache_key, df, lambda: build_cube(df))
+
+
+def chart_heatmap_location(df, level=LOD_AUTO, cache_key=None):
     """
     Bản đồ phân bố Bất động sản (Sử dụng Mapbox).
+    Nhiều tin thì vẽ các ô tổng hợp (số tin, giá/đơn giá trung vị) thay vì từng điểm,
+    để dữ liệu gửi xuống trình duyệt không phình theo kích thước dataset.
     """
     # 1. Lấy Token từ Secrets (BẢO MẬT)
     mapbox_token = None
@@ -108,20 +151,22 @@ def chart_heatmap_location(df):
     px.set_mapbox_access_token(mapbox_token)
 
     # ==================================================
-    # Xử lý dữ liệu (Giữ nguyên code cũ của bạn)
+    # Xử lý dữ liệu: lọc toạ độ + gom ô đã tính sẵn cho dataset này
     # ==================================================
-    clean_df = filter_smart_coordinates(df)
+    map_levels = get_cube(df, cache_key).map_levels
     
-    if clean_df is None or clean_df.empty:
+    if map_levels.n_points == 0:
         st.warning("⚠️ Không có dữ liệu toạ độ hợp lệ.")
         return None
 
-    hover_name = 'district'
-    if 'project_name_raw' in clean_df.columns:
-        hover_name = 'project_name_raw'
-    elif 'Tin_BĐS' not in clean_df.columns:
-         clean_df['Tin_BĐS'] = "BĐS #" + clean_df.index.astype(str)
-         hover_name = 'Tin_BĐS'
+    if level == LOD_AUTO:
+        level = map_levels.auto_level() or LOD_RAW
+    if level != LOD_RAW:
+        return chart_map_bins(map_levels, level)
+
+    # Từng tin: mẫu điểm đã lọc sẵn (tối đa aggregates.RAW_POINT_LIMIT điểm)
+    clean_df = map_levels.points
+    hover_name = map_levels.hover_col
     # ==================================================
 
 
@@ -153,7 +198,7 @@ def chart_heatmap_location(df):
             # -----------------------------------
 
             height=500,
-            title=f"📍 Bản đồ phân bố ({len(clean_df)} tin)"
+            title=f"📍 Bản đồ phân bố ({len(clean_df)} / {map_levels.n_points} tin)"
         )
         
         # Áp dụng dark theme layout chung của bạn (nếu có biến này)
@@ -181,9 +226,40 @@ def chart_heatmap_location(df):
         return None
 
 
-def chart_top_expensive_projects(df):
+def chart_map_bins(map_levels, level):
+    """Bản đồ các ô tổng hợp: màu = giá trung vị, kích thước = số tin"""
+    bins = map_levels.levels[level]
+    try:
+        fig = px.scatter_mapbox(
+            bins,
+            lat="lat",
+            lon="lon",
+            color="median_price",
+            size="count",
+            hover_data={"count": True, "median_price": ":.2f", "median_price_per_m2": ":.1f", "lat": False, "lon": False},
+            labels={"count": "Số tin", "median_price": "Giá trung vị (Tỷ)", "median_price_per_m2": "Đơn giá trung vị (Tr/m²)"},
+            size_max=25,
+            zoom=aggregates.level_zoom(level),
+            color_continuous_scale=[
+                (0.0, '#0f172a'), 
+                (0.5, '#0ea5e9'), 
+                (1.0, '#ffffff') 
+            ],
+            mapbox_style="mapbox://styles/mapbox/dark-v11", 
+            height=500,
+            title=f"📍 Bản đồ phân bố ({map_levels.n_points} tin, {len(bins)} ô - {level})"
+        )
+        fig.update_layout(**DARK_THEME_LAYOUT)
+        return fig
+    except Exception as e:
+        st.error(f"Lỗi vẽ bản đồ: {e}")
+        return None
+
+
+def chart_top_expensive_projects(df, cache_key=None):
     """
     Top Khu vực/Dự án Đắt đỏ (Biểu đồ + Bản đồ Mapbox).
+    Bảng xếp hạng lấy từ cube tổng hợp (groupby chỉ chạy 1 lần / dataset).
     """
     if df is None or df.empty: return
 
@@ -195,34 +271,18 @@ def chart_top_expensive_projects(df):
         st.warning("⚠️ Chưa có Mapbox Token. Bản đồ có thể không hiển thị đúng style.")
     # --------------------------------
 
-    group_col = None
-    label_title = ""
-    
-    if 'project_name_raw' in df.columns:
-        group_col = 'project_name_raw'; label_title = "Dự án"
-    elif 'district' in df.columns:
-        group_col = 'district'; label_title = "Quận/Huyện"
-    elif 'geo_cluster' in df.columns:
-        group_col = 'geo_cluster'; label_title = "Khu vực"
+    cube = get_cube(df, cache_key)
+    group_col = cube.group_col
+    label_title = {'project_name_raw': "Dự án", 'district': "Quận/Huyện", 'geo_cluster': "Khu vực"}.get(group_col, "")
     
     if not group_col:
         st.info("Không đủ thông tin để xếp hạng.")
         return
 
-    # Lọc toạ độ trước khi tính toán
-    df_clean = filter_smart_coordinates(df)
-    
-    stats = df_clean.groupby(group_col).agg({
-        'price': 'mean',
-        'lat': 'mean',
-        'lon': 'mean',
-        'area': 'count'
-    }).reset_index()
-    
-    stats = stats[stats['area'] >= 2] 
-    top_10 = stats.sort_values(by='price', ascending=False).head(10)
+    # Đã lọc toạ độ + groupby sẵn trong cube
+    top_10 = cube.top_groups
     
-    if top_10.empty:
+    if top_10 is None or top_10.empty:
         st.info("Chưa đủ dữ liệu để xếp hạng Top 10.")
         return
 
@@ -279,12 +339,12 @@ def chart_top_expensive_projects(df):
         st.plotly_chart(fig_map, width="stretch", config={'scrollZoom': True})
 
 
-def chart_donut_legal(df):
+def chart_donut_legal(df, cache_key=None):
     """Biểu đồ tròn tỷ lệ Pháp lý"""
     if 'legal' not in df.columns: return None
     
-    legal_counts = df['legal'].fillna("Chưa xác định").value_counts().reset_index()
-    legal_counts.columns = ['Pháp lý', 'Số lượng']
+    cube = get_cube(df, cache_key)
+    legal_counts = cube.legal_counts
     
     color_map = {
         "Sổ hồng/Sổ đỏ": "#FF4B4B", "Hợp đồng mua bán": "#1E88E5",
@@ -294,7 +354,7 @@ def chart_donut_legal(df):
     fig = px.pie(
         legal_counts, values='Số lượng', names='Pháp lý', 
         hole=0.5, color='Pháp lý', color_discrete_map=color_map,
-        title=f"⚖️ Cơ cấu Pháp lý ({len(df)} tin)"
+        title=f"⚖️ Cơ cấu Pháp lý ({cube.n_listings} tin)"
     )
     fig.update_traces(textposition='inside', textinfo='percent+label')
     fig.update_layout(**DARK_THEME_LAYOUT)
@@ -302,69 +362,95 @@ def chart_donut_legal(df):
     return fig
 
 
-def chart_scatter_area_price(df):
-    """Biểu đồ tương quan Diện tích - Giá"""
+def chart_scatter_area_price(df, cache_key=None):
+    """
+    Biểu đồ tương quan Diện tích - Giá (WebGL).
+    Đường xu hướng OLS từng nhóm pháp lý và mẫu điểm phân tầng lấy từ cube (tính 1 lần / dataset).
+    """
     if df is None or df.empty: return None
     
-    df_zoom = df[(df['area'] > 0) & (df['price'] > 0)]
-    if df_zoom['area'].max() > 1000:
-        df_zoom = df_zoom[df_zoom['area'] < 1000]
+    scatter = get_cube(df, cache_key).scatter
+    color_col = scatter.color_col
+    points = scatter.points.rename(columns={'group': color_col}) if color_col else scatter.points
+    groups = scatter.fits['group'].tolist()
+    palette = px.colors.qualitative.Plotly
+    
+    title = "📈 Xu hướng Diện tích - Giá"
+    if len(points) < scatter.n_points:
+        title += f" (mẫu {len(points):,}/{scatter.n_points:,} tin)"
         
     fig = px.scatter(
-        df_zoom, x='area', y='price',
-        color='legal' if 'legal' in df.columns else None,
-        trendline="ols",
+        points, x='area', y='price',
+        color=color_col,
+        category_orders={color_col: groups} if color_col else None,
+        color_discrete_sequence=palette,
+        render_mode='webgl',
         labels={'area': 'Diện tích (m²)', 'price': 'Giá (Tỷ)'},
-        title="📈 Xu hướng Diện tích - Giá",
+        title=title,
         height=500, opacity=0.6
     )
+    
+    # Đường xu hướng: 2 đầu mút mỗi nhóm, cùng màu với nhóm
+    for i, fit in enumerate(scatter.fits.itertuples()):
+        x_line = np.array([fit.x_min, fit.x_max])
+        fig.add_trace(go.Scatter(
+            x=x_line, y=fit.intercept + fit.slope * x_line, mode='lines',
+            line=dict(color=palette[i % len(palette)]), name=f"OLS {fit.group}", showlegend=False,
+            hovertemplate=f"<b>OLS {fit.group}</b><br>price = {fit.slope:.4f} * area + {fit.intercept:.3f}<br>n = {fit.n:,}<extra></extra>"
+        ))
+    
     fig.update_layout(**DARK_THEME_LAYOUT)
     fig.update_xaxes(showgrid=True, gridcolor='rgba(255,255,255,0.1)') # Lưới mờ tinh tế
     fig.update_yaxes(showgrid=True, gridcolor='rgba(255,255,255,0.1)')
     return fig
 
 
-def chart_box_alley_impact(df):
-    """Biểu đồ hộp phân tích hẻm"""
+def chart_box_alley_impact(df, cache_key=None):
+    """
+    Biểu đồ hộp phân tích hẻm.
+    Tứ phân vị / râu / outlier tính sẵn trong cube -> mỗi loại đường chỉ là 1 box + vài điểm.
+    """
     if 'access_road' not in df.columns: return None
     
-    work_df = df[(df['access_road'] > 0) & (df['area'] > 0)].copy()
-    work_df['price_per_m2'] = (work_df['price'] * 1000) / work_df['area']
-    work_df = work_df[work_df['price_per_m2'] < 500]
+    boxes = get_cube(df, cache_key).road_type_boxes
+    palette = px.colors.qualitative.Plotly
     
-    def classify(w):
-        if w < 2.5: return "1. Hẻm nhỏ"
-        elif w < 5.0: return "2. Hẻm xe hơi"
-        elif w < 10: return "3. Đường ô tô tránh"
-        return "4. Mặt tiền"
-        
-    work_df['Loai_duong'] = work_df['access_road'].apply(classify)
-    work_df = work_df.sort_values('Loai_duong')
+    fig = go.Figure()
+    for i, (label, stats) in enumerate(boxes.items()):
+        color = palette[i % len(palette)]
+        fig.add_trace(go.Box(
+            name=label, x=[label],
+            q1=[stats['q1']], median=[stats['median']], q3=[stats['q3']],
+            lowerfence=[stats['lowerfence']], upperfence=[stats['upperfence']],
+            marker_color=color, boxpoints=False
+        ))
+        if len(stats['outliers']):
+            fig.add_trace(go.Scatter(
+                x=[label] * len(stats['outliers']), y=stats['outliers'], mode='markers',
+                marker=dict(color=color, size=4), name=label, hoverinfo='y'
+            ))
     
-    fig = px.box(
-        work_df, x='Loai_duong', y='price_per_m2', color='Loai_duong',
+    fig.update_layout(
         title="📦 Phân phối giá theo loại đường",
-        labels={'price_per_m2': 'Triệu/m²', 'Loai_duong': ''},
-        points="outliers"
+        xaxis_title='', yaxis_title='Triệu/m²'
     )
     fig.update_layout(showlegend=False)
     fig.update_layout(**DARK_THEME_LAYOUT)
     return fig
 
 
-def chart_histogram_shape_ratio(df):
-    """Biểu đồ tỷ lệ hình dáng đất"""
+def chart_histogram_shape_ratio(df, cache_key=None):
+    """Biểu đồ tỷ lệ hình dáng đất (số tin mỗi cột đã đếm sẵn trong cube)"""
     if 'front_width' not in df.columns: return None
     
-    work_df = df[(df['front_width'] > 0) & (df['area'] > 0)].copy()
-    work_df['shape_ratio'] = (work_df['area'] / work_df['front_width']) / work_df['front_width']
-    work_df = work_df[work_df['shape_ratio'] <= 20]
+    hist = get_cube(df, cache_key).shape_ratio_hist
+    if hist is None: return None
     
-    fig = px.histogram(
-        work_df, x='shape_ratio', nbins=40,
-        title="📐 Phân phối Hình dáng đất (Dài/Rộng)",
-        color_discrete_sequence=['#26A69A']
-    )
+    fig = go.Figure(go.Bar(
+        x=hist['left'] + hist['width'] / 2, y=hist['count'], width=hist['width'],
+        marker_color='#26A69A', name='shape_ratio'
+    ))
+    fig.update_layout(title="📐 Phân phối Hình dáng đất (Dài/Rộng)", xaxis_title='shape_ratio', yaxis_title='count')
     fig.add_vline(x=1, line_dash="dash", line_color="red", annotation_text="Vuông (1:1)")
     fig.add_vline(x=4, line_dash="dot", line_color="orange", annotation_text="Nhà ống (4:1)")
     fig.update_layout(bargap=0.1)
@@ -375,59 +461,69 @@ def chart_histogram_shape_ratio(df):
 # 3. KPI METRICS
 # ==============================================================================
 
-def render_kpi_metrics(df):
+def render_kpi_metrics(df, cache_key=None):
     if df is None or df.empty: return
     
-    valid = df[(df['price'] > 0) & (df['area'] > 0)].copy()
-    if valid.empty: return
-    
-    avg_price = valid['price'].mean()
-    avg_area = valid['area'].mean()
-    valid['don_gia'] = (valid['price'] * 1000) / valid['area']
-    avg_don_gia = valid[valid['don_gia'] < 1000]['don_gia'].mean()
+    kpi = get_cube(df, cache_key).kpi
+    if kpi is None: return
     
     c1, c2, c3, c4 = st.columns(4)
-    c1.metric("Tin đăng", f"{len(df):,}")
-    c2.metric("Giá Rao TB", format_price(avg_price))
-    c3.metric("Đơn giá TB", f"{avg_don_gia:,.1f} Tr/m²")
-    c4.metric("Diện tích TB", f"{avg_area:,.1f} m²")
+    c1.metric("Tin đăng", f"{kpi['n_listings']:,}")
+    c2.metric("Giá Rao TB", format_price(kpi['avg_price']))
+    c3.metric("Đơn giá TB", f"{kpi['avg_don_gia']:,.1f} Tr/m²")
+    c4.metric("Diện tích TB", f"{kpi['avg_area']:,.1f} m²")
 
 # ==============================================================================
 # 4. GIAO DIỆN CHÍNH (MAIN UI)
 # ==============================================================================
 
-def show_dashboard_ui(df, category_name):
+def show_dashboard_ui(df, category_name, filters=None):
     """
     Hàm hiển thị chính được gọi từ app.py
+    filters: bộ lọc từ sidebar.show_dashboard_filters (mọi biểu đồ dùng chung 1 bộ lọc)
     """
     if df is None or df.empty:
         st.warning(f"⚠️ Chưa có dữ liệu cho danh mục: **{category_name}**")
         return
 
-    # 1. KPI
-    render_kpi_metrics(df)
+    # 0. LỌC CHÉO: AND các bitmap trong index, chỉ cube tổng hợp được tính lại
+    n_total = len(df)
+    df, filter_key = listing_index.get_filter_index(df, category_name).apply(df, filters)
+    category_key = (category_name, filter_key)
+    if filter_key:
+        st.caption(f"🔎 Đang lọc: {len(df):,} / {n_total:,} tin")
+    if df.empty:
+        st.warning("⚠️ Không có tin nào khớp bộ lọc.")
+        return
+
+    # 1. KPI (mọi con số tổng hợp lấy từ cube tính 1 lần / dataset + bộ lọc)
+    render_kpi_metrics(df, cache_key=category_key)
     st.markdown("---")
 
     # 2. BẢN ĐỒ LỚN (Có Scroll Zoom)
     # [FIX] Thêm config={'scrollZoom': True} để bật tính năng cuộn chuột
-    st.plotly_chart(chart_heatmap_location(df), width="stretch", config={'scrollZoom': True})
+    map_level = st.select_slider(
+        "🔎 Mức chi tiết bản đồ",
+        options=[LOD_AUTO] + [level['name'] for level in aggregates.MAP_LEVELS] + [LOD_RAW],
+    )
+    show_chart(chart_heatmap_location(df, map_level, cache_key=category_key), config={'scrollZoom': True})
     st.markdown("---")
 
     # 3. TOP DỰ ÁN (Chia đôi màn hình)
-    chart_top_expensive_projects(df)
+    chart_top_expensive_projects(df, cache_key=category_key)
     st.markdown("---")
 
     # 4. PHÂN TÍCH SÂU
     c1, c2 = st.columns(2)
     with c1:
-        st.plotly_chart(chart_donut_legal(df), width="stretch")
+        show_chart(chart_donut_legal(df, cache_key=category_key))
     with c2:
-        st.plotly_chart(chart_scatter_area_price(df), width="stretch")
+        show_chart(chart_scatter_area_price(df, cache_key=category_key))
 
     # 5. BIỂU ĐỒ ĐẶC THÙ
     if 'access_road' in df.columns:
         st.markdown("---")
-        st.plotly_chart(chart_box_alley_impact(df), width="stretch")
+        show_chart(chart_box_alley_impact(df, cache_key=category_key))
         
     if 'front_width' in df.columns:
-        st.plotly_chart(chart_histogram_shape_ratio(df), width="stretch")
\ No newline at end of file
+        show_chart(chart_histogram_shape_ratio(df, cache_key=category_key))
\ No newline at end of file
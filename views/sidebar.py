@@ -1,8 +1,18 @@
 import streamlit as st
 import os
-from src import loader # Import loader để lấy danh sách dự án
-from geopy.geocoders import MapBox # <--- THÊM DÒNG NÀY
+from src import project_index as project_index_module # Index dự án (tìm kiếm nhanh)
+from src import listing_index # Index lọc chéo cho Dashboard
 from time import sleep                # <--- THÊM DÒNG NÀY
+
+# Số dự án tối đa đưa vào selectbox mỗi lần
+PROJECT_SEARCH_LIMIT = 30
+
+# Nhãn hiển thị cho các bộ lọc Dashboard
+FILTER_LABELS = {
+    'legal': "Pháp lý", 'direction': "Hướng", 'interior': "Nội thất",
+    'geo_cluster': "Khu vực (Cluster)", 'project_name_raw': "Dự án",
+}
+
 def show_sidebar():
     with st.sidebar:
         # 1. LOGO
@@ -62,7 +72,8 @@ def show_sidebar():
                         # Lấy token từ secrets
                         mapbox_key = st.secrets["MAPBOX_TOKEN"] 
                         
-                        # Khởi tạo MapBox Geocoder
+                        # Khởi tạo MapBox Geocoder (geopy chỉ nạp khi có người bấm Tìm)
+                        from geopy.geocoders import MapBox
                         geolocator = MapBox(api_key=mapbox_key)
                         
                         # MapBox tìm rất nhanh, timeout thấp cũng được
@@ -98,16 +109,29 @@ def show_sidebar():
             # === [PHẦN MỚI] KẾT THÚC ===
 
                 # ... (Code bên trong giữ nguyên cho đến phần Vị trí) ...
+            # Ô tìm dự án nằm NGOÀI form (widget trong form không rerun khi gõ),
+            # selectbox bên dưới chỉ nhận vài chục kết quả khớp nhất từ index.
+            if property_type == "Căn hộ Chung cư":
+                st.markdown("**Thông tin Dự án:**")
+                project_index = project_index_module.get_project_index()
+                project_query = st.text_input("Tìm dự án", placeholder="VD: vinhomes, linh dam...")
+                project_matches = project_index.search(project_query, limit=PROJECT_SEARCH_LIMIT)
+                if project_query and not project_matches:
+                    st.caption("Không thấy dự án khớp, chọn 'Khác / Chưa xác định'.")
+
             # 2. Form nhập liệu (Biến đổi theo property_type)
             with st.form("prediction_form"):
                 
                 # --- PHẦN 1: DỰ ÁN (Chỉ hiện cho Chung cư) ---
                 project_name = "Others" 
                 if property_type == "Căn hộ Chung cư":
-                    st.markdown("**Thông tin Dự án:**")
-                    project_options = loader.get_project_list()
-                    project_options.insert(0, "Khác / Chưa xác định")
-                    project_name = st.selectbox("Tên dự án", project_options)
+                    project_options = ["Khác / Chưa xác định"] + project_matches
+
+                    def format_project(name):
+                        info = project_index.info(name)
+                        return f"{name} ({info['count']:,} tin)" if info else name
+
+                    project_name = st.selectbox("Tên dự án", project_options, format_func=format_project)
 
                 # --- PHẦN 2: THÔNG SỐ KỸ THUẬT ---
                 st.markdown("**Thông số kỹ thuật:**")
@@ -193,4 +217,34 @@ def show_sidebar():
                 "lon": st.session_state.lon_val
             }
             
-            return nav_mode, user_inputs, city_mode, property_type, submit_btn
\ No newline at end of file
+            return nav_mode, user_inputs, city_mode, property_type, submit_btn
+
+def show_dashboard_filters(df, category_name):
+    """
+    Bộ lọc Dashboard (khoảng giá, diện tích + các cột phân loại) ở Sidebar.
+    Trả về dict bộ lọc cho listing_index: {'price': (lo, hi), 'legal': [...], ...}
+    """
+    filters = {}
+    if df is None or df.empty:
+        return filters
+
+    index = listing_index.get_filter_index(df, category_name)
+    with st.sidebar:
+        st.markdown("---")
+        st.subheader("🔎 Bộ lọc")
+
+        # Key theo danh mục: đổi danh mục thì bộ lọc về mặc định
+        price_range = index.value_range('price')
+        if price_range:
+            lo, hi = price_range
+            filters['price'] = st.slider("Giá (Tỷ)", min_value=lo, max_value=hi, value=(lo, hi), key=f"flt_price_{category_name}")
+        area_range = index.value_range('area')
+        if area_range:
+            lo, hi = area_range
+            filters['area'] = st.slider("Diện tích (m²)", min_value=lo, max_value=hi, value=(lo, hi), key=f"flt_area_{category_name}")
+
+        for col in listing_index.CATEGORICAL_FILTERS:
+            options = index.options(col)
+            if len(options) > 1:
+                filters[col] = st.multiselect(FILTER_LABELS[col], options, key=f"flt_{col}_{category_name}")
+    return filters